@@ -1,567 +1,1560 @@
-import openpyxl
+import argparse
+import hashlib
+import heapq
+import json
+import os
+import re
+import shutil
+import tempfile
+import zipfile
 from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-from openpyxl.formatting.rule import CellIsRule, FormulaRule
-from openpyxl.chart import LineChart, BarChart, Reference
-from openpyxl.chart.axis import DateAxis
-from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
+from openpyxl.styles.borders import DEFAULT_BORDER
+from openpyxl.styles.fonts import DEFAULT_FONT
+from openpyxl.packaging.custom import IntProperty, StringProperty
+from openpyxl.utils import column_index_from_string, get_column_letter
 from openpyxl.worksheet.datavalidation import DataValidation
-from datetime import datetime, date
+from collections import defaultdict
+from copy import copy
+from dataclasses import dataclass, field
+from datetime import datetime, date, timezone
+from functools import lru_cache
+from itertools import zip_longest
+from xml.etree import ElementTree
+
+from transport_excel_forecast import CashFlowHistory, simulate
+
+DEFAULT_OUTPUT = "運送会社経営管理_v1.0.xlsx"
+WRITER_BACKENDS = ("openpyxl", "xlsxwriter")
+
+# カラーパレット定義
+header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+header_font = Font(color="FFFFFF", bold=True, size=11)
+title_font = Font(bold=True, size=14)
+subtitle_font = Font(bold=True, size=12)
+bold_font = Font(bold=True)
+red_font = Font(color="FF0000")
+red_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
+center = Alignment(horizontal='center')
+
+# 罫線スタイル
+thin_border = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+
+# 名前付きスタイル定義
+# セルごとに Font や PatternFill を割り当てる代わりに、ワークブックへ一度だけ登録した
+# スタイルを名前で参照する。styles.xml のスタイル数は行数に関係なく一定になる。
+NAMED_STYLES = {
+    "title": dict(font=title_font),
+    "dashboard_title": dict(font=Font(bold=True, size=16)),
+    "subtitle": dict(font=subtitle_font),
+    "notice": dict(font=subtitle_font,
+                   fill=PatternFill(start_color="FFE699", end_color="FFE699", fill_type="solid")),
+    "header": dict(font=header_font, fill=header_fill, alignment=center, border=thin_border),  # 入力シート
+    "header_center": dict(font=header_font, fill=header_fill, alignment=center),  # 集計シート
+    "header_label": dict(font=header_font, fill=header_fill),  # マスタ・項目見出し
+    "bold": dict(font=bold_font),
+    "warning": dict(font=Font(color="FF0000", bold=True)),
+    "date": dict(number_format='yyyy/mm/dd'),
+    "yen": dict(number_format='#,##0'),
+    "yen_label": dict(number_format='#,##0"円"'),
+    "percent": dict(number_format='0%'),
+    "percent1": dict(number_format='0.0%'),
+}
+
+# サンプルデータ（入力データ未指定時に使用）
+sample_clients = [
+    ["C001", "A運送株式会社"],
+    ["C002", "B物流センター"],
+    ["C003", "C製造工場"],
+    ["C004", "D商事"],
+    ["C005", "E倉庫"]
+]
+
+sample_vehicles = [
+    ["車両001", "2tトラック"],
+    ["車両002", "4tトラック"],
+    ["車両003", "4tトラック"],
+    ["車両004", "10tトラック"],
+    ["車両005", "10tトラック"]
+]
+
+sample_drivers = [
+    ["D001", "田中太郎"],
+    ["D002", "佐藤次郎"],
+    ["D003", "鈴木三郎"],
+    ["D004", "高橋四郎"],
+    ["D005", "山田五郎"]
+]
+
+sample_sales = [
+    [date(2025, 1, 5), "", "A運送株式会社", "車両001", 150000, "定期便"],
+    [date(2025, 1, 10), "", "B物流センター", "車両002", 200000, "特別便"],
+    [date(2025, 1, 15), "", "C製造工場", "車両003", 180000, ""],
+]
+
+sample_expenses = [
+    [date(2025, 1, 5), "", "車両001", "燃料費", 25000, "軽油"],
+    [date(2025, 1, 10), "", "車両002", "修理費", 50000, "タイヤ交換"],
+    [date(2025, 1, 15), "", "車両001", "保険料", 30000, ""],
+]
+
+sample_labor = [
+    ["田中太郎", "車両001", 100, 1, 300000, "", ""],
+    ["佐藤次郎", "車両002", 100, 1, 280000, "", ""],
+    ["鈴木三郎", "車両003", 50, 1, 260000, "", "複数車両担当"],
+    ["鈴木三郎", "車両004", 50, 1, 260000, "", "複数車両担当"],
+]
+
+sample_cash = [
+    [date(2025, 1, 1), "", "入金", "売上入金", 500000, "前月売上回収"],
+    [date(2025, 1, 10), "", "出金", "燃料費支払", 150000, ""],
+    [date(2025, 1, 20), "", "出金", "リース料支払", 200000, "車両リース"],
+]
+
+
+def _register_styles(wb):
+    """NAMED_STYLES をワークブックに登録（NamedStyle はワークブックに束縛されるため毎回生成する）"""
+    for name, attrs in NAMED_STYLES.items():
+        # 指定のない属性はブック既定のフォント・罫線に揃える（NamedStyle の既定値は空のため）
+        wb.add_named_style(NamedStyle(name=name, **{"font": DEFAULT_FONT, "border": DEFAULT_BORDER, **attrs}))
+
+
+def _cell(ws, value, style=None):
+    """名前付きスタイルを適用したセルを作成（通常モード・ストリーミングモード共通）"""
+    styled_cell = getattr(ws, "styled_cell", None)  # openpyxl 以外の書き出し先
+    if styled_cell is not None:
+        return styled_cell(value, style)
+    cell = WriteOnlyCell(ws, value=value)
+    if style is not None:
+        cell.style = style
+    return cell
+
+
+def _header_row(ws, headers, style="header"):
+    """ヘッダー行を作成"""
+    return [_cell(ws, h, style) for h in headers]
+
+
+def _prepare_sheet(wb, title, widths, index=None):
+    """シートを作成し、行の書き込み前に必要な設定（列幅など）を行う"""
+    ws = wb.create_sheet(title, index)
+    ws.sheet_view.showGridLines = False
+    # 書き込み専用シートでは最初の行を書く前に列幅を確定させる必要がある
+    for col, width in widths.items():
+        ws.column_dimensions[col].width = width
+    return ws
+
+
+def _write_title(ws, title, merge_to, style="title"):
+    """1行目にタイトルを書き込み結合する（2行目は空行）"""
+    ws.append([_cell(ws, title, style)])
+    ws.append([])
+    ws.merged_cells.add(f'A1:{merge_to}1')
+
+
+def _append_rows(ws, rows, first_row):
+    """行ジェネレーターを逐次書き込み、最終行番号を返す（データなしの場合は first_row - 1）"""
+    last_row = first_row - 1
+    for last_row, row in enumerate(rows, first_row):
+        ws.append(row)
+    return last_row
+
+
+def _add_validation(ws, dv, col, first_row, last_row):
+    """データ検証を列範囲単位で適用（セル単位で追加すると範囲が肥大化するため）
+
+    データなしの場合も _ledger_range と同じく first_row の1行を範囲とする
+    （transport_excel_append が追記時に集計数式の参照と同じように延長する）。
+    """
+    ws.data_validations.append(dv)
+    dv.add(f'{col}{first_row}:{col}{max(last_row, first_row)}')
+
+
+def _ledger_range(sheet, col, first_row, last_row):
+    """入力シートの実データ範囲への参照（列全体参照による再計算の遅延を避ける）"""
+    return f'{sheet}!{col}{first_row}:{col}{max(last_row, first_row)}'
+
+
+class LedgerAggregator:
+    """入力データを書き出しと同じ1パスで集計する
+
+    tap_* で入力レコードを包むと、シートへ書き出される各レコードを通過時に
+    月×経費区分・車両・月×入金/出金の単位で合計する。集計結果は件数ではなく
+    グループ数に比例したメモリしか使わないため、streaming=True でもそのまま使える。
+    人件費は LaborAllocation で按分した結果を labor_by_month / labor_by_vehicle に入れる。
+    """
+
+    def __init__(self):
+        self.sales_by_month = defaultdict(int)
+        self.sales_by_vehicle = defaultdict(int)
+        self.expense_by_month = defaultdict(int)      # (月, 経費区分) -> 金額
+        self.expense_by_vehicle = defaultdict(int)
+        self.labor_by_month = defaultdict(float)
+        self.labor_by_vehicle = defaultdict(float)
+        self.cash_by_month = defaultdict(int)         # (月, 入金/出金) -> 金額
+
+    # validate=True では日付・金額の空欄は MasterIndex.check_records で ValueError になる。
+    # validate=False の場合は SUMIFS と同じく空欄の金額を0とし、日付が空欄の行は月別には集計しない
+    def tap_sales(self, records):
+        by_month, by_vehicle = self.sales_by_month, self.sales_by_vehicle
+        for data in records:
+            amount = data[4]
+            if amount:
+                day = data[0]
+                if day:
+                    by_month[day.month] += amount
+                by_vehicle[data[3]] += amount
+            yield data
+
+    def tap_expenses(self, records):
+        by_month, by_vehicle = self.expense_by_month, self.expense_by_vehicle
+        for data in records:
+            amount = data[4]
+            if amount:
+                day = data[0]
+                if day:
+                    by_month[day.month, data[3]] += amount
+                by_vehicle[data[2]] += amount
+            yield data
+
+    def tap_cash(self, records):
+        by_month = self.cash_by_month
+        for data in records:
+            amount, day = data[4], data[0]
+            if amount and day:
+                by_month[day.month, data[2]] += amount
+            yield data
+
+
+class LaborAllocation:
+    """人件費の按分（ドライバーの支給額を按分比率で車両に配分する）
+
+    collect で人件費入力のレコードを通過させながら列ごとに溜め、全件の通過後に
+    ドライバー×月 -> 車両の按分比率（疎行列）と支給額から車両×月の人件費を一括で求める。
+    NumPy があれば np.bincount による1回の集計、なければ同じ計算を辞書で行う。
+    溜めるのは人件費入力の行数分（ドライバー数 × 担当車両数 × 月数）だけである。
+    """
+
+    def __init__(self, tolerance=0.01):
+        self.tolerance = tolerance  # 按分比率の合計の許容誤差（%）
+        self.drivers = []
+        self.vehicles = []
+        self.ratios = []
+        self.months = []
+        self.pays = []
+
+    def collect(self, records):
+        drivers, vehicles, ratios = self.drivers.append, self.vehicles.append, self.ratios.append
+        months, pays = self.months.append, self.pays.append
+        for data in records:
+            ratio, month, pay = data[2], data[3], data[4]
+            if ratio not in ("", None) and month not in ("", None) and pay not in ("", None):  # 空欄は按分しない
+                drivers(data[0])
+                vehicles(data[1])
+                ratios(ratio)
+                months(month)
+                pays(pay)
+            yield data
+
+    def _codes(self, values):
+        """値 -> 連番 の対応表と、各行の連番のリスト"""
+        ids = {}
+        return ids, [ids.setdefault(value, len(ids)) for value in values]
+
+    def check_ratios(self):
+        """ドライバーごと・月ごとの按分比率の合計が100%でなければ ValueError"""
+        bad_months = [m for m in set(self.months) if not (isinstance(m, int) and 1 <= m <= 12)]
+        if bad_months:
+            raise ValueError(f"人件費入力: 月は1〜12で入力してください: {bad_months[0]}")
+        driver_ids, driver_idx = self._codes(self.drivers)
+        try:
+            import numpy as np
+        except ImportError:
+            totals = defaultdict(float)
+            for driver, month, ratio in zip(self.drivers, self.months, self.ratios):
+                totals[driver, month] += ratio
+            bad = [(driver, month, total) for (driver, month), total in totals.items()
+                   if abs(total - 100) > self.tolerance]
+        else:
+            keys = np.asarray(driver_idx, dtype=np.int64) * 12 + np.asarray(self.months, dtype=np.int64) - 1
+            size = len(driver_ids) * 12
+            totals = np.bincount(keys, weights=np.asarray(self.ratios, dtype=float), minlength=size)
+            present = np.bincount(keys, minlength=size) > 0
+            names = list(driver_ids)
+            bad = [(names[key // 12], key % 12 + 1, totals[key])
+                   for key in np.flatnonzero(present & (np.abs(totals - 100) > self.tolerance)).tolist()]
+        if bad:
+            detail = "、".join(f"{driver} {month}月 {total:g}%" for driver, month, total in bad[:5])
+            more = f" ほか{len(bad) - 5}件" if len(bad) > 5 else ""
+            raise ValueError(f"人件費入力: 按分比率の合計が100%になっていません: {detail}{more}")
+
+    def by_vehicle_month(self):
+        """{車両番号: [1月, ..., 12月の按分額]}"""
+        vehicle_ids, vehicle_idx = self._codes(self.vehicles)
+        try:
+            import numpy as np
+        except ImportError:
+            result = {vehicle: [0.0] * 12 for vehicle in vehicle_ids}
+            for vehicle, month, ratio, pay in zip(self.vehicles, self.months, self.ratios, self.pays):
+                result[vehicle][month - 1] += pay * ratio / 100  # 按分額 = 支給額 × 按分比率
+            return result
+        keys = np.asarray(vehicle_idx, dtype=np.int64) * 12 + np.asarray(self.months, dtype=np.int64) - 1
+        allocated = np.asarray(self.pays, dtype=float) * np.asarray(self.ratios, dtype=float) / 100
+        matrix = np.bincount(keys, weights=allocated, minlength=len(vehicle_ids) * 12).reshape(-1, 12)
+        return dict(zip(vehicle_ids, matrix.tolist()))
+
+    def totals(self):
+        """(月 -> 人件費, 車両番号 -> 人件費) の辞書を返す（LedgerAggregator の形式）"""
+        by_month, by_vehicle = defaultdict(float), defaultdict(float)
+        for vehicle, months in self.by_vehicle_month().items():
+            by_vehicle[vehicle] = sum(months)
+            for month, amount in enumerate(months, 1):
+                if amount:
+                    by_month[month] += amount
+        return by_month, by_vehicle
+
+
+# マスタの一覧名 -> (表示名, プルダウンに使うマスタシートの列, 入力シートに名称で書くか)
+# 入力シートには取引先名・車両番号・ドライバー名を書くため、照合に使う値は一覧ごとに異なる
+MASTER_LISTS = {
+    "clients": ("取引先", 'B', True),
+    "vehicles": ("車両", 'D', False),
+    "drivers": ("ドライバー", 'H', True),
+}
+
+
+class MasterIndex:
+    """マスタ（取引先・車両・ドライバー）の索引
+
+    一覧ごとにコード -> 名称の辞書と照合用の集合を1回だけ作り、入力レコードの参照チェック
+    （1件あたり O(1)）、プルダウンの参照範囲、車両別収支の行に共通で使う。
+    """
+
+    def __init__(self, clients, vehicles, drivers):
+        self.lists = {"clients": clients, "vehicles": vehicles, "drivers": drivers}
+        self.by_code = {}
+        self.allowed = {}
+        for key, records in self.lists.items():
+            label, _, by_name = MASTER_LISTS[key]
+            by_code = {}
+            for code, name in records:
+                if code in by_code:
+                    raise ValueError(f"マスタの{label}コードが重複しています: {code}")
+                by_code[code] = name
+            self.by_code[key] = by_code
+            self.allowed[key] = set(by_code.values()) if by_name else set(by_code)
+
+    @property
+    def vehicle_codes(self):
+        return list(self.by_code["vehicles"])
+
+    def list_formula(self, key):
+        """プルダウンの参照範囲（マスタの件数に合わせる）"""
+        _, col, _ = MASTER_LISTS[key]
+        return f"=マスタ!${col}$5:${col}${4 + max(len(self.lists[key]), 1)}"
+
+    def check_records(self, spec, records, first_row=None):
+        """入力レコードをマスタ・選択肢と照合しながら返すジェネレーター
+
+        未登録の値や、必須の日付・数値の列（金額など）の空欄があればその行で ValueError を
+        送出する（ブックは保存されない）。必須でない列の空欄は許可する。
+        first_row はエラーメッセージの行番号の開始（既定は spec.first_row。追記時は追記開始行）。
+        """
+        checks = []
+        blanks = []
+        for pos, col in enumerate(spec.columns):
+            if col.formula is not None:
+                continue
+            if col.validation is None:
+                if col.required and col.kind != "text":
+                    blanks.append((pos, col.header))
+                continue
+            if isinstance(col.validation, str):
+                allowed = self.allowed[col.validation]
+            else:
+                allowed = frozenset(col.validation)
+            checks.append((pos, allowed, col.required, col.header))
+        if not checks and not blanks:
+            yield from records
+            return
+        for row_idx, data in enumerate(records, first_row or spec.first_row):
+            for pos, allowed, required, header in checks:
+                value = data[pos]
+                if value not in allowed and (required or value not in ("", None)):
+                    raise ValueError(f"{spec.name} {row_idx}行目: {header}「{value}」がマスタ・選択肢にありません")
+            for pos, header in blanks:
+                if data[pos] is None or data[pos] == "":
+                    raise ValueError(f"{spec.name} {row_idx}行目: {header}が空欄です")
+            yield data
+
+
+@dataclass(slots=True)
+class FiscalPeriod:
+    """会計年度（start_month 月始まり。年度は開始月の属する年で表す: 2025年度 = 2025/04〜2026/03）
+
+    集計シートは月番号（MONTH(日付)）で集計するため、1つのワークブックには1会計年度分の
+    データだけを入れる（年をまたぐと2025年1月と2026年1月が同じ列に合算される）。
+    """
+    year: int
+    start_month: int = 1
+
+    def __post_init__(self):
+        if not 1 <= self.start_month <= 12:
+            raise ValueError(f"年度の開始月は1〜12で指定してください: {self.start_month}")
+
+    @classmethod
+    def of(cls, day, start_month=1):
+        """日付の属する会計年度"""
+        return cls(day.year if day.month >= start_month else day.year - 1, start_month)
+
+    @property
+    def months(self):
+        """集計シートの列順の月（4月始まりなら 4, 5, ..., 12, 1, 2, 3）"""
+        return [(self.start_month - 1 + i) % 12 + 1 for i in range(12)]
+
+    @property
+    def start(self):
+        return date(self.year, self.start_month, 1)
+
+    @property
+    def end(self):
+        """翌年度の初日（この日を含まない）"""
+        return date(self.year + 1, self.start_month, 1)
+
+    @property
+    def span(self):
+        last = date(self.year + (self.start_month != 1), self.months[-1], 1)
+        return f"{self.start:%Y/%m}〜{last:%Y/%m}"
+
+    @property
+    def label(self):
+        return f"{self.year}年度（{self.span}）"
+
+    def check_records(self, spec, records, first_row=None):
+        """日付列が年度内かを確認しながら入力レコードを返すジェネレーター（日付列のない入力はそのまま）"""
+        pos = next((pos for pos, col in enumerate(spec.columns) if col.kind == "date"), None)
+        if pos is None:
+            yield from records
+            return
+        start, end = self.start, self.end
+        for row_idx, data in enumerate(records, first_row or spec.first_row):
+            day = data[pos]
+            if day is not None and day != "":
+                if isinstance(day, datetime):
+                    day = day.date()
+                if not start <= day < end:
+                    raise ValueError(f"{spec.name} {row_idx}行目: 日付 {day:%Y/%m/%d} が{self.label}の範囲外です")
+            yield data
+
+
+@dataclass(slots=True)
+class SingleFiscalYear:
+    """年度を指定しない場合に、入力レコードの日付が1会計年度に収まっているかを確認する
+
+    集計は月番号で行うため、2025年1月と2026年1月のデータがあると同じ列に合算されてしまう。
+    最初の日付の年度を覚えておき、別の年度の日付があれば ValueError とする。
+    """
+    start_month: int = 1
+    period: FiscalPeriod = None
+    first: str = None  # 最初の日付の位置（エラーメッセージ用）
+
+    def check_records(self, spec, records, first_row=None):
+        """日付列の年度を確認しながら入力レコードを返すジェネレーター（日付列のない入力はそのまま）"""
+        pos = next((pos for pos, col in enumerate(spec.columns) if col.kind == "date"), None)
+        if pos is None:
+            yield from records
+            return
+        for row_idx, data in enumerate(records, first_row or spec.first_row):
+            day = data[pos]
+            if day is not None and day != "":
+                if isinstance(day, datetime):
+                    day = day.date()
+                period = FiscalPeriod.of(day, self.start_month)
+                if self.period is None:
+                    self.period, self.first = period, f"{spec.name} {row_idx}行目"
+                elif period.year != self.period.year:
+                    raise ValueError(
+                        f"{spec.name} {row_idx}行目: 日付 {day:%Y/%m/%d} は{period.label}で、"
+                        f"{self.first}の{self.period.label}と異なります。複数年度のデータは fiscal_year を"
+                        f"指定するか transport_excel_periods で年度ごとのブックに分けてください")
+            yield data
+
+
+# =========================
+# シート定義
+# =========================
+# 各シートのタイトル・列幅・列構成をデータとして宣言し、共通の処理で書き出す。
+# 入力シートは LedgerSpec を1つ追加するだけで増やせる（HIGHWAY_SPEC・DAILY_REPORT_SPEC を参照）
+COLUMN_STYLES = {"date": "date", "yen": "yen", "percent": "percent"}
+
+
+@dataclass(slots=True)
+class Column:
+    """入力シートの1列
+
+    kind は値の種類（text / date / yen / percent / int / number）で、表示形式と
+    CSV 読み込み時の型変換を決める。percent はレコードに百分率（50 = 50%）で持つ。
+    formula を指定した列は '=MONTH(A{row})' の {row} を行番号に置き換えた数式になり、
+    レコードの同じ位置の値は使わない。validation はマスタのプルダウン
+    （"clients" / "vehicles" / "drivers"）か選択肢のリスト。
+    """
+    header: str
+    width: float
+    kind: str = "text"
+    formula: str = None
+    validation: object = None
+    required: bool = True
+
+    @property
+    def style(self):
+        return COLUMN_STYLES.get(self.kind)
+
+
+@dataclass(slots=True)
+class SheetSpec:
+    """シートの作成とタイトル行の定義"""
+    name: str
+    title: str
+    widths: dict
+    merge_to: str
+    title_style: str = "title"
+    index: int = None
+
+
+@dataclass(slots=True)
+class LedgerSpec:
+    """入力シートの定義（レコードは columns と同じ並びのリスト）"""
+    name: str
+    title: str
+    arg: str  # create_transport_management_excel の引数名
+    columns: list
+    sample: list = field(default_factory=list)
+    first_row: int = 4
+    title_style: str = "title"
+    index: int = None
+
+    @property
+    def widths(self):
+        return {get_column_letter(i): col.width for i, col in enumerate(self.columns, 1)}
+
+    @property
+    def merge_to(self):
+        return get_column_letter(len(self.columns))
+
+    def letter(self, header):
+        """見出し名 -> 列文字"""
+        for i, col in enumerate(self.columns, 1):
+            if col.header == header:
+                return get_column_letter(i)
+        raise KeyError(f"{self.name} に列「{header}」がありません")
+
+    def range(self, header, last_row):
+        """集計式から参照する列の実データ範囲"""
+        return _ledger_range(self.name, self.letter(header), self.first_row, last_row)
+
+    def row_plan(self):
+        """列ごとの (レコード位置, 数式, 百分率か, 名前付きスタイル)"""
+        return [(pos, col.formula, col.kind == "percent", col.style)
+                for pos, col in enumerate(self.columns)]
+
+    def row_values(self, data, row_idx, plan=None):
+        """1レコード分の (値, 名前付きスタイル) を列順に返す（生成時と追記時で共用）"""
+        return [(formula.format(row=row_idx) if formula
+                 else data[pos] / 100 if percent and data[pos] not in ("", None) else data[pos], style)
+                for pos, formula, percent, style in plan or self.row_plan()]
+
+
+SALES_SPEC = LedgerSpec("売上入力", "売上データ入力", "sales", [
+    Column("日付", 12, "date"),
+    Column("月", 8, formula='=MONTH(A{row})'),  # 月を自動抽出
+    Column("取引先名", 20, validation="clients"),
+    Column("車両番号", 15, validation="vehicles"),
+    Column("売上金額", 15, "yen"),
+    Column("備考", 20, required=False),
+], sample_sales)
+
+EXPENSE_SPEC = LedgerSpec("経費入力", "経費データ入力", "expenses", [
+    Column("日付", 12, "date"),
+    Column("月", 8, formula='=MONTH(A{row})'),
+    Column("車両番号", 15, validation="vehicles"),
+    Column("経費区分", 15, validation=["燃料費", "修理費", "保険料", "リース料", "その他"]),
+    Column("金額", 15, "yen"),
+    Column("備考", 20, required=False),
+], sample_expenses)
+
+LABOR_SPEC = LedgerSpec("人件費入力", "人件費データ入力", "labor", [
+    Column("ドライバー名", 15, validation="drivers"),
+    Column("車両番号", 15, validation="vehicles"),
+    Column("按分比率(%)", 12, "percent"),
+    Column("月", 8, "int"),
+    Column("支給額", 15, "yen"),
+    Column("按分額", 15, "yen", formula='=E{row}*C{row}'),
+    Column("備考", 20, required=False),
+], sample_labor)
+
+CASH_SPEC = LedgerSpec("資金繰り入力", "資金繰りデータ入力", "cash", [
+    Column("日付", 12, "date"),
+    Column("月", 8, formula='=MONTH(A{row})'),
+    Column("入金/出金", 12, validation=["入金", "出金"]),
+    Column("科目", 18, validation=["売上入金", "燃料費支払", "リース料支払", "借入返済", "利息", "その他"]),
+    Column("金額", 15, "yen"),
+    Column("備考", 20, required=False),
+], sample_cash)
+
+# 追加の入力シート（ledger_specs=LEDGER_SPECS + [HIGHWAY_SPEC] のように指定して使う）
+HIGHWAY_SPEC = LedgerSpec("高速代入力", "高速代データ入力", "highway", [
+    Column("日付", 12, "date"),
+    Column("月", 8, formula='=MONTH(A{row})'),
+    Column("車両番号", 15, validation="vehicles"),
+    Column("ドライバー名", 15, validation="drivers"),
+    Column("区間", 25, required=False),
+    Column("金額", 15, "yen"),
+    Column("備考", 20, required=False),
+])
+
+DAILY_REPORT_SPEC = LedgerSpec("運行日報", "運行日報入力", "daily_report", [
+    Column("日付", 12, "date"),
+    Column("月", 8, formula='=MONTH(A{row})'),
+    Column("車両番号", 15, validation="vehicles"),
+    Column("ドライバー名", 15, validation="drivers"),
+    Column("取引先名", 20, validation="clients", required=False),
+    Column("走行距離(km)", 12, "number"),
+    Column("稼働時間(h)", 12, "number", required=False),
+    Column("備考", 20, required=False),
+])
+
+# 集計シートが参照する標準の入力シート（この順に出力する）
+LEDGER_SPECS = [SALES_SPEC, EXPENSE_SPEC, LABOR_SPEC, CASH_SPEC]
+OPTIONAL_LEDGER_SPECS = [HIGHWAY_SPEC, DAILY_REPORT_SPEC]
+
+_MONTH_WIDTHS = {get_column_letter(col): 12 for col in range(2, 15)}
+MASTER_SHEET = SheetSpec("マスタ", "マスタデータ管理", {'A': 15, 'B': 20, 'D': 15, 'E': 20, 'G': 15, 'H': 20}, 'F')
+PL_SHEET = SheetSpec("損益計算表", "月次損益計算表", {'A': 20, **_MONTH_WIDTHS}, 'P')
+VEHICLE_SHEET = SheetSpec("車両別収支", "車両別収支一覧",
+                          {**{get_column_letter(col): 15 for col in range(1, 7)}, 'G': 10, 'H': 3, 'I': 20, 'J': 15},
+                          'G')
+CASHFLOW_SHEET = SheetSpec("資金繰り表", "月次資金繰り表", {'A': 15, **_MONTH_WIDTHS}, 'N')
+DASHBOARD_SHEET = SheetSpec("ダッシュボード", "経営ダッシュボード", {'A': 20, 'B': 20, 'C': 15, 'D': 35}, 'H',
+                            title_style="dashboard_title")
+
+
+def _open_sheet(wb, spec, period=None):
+    """シート定義からシートを作成し、タイトル行まで書き込む（period を渡すとタイトルに年度を付ける）"""
+    ws = _prepare_sheet(wb, spec.name, spec.widths, index=spec.index)
+    title = f"{spec.title}　{period.label}" if period is not None else spec.title
+    _write_title(ws, title, spec.merge_to, style=spec.title_style)
+    return ws
+
+
+def _previous_column(letter):
+    return get_column_letter(column_index_from_string(letter) - 1)
+
+
+def _ledger_rows(ws, spec, records):
+    """入力レコードをシートの行に変換するジェネレーター
+
+    列ごとの処理は row_plan で事前に確定させ、1行あたりの処理を値の取り出しと
+    セル生成だけにする。名前付きスタイルの解決は列ごとに1回だけ行い、各セルには
+    解決済みのスタイルをコピーする（スタイルなしの列はセルを作らず値のまま渡す）。
+    """
+    plan = spec.row_plan()
+    styled_cell = getattr(ws, "styled_cell", None)
+    if styled_cell is not None:  # openpyxl 以外の書き出し先にはスタイル名のまま渡す
+        for row_idx, data in enumerate(records, spec.first_row):
+            yield [value if style is None else styled_cell(value, style)
+                   for value, style in spec.row_values(data, row_idx, plan)]
+        return
+    resolved = {style: _cell(ws, None, style)._style for _, _, _, style in plan if style is not None}
+    for row_idx, data in enumerate(records, spec.first_row):
+        row = []
+        for value, style in spec.row_values(data, row_idx, plan):
+            if style is not None:
+                value = WriteOnlyCell(ws, value=value)
+                value._style = copy(resolved[style])
+            row.append(value)
+        yield row
+
+
+def _render_ledger(wb, spec, records, lists, agg=None):
+    """入力シートを定義どおりに書き出し、最終行番号を返す（データなしの場合は first_row - 1）"""
+    ws = _open_sheet(wb, spec)
+    ws.append(_header_row(ws, [col.header for col in spec.columns]))
+
+    tap = getattr(agg, f"tap_{spec.arg}", None)  # 集計対象の入力シートのみ
+    if tap is not None:
+        records = tap(records)
+    last_row = _append_rows(ws, _ledger_rows(ws, spec, records), spec.first_row)
+
+    # データ検証（プルダウン）設定
+    for i, col in enumerate(spec.columns, 1):
+        if col.validation is None:
+            continue
+        if isinstance(col.validation, str):
+            formula1 = lists[col.validation]
+        else:
+            formula1 = '"' + ",".join(col.validation) + '"'
+        _add_validation(ws, DataValidation(type="list", formula1=formula1, allow_blank=True),
+                        get_column_letter(i), spec.first_row, last_row)
+    return last_row
+
+
+# 車両ランキング（ダッシュボードの TOP3・車両別収支グラフ）を数式で書く車両数の上限。
+# これより多い車両では書き出し時に集計した利益から Python 側で上位を選ぶ
+RANKING_FORMULA_MAX_VEHICLES = 100
+
+
+def _top_vehicles(vehicles, profits, k):
+    """利益上位 k 台の (車両番号, 利益)。全車両をソートせずヒープで選ぶ（同額は車両一覧順）"""
+    return [(vehicle, profits[vehicle]) for vehicle in heapq.nlargest(k, vehicles, key=profits.__getitem__)]
+
+
+def _profit_rank_formula(row_idx, last_row):
+    """車両別収支の利益順位（同額は車両一覧順に別の順位にする。_top_vehicles と同じ並び）"""
+    return f'=COUNTIF($E$4:$E${last_row},">"&E{row_idx})+COUNTIF($E$4:E{row_idx},E{row_idx})'
+
+
+def _rank_formulas(rank, last_row, sheet=""):
+    """車両別収支の利益順位の列から rank 位を求める (車両番号, 利益) の数式
+
+    利益の値で探すと同額の車両がすべて最初の車両になるため、同額でも重ならない順位で探す。
+    """
+    prefix = f"{sheet}!" if sheet else ""
+    last_row = max(last_row, 4)
+    position = f'MATCH({rank},{prefix}$G$4:$G${last_row},0)'
+    return f'=INDEX({prefix}$A$4:$A${last_row},{position})', f'=INDEX({prefix}$E$4:$E${last_row},{position})'
+
+
+def _vehicle_chart_rows(ws, vehicles, profits, top_n, total_row):
+    """車両別収支グラフ用の行（利益上位 top_n 台と、残りをまとめた「その他」）
+
+    グラフに全車両を並べると数百台の車両では描画もファイルも重くなるため、
+    参照範囲を上位 top_n 台 + 1 行に限定する。profits（車両番号 -> 利益）があれば
+    Python 側で上位を選び、なければ車両別収支の利益順位の列への INDEX-MATCH 式で求める。
+    """
+    shown = min(top_n, len(vehicles))
+    rows = []
+    if profits is not None:
+        for vehicle, profit in _top_vehicles(vehicles, profits, shown):
+            rows.append([vehicle, _cell(ws, profit, "yen")])
+    else:
+        for rank in range(1, shown + 1):
+            vehicle, profit = _rank_formulas(rank, 3 + len(vehicles))
+            rows.append([vehicle, _cell(ws, profit, "yen")])
+    if len(vehicles) > shown:
+        if profits is not None:
+            others = sum(profits.values()) - sum(row[1].value for row in rows)
+        else:
+            others = f'=E{total_row}-SUM(J4:J{3 + shown})'
+        rows.append(["その他", _cell(ws, others, "yen")])
+    return rows
+
+
+def _ranking_rows(ws, vehicles, profits, top_k):
+    """ダッシュボードの車両別収支ランキング（順位・車両番号・利益）の行"""
+    shown = min(top_k, len(vehicles))
+    if profits is not None:
+        return [[rank, vehicle, _cell(ws, profit, "yen_label")]
+                for rank, (vehicle, profit) in enumerate(_top_vehicles(vehicles, profits, shown), 1)]
+    rows = []
+    for rank in range(1, shown + 1):
+        vehicle, profit = _rank_formulas(rank, 3 + len(vehicles), sheet="車両別収支")
+        rows.append([rank, vehicle, _cell(ws, profit, "yen_label")])
+    return rows
+
+
+def _line_chart(title, ws, rows, categories, last_col=13):
+    """集計表の行（A列が系列名、B〜M列が1〜12月）を系列とする折れ線グラフ"""
+    from openpyxl.chart import LineChart, Reference
+
+    chart = LineChart()
+    chart.title = title
+    chart.height, chart.width = 7.5, 16
+    chart.y_axis.numFmt = '#,##0'
+    chart.x_axis.delete = chart.y_axis.delete = False  # openpyxl 3.1 の既定では軸が非表示になる
+    for row in rows:
+        chart.add_data(Reference(ws, min_col=1, max_col=last_col, min_row=row, max_row=row),
+                       from_rows=True, titles_from_data=True)
+    chart.set_categories(categories)
+    return chart
+
+
+def _add_dashboard_charts(ws_dashboard, ws_pl, ws_cashflow, ws_vehicle, chart_rows, forecast_months=0):
+    """ダッシュボードに損益推移・資金残高推移・車両別収支のグラフを配置する
+
+    参照範囲は集計シートの月次12列と、車両別収支のグラフ用上位表（chart_rows 行）に限定する。
+    資金繰り予測がある場合（forecast_months か月分）は予測残高のグラフも加える。
+    """
+    from openpyxl.chart import BarChart, Reference
+
+    months = Reference(ws_pl, min_col=2, max_col=13, min_row=3, max_row=3)
+    # 売上高（実績）・経費合計・営業利益
+    ws_dashboard.add_chart(_line_chart("損益推移（月次）", ws_pl, [5, 14, 16], months), "F5")
+    # 月末残高
+    ws_dashboard.add_chart(
+        _line_chart("資金残高推移（月次）", ws_cashflow, [7],
+                    Reference(ws_cashflow, min_col=2, max_col=13, min_row=3, max_row=3)),
+        "F21")
+
+    chart = BarChart()
+    chart.type = "col"
+    chart.title = "車両別収支（利益上位）"
+    chart.height, chart.width = 7.5, 16
+    chart.y_axis.numFmt = '#,##0'
+    chart.x_axis.delete = chart.y_axis.delete = False
+    chart.legend = None
+    if chart_rows:
+        chart.add_data(Reference(ws_vehicle, min_col=10, min_row=3, max_row=3 + chart_rows), titles_from_data=True)
+        chart.set_categories(Reference(ws_vehicle, min_col=9, min_row=4, max_row=3 + chart_rows))
+    ws_dashboard.add_chart(chart, "F37")
+
+    if forecast_months:
+        ws_dashboard.add_chart(
+            _line_chart("予測資金残高（下位5%・中央値・上位5%）", ws_cashflow, FORECAST_BALANCE_ROWS,
+                        Reference(ws_cashflow, min_col=2, max_col=1 + forecast_months,
+                                  min_row=FORECAST_HEADER_ROW, max_row=FORECAST_HEADER_ROW),
+                        last_col=1 + forecast_months),
+            "F53")
+
+
+# =========================
+# 資金繰り予測の出力
+# =========================
+# 資金繰り表の実績（3〜7行）の下に予測ブロックを置く（列は予測の月順、B列が予測の初月）
+FORECAST_HEADER_ROW = 10
+FORECAST_BALANCE_ROWS = [13, 14, 15]  # 月末残高（下位5%・中央値・上位5%）
+
+
+def _yen_text(amount):
+    """金額の表示（1万円単位で割り切れれば「50万円」、それ以外は「123,456円」）"""
+    return f"{amount // 10000:,}万円" if amount >= 10000 and amount % 10000 == 0 else f"{amount:,}円"
+
+
+def _forecast_month(day):
+    return f"{day.year}/{day.month:02d}"
+
+
+def _write_forecast(ws, result, threshold):
+    """資金繰り表に予測（入出金・月末残高の分布・残高不足の確率）を書き出す"""
+    from openpyxl.formatting.rule import CellIsRule
+
+    ws.append([])
+    ws.append([_cell(ws, f"資金繰り予測（{result.paths:,}シナリオ・予測開始時の残高 "
+                         f"{result.opening_balance:,}円）", "subtitle")])
+    ws.append([_cell(ws, "項目", "header_label")]
+              + _header_row(ws, [_forecast_month(day) for day in result.months], style="header_center"))
+    for item, values, style in [
+        ("入金予測（中央値）", result.cash_in, "yen"),
+        ("出金予測（中央値）", result.cash_out, "yen"),
+        ("月末残高（下位5%）", result.balance_low, "yen"),
+        ("月末残高（中央値）", result.balance_median, "yen"),
+        ("月末残高（上位5%）", result.balance_high, "yen"),
+        ("残高不足の確率", result.below_probability, "percent1"),
+    ]:
+        ws.append([_cell(ws, item, "bold")] + [_cell(ws, value, style) for value in values])
+
+    last_col = get_column_letter(1 + len(result.months))
+    ws.conditional_formatting.add(f'B{FORECAST_BALANCE_ROWS[0]}:{last_col}{FORECAST_BALANCE_ROWS[-1]}',
+        CellIsRule(operator='lessThan', formula=[str(threshold)], fill=red_fill))
+
+    ws.append([])
+    for item, value in zip(["資金ショートの見込み", "残高不足の可能性"], _forecast_notes(result, threshold)):
+        ws.append([_cell(ws, item, "bold"), value])
+
+
+def _forecast_notes(result, threshold):
+    """資金ショートの見込み（中央値）と残高不足の可能性（下位5%・確率）の説明文"""
+    limit = _yen_text(threshold)
+    if result.first_below is not None:
+        expected = f"⚠ {_forecast_month(result.first_below)} に資金残高が{limit}を下回る見込みです（中央値）"
+    else:
+        expected = f"予測期間（{len(result.months)}か月）内に資金残高が{limit}を下回る見込みはありません（中央値）"
+    risk = f"{len(result.months)}か月以内に{limit}を下回る確率: {result.shortfall_probability:.1%}"
+    if result.first_at_risk is not None:
+        risk += f"（早ければ {_forecast_month(result.first_at_risk)}）"
+    return [expected, risk]
+
+
+# =========================
+# 入力の指紋・再現可能な出力
+# =========================
+# 入力レコードと設定のハッシュ（SHA-256）を文書プロパティに記録し、同じ入力での再生成を省く。
+# 保存したブックは ZIP の時刻・文書プロパティの日時を固定して最大圧縮で書き直すため、
+# 同じ入力からは常にバイト単位で同じファイルができる
+FINGERPRINT_PROPERTY = "input_fingerprint"
+CUSTOM_PROPS_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/custom-properties}"
+_MODIFIED_RE = re.compile(rb"(<dcterms:modified[^>]*>)[^<]*")
+
+
+def _reproducible_timestamp():
+    """ZIP・文書プロパティに書く固定の日時（環境変数 SOURCE_DATE_EPOCH があればその時刻）"""
+    epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    if epoch:
+        return datetime.fromtimestamp(int(epoch), timezone.utc).replace(tzinfo=None)
+    return datetime(1980, 1, 1)  # ZIP で表せる最も古い日時
+
+
+# 生成結果を左右するモジュール（入力の読み込み・計算・資金繰り予測・XlsxWriter の書き出しを含む）
+GENERATOR_MODULES = ("create_transport_excel.py", "transport_excel_loader.py", "transport_excel_calc.py",
+                     "transport_excel_forecast.py", "transport_excel_xlsxwriter.py")
+
+
+@lru_cache(maxsize=None)
+def _generator_digest():
+    """生成処理のソースのハッシュ（どのモジュールを変更しても指紋が変わるようにする）
+
+    省略の判定だけの起動を速く保つため、モジュールは読み込まずにファイルの内容をハッシュする。
+    """
+    digest = hashlib.sha256()
+    base = os.path.dirname(os.path.abspath(__file__))
+    for name in GENERATOR_MODULES:
+        digest.update(f"\0{name}\0".encode("utf-8"))
+        try:
+            with open(os.path.join(base, name), "rb") as f:
+                digest.update(f.read())
+        except FileNotFoundError:
+            pass
+    return digest.digest()
+
+
+def _normalized(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class InputFingerprint:
+    """入力レコードと設定の指紋
+
+    tap で入力レコードを包むと、書き出されるレコードを通過時にハッシュへ加える
+    （ジェネレーターの入力でも書き出しと同じ1パスで求められる）。
+    """
+
+    def __init__(self, config):
+        self._hash = hashlib.sha256(_generator_digest())
+        self._hash.update(json.dumps(config, sort_keys=True, ensure_ascii=False, default=repr).encode("utf-8"))
+
+    def tap(self, name, records):
+        update = self._hash.update
+        update(f"\0{name}\0".encode("utf-8"))
+        for data in records:
+            update(repr([_normalized(value) for value in data]).encode("utf-8"))
+            update(b"\n")
+            yield data
+
+    def add(self, name, records):
+        for _ in self.tap(name, records):
+            pass
+
+    def add_text(self, text):
+        self._hash.update(f"\0{text}".encode("utf-8"))
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+def stored_fingerprint(path):
+    """ブックに記録された入力の指紋（ファイルや記録がなければ None）"""
+    try:
+        zin = zipfile.ZipFile(path)
+    except (FileNotFoundError, zipfile.BadZipFile):
+        return None
+    with zin:
+        if "docProps/custom.xml" not in zin.namelist():
+            return None
+        for prop in ElementTree.fromstring(zin.read("docProps/custom.xml")).iter(f"{CUSTOM_PROPS_NS}property"):
+            if prop.get("name") == FINGERPRINT_PROPERTY and len(prop):
+                return prop[0].text
+    return None
+
+
+def _repack(path, timestamp, rewrite=None):
+    """保存したブックを固定の日時・最大圧縮（deflate レベル9）で書き直す
+
+    rewrite は {ZIP 内のパス: XML のバイト列を書き換える関数}（書き出し先ごとの後処理）。
+    """
+    date_time = timestamp.timetuple()[:6]
+    modified = timestamp.strftime("%Y-%m-%dT%H:%M:%SZ").encode("ascii")
+    rewrite = rewrite or {}
+    fd, tmp_path = tempfile.mkstemp(suffix=".xlsx", dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    try:
+        with zipfile.ZipFile(path) as zin, zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as zout:
+            for info in zin.infolist():
+                entry = zipfile.ZipInfo(info.filename, date_time=date_time)
+                entry.compress_type = zipfile.ZIP_DEFLATED
+                entry._compresslevel = 9  # ZipFile.open は ZipInfo の圧縮レベルを使う
+                entry.external_attr = 0o600 << 16
+                with zin.open(info) as src, zout.open(entry, "w", force_zip64=True) as dst:
+                    if info.filename == "docProps/core.xml":  # openpyxl は保存時の現在時刻を書く
+                        dst.write(_MODIFIED_RE.sub(rb"\g<1>" + modified, src.read()))
+                    elif info.filename in rewrite:
+                        dst.write(rewrite[info.filename](src.read()))
+                    else:
+                        shutil.copyfileobj(src, dst, 1 << 20)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _discard_write_only(wb):
+    """書き出しを中断した write_only ブックの書きかけシートを閉じ、一時ファイルを削除する"""
+    for ws in wb.worksheets:
+        writer = ws._writer  # openpyxl 内部: シートごとの一時ファイルへの書き出し
+        if writer is None:
+            continue
+        if ws._rows is not None:
+            ws._rows.close()
+        writer.close()
+        writer.cleanup()
+
+
+def create_transport_management_excel(output_path=DEFAULT_OUTPUT, streaming=False,
+                                      sales=None, expenses=None, labor=None, cash=None,
+                                      summary="formulas", clients=None, vehicles=None, drivers=None,
+                                      ledger_specs=None, on_stage=None, validate=True, chart_top_n=10,
+                                      top_k=3, ranking="auto", calculate=False, fiscal_year=None,
+                                      fiscal_start_month=1, opening_balance=1000000, cash_threshold=500000,
+                                      forecast=None, skip_unchanged=False, input_fingerprint=None,
+                                      backend="openpyxl", **extra_ledgers):
+    """運送会社向け経営管理Excelファイルを作成
+
+    streaming=True の場合は openpyxl の write_only ワークブックを使い、
+    入力シートを行ジェネレーターから1行ずつ書き出す。sales/expenses/labor/cash に
+    イテラブル（ジェネレーター可）を渡せば、行数に関わらずメモリ使用量は一定に保たれる。
+    clients/vehicles/drivers はマスタ（[コード, 名称] のリスト）。
+    未指定の入力・マスタはサンプルデータで埋める。
+    validate=True の場合、入力レコードの取引先名・車両番号・ドライバー名と区分（経費区分など）を
+    書き出し前にマスタ・選択肢と照合し、未登録の値があれば ValueError で中断する。
+    人件費入力の按分比率がドライバー・月ごとに合計100%でない場合も ValueError とする。
+
+    ダッシュボードには損益推移・資金残高推移・車両別収支のグラフを配置する。
+    車両別収支のグラフは利益上位 chart_top_n 台と「その他」に限定する。
+
+    ダッシュボードの車両別収支ランキングには利益上位 top_k 台を載せる。ranking は順位の求め方:
+        "formulas" 車両別収支の利益順位の列（COUNTIF）への INDEX-MATCH 式（入力を直すと追随する）
+        "values"   書き出し時に集計した利益からヒープで選んだ上位 k 台の値（追記には追随しない）。
+                   利益順位の列もランキング・グラフに載せる上位の車両だけに値で書く
+        "auto"     車両が RANKING_FORMULA_MAX_VEHICLES 台以下なら "formulas"、超えれば "values"
+    summary="values" では常に "values" になる。
+
+    ledger_specs は出力する入力シートの定義（既定は LEDGER_SPECS）。追加した入力シートの
+    レコードは LedgerSpec.arg をキーワード引数名として渡す（例: highway=records）。
+
+    summary は集計シート（損益計算表・車両別収支・資金繰り表）の書き方:
+        "formulas" 入力シートの実データ範囲に限定した SUMIF/SUMIFS 数式
+        "values"   LedgerAggregator で書き出し時に集計した値
+
+    fiscal_year を指定すると、その会計年度（fiscal_start_month 月始まり）のブックとして、
+    集計シートの列を年度の月順（4月始まりなら4月〜3月）に並べ、validate=True では日付が
+    年度外の入力レコードを ValueError とする。集計は月番号で行うため、複数年度のデータは
+    transport_excel_periods で年度ごとのブックに分けて出力する（fiscal_year を指定しない場合も
+    validate=True では入力の日付が2つ以上の年度にまたがると ValueError とする）。
+    opening_balance は期首の資金残高。
+
+    cash_threshold は資金残高の警告の閾値（資金繰り表・ダッシュボードで強調する）。
+    forecast に transport_excel_forecast.CashForecast を渡すと、実績の翌月以降の月末残高を
+    モンテカルロ法で予測し、資金繰り表の実績の下と、ダッシュボード（資金ショートの見込み月・
+    予測残高のグラフ）に書き出す（要 NumPy）。
+
+    入力レコードと設定の指紋（SHA-256）を文書プロパティ input_fingerprint に記録する。
+    skip_unchanged=True の場合、output_path のブックの指紋が一致すれば生成せずに終了する。
+    入力をリストで渡した場合は書き出し前に指紋を求めるが、ジェネレーターの入力は
+    書き出しながらでないと求められないため、入力ファイルのハッシュなど入力の同一性を表す
+    文字列を input_fingerprint に渡したときだけ省略できる
+    （transport_excel_loader.fingerprint_sources）。
+    保存したブックは ZIP の時刻と作成・更新日時を固定し（SOURCE_DATE_EPOCH があればその時刻）、
+    最大圧縮で書き直すため、同じ入力からはバイト単位で同じファイルができる。
+
+    backend はワークブックの書き出し先:
+        "openpyxl"   openpyxl（streaming=True では write_only モード）
+        "xlsxwriter" XlsxWriter の constant_memory モード（transport_excel_xlsxwriter。
+                     セルオブジェクトを作らないため大量の入力行を速く書き出せる。常に行を順に書き出す）
+    シートの内容（値・数式・書式・データ検証・条件付き書式・セル結合・グラフ）はどちらも同じになる。
+
+    calculate=True の場合、保存後に transport_excel_calc で数式を評価して計算結果を書き込む
+    （openpyxl の data_only=True や pandas で読んだときに集計セルが None にならない）。
+
+    on_stage は工程の区切りごとに on_stage(工程名, wb) の形で呼ばれるコールバック
+    （計測用。transport_excel_profile.GenerationProfiler を渡すと工程ごとの所要時間・
+    セル数・メモリ使用量を記録できる）。工程名はシート名（"マスタ"・"売上入力" など）と
+    "保存"（calculate=True では続けて "計算"）で、完了時に None を渡す。未指定の場合は何もしない。
+    """
+    if summary not in ("formulas", "values"):
+        raise ValueError(f"summary は 'formulas' または 'values' を指定してください: {summary}")
+    if ranking not in ("auto", "formulas", "values"):
+        raise ValueError(f"ranking は 'auto'・'formulas'・'values' のいずれかを指定してください: {ranking}")
+    if backend not in WRITER_BACKENDS:
+        raise ValueError(f"backend は {'・'.join(repr(b) for b in WRITER_BACKENDS)} のいずれかを指定してください: {backend}")
+    agg = LedgerAggregator() if summary == "values" else None
+
+    ledger_specs = LEDGER_SPECS if ledger_specs is None else ledger_specs
+    specs = {spec.arg: spec for spec in ledger_specs}
+    missing = [spec.name for spec in LEDGER_SPECS if spec.arg not in specs]
+    if missing:
+        raise ValueError(f"集計に必要な入力シートがありません: {', '.join(missing)}")
+    unknown = set(extra_ledgers) - set(specs)
+    if unknown:
+        raise TypeError(f"入力シートの定義がない引数です: {', '.join(sorted(unknown))}")
+    inputs = {"sales": sales, "expenses": expenses, "labor": labor, "cash": cash, **extra_ledgers}
+    stage = on_stage or (lambda name, wb: None)
+    period = FiscalPeriod(fiscal_year, fiscal_start_month) if fiscal_year is not None else None
+    months = (period or FiscalPeriod(0, fiscal_start_month)).months  # 年度の指定がなくても列順は開始月に従う
+    master = MasterIndex(sample_clients if clients is None else clients,
+                         sample_vehicles if vehicles is None else vehicles,
+                         sample_drivers if drivers is None else drivers)
+
+    # 入力の指紋（リストの入力か input_fingerprint の指定があれば書き出し前に求めて比較する）
+    hasher = InputFingerprint({
+        "streaming": streaming, "summary": summary, "master": master.lists,
+        "ledger_specs": [repr(spec) for spec in ledger_specs], "validate": validate,
+        "chart_top_n": chart_top_n, "top_k": top_k, "ranking": ranking, "calculate": calculate,
+        "fiscal_year": fiscal_year, "fiscal_start_month": fiscal_start_month, "opening_balance": opening_balance,
+        "cash_threshold": cash_threshold, "forecast": repr(forecast) if forecast is not None else None,
+        "backend": backend,
+    })
+    fingerprint = None
+    if input_fingerprint is not None:
+        hasher.add_text(input_fingerprint)
+        fingerprint = hasher.hexdigest()
+    elif all(isinstance(inputs.get(spec.arg), (list, tuple, type(None))) for spec in ledger_specs):
+        for spec in ledger_specs:
+            records = inputs.get(spec.arg)
+            hasher.add(spec.name, spec.sample if records is None else records)
+        fingerprint = hasher.hexdigest()
+    if fingerprint is not None and skip_unchanged and stored_fingerprint(output_path) == fingerprint:
+        print(f"⏭ 入力に変更がないため生成を省略しました: {output_path}")
+        return output_path
+
+    # 条件付き書式・グラフのモジュールは使う時点で読み込む（生成を省略する起動では読み込まない）
+    from openpyxl.formatting.rule import CellIsRule
 
-def create_transport_management_excel():
-    """運送会社向け経営管理Excelファイルを作成"""
-    
     # ワークブック作成
-    wb = Workbook()
-    wb.remove(wb.active)  # デフォルトシートを削除
-    
-    # カラーパレット定義
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_font = Font(color="FFFFFF", bold=True, size=11)
-    title_font = Font(bold=True, size=14)
-    subtitle_font = Font(bold=True, size=12)
-    
-    # 罫線スタイル
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
+    if backend == "xlsxwriter":
+        from transport_excel_xlsxwriter import XlsxWriterWorkbook  # XlsxWriter は使う場合だけ読み込む
+        wb = XlsxWriterWorkbook(output_path)
+    else:
+        wb = Workbook(write_only=streaming)
+        if not streaming:
+            wb.remove(wb.active)  # デフォルトシートを削除
+    _register_styles(wb)
+    if period is not None:
+        # 集計値の読み出し（transport_excel_reader）で年度を特定できるよう文書プロパティに残す
+        wb.custom_doc_props.append(IntProperty(name="fiscal_year", value=period.year))
+        wb.custom_doc_props.append(IntProperty(name="fiscal_start_month", value=period.start_month))
+    stage(MASTER_SHEET.name, wb)
+    # ダッシュボードは最初のシートに置くため先に作成し、タイトル以降は集計シートの後で書き込む
+    # （書き込み専用シート・XlsxWriter の constant_memory もシートごとに行を書き進めるので、
+    # シートをまたいで書いてよい）
+    ws_dashboard = _prepare_sheet(wb, DASHBOARD_SHEET.name, DASHBOARD_SHEET.widths)
+
     # =========================
     # 1. マスタシート作成
     # =========================
-    ws_master = wb.create_sheet("マスタ")
-    ws_master.sheet_view.showGridLines = False
-    
-    # タイトル
-    ws_master['A1'] = "マスタデータ管理"
-    ws_master['A1'].font = title_font
-    ws_master.merge_cells('A1:F1')
-    
-    # 取引先マスタ
-    ws_master['A3'] = "取引先一覧"
-    ws_master['A3'].font = subtitle_font
-    ws_master['A4'] = "取引先コード"
-    ws_master['B4'] = "取引先名"
-    ws_master['A4'].fill = header_fill
-    ws_master['A4'].font = header_font
-    ws_master['B4'].fill = header_fill
-    ws_master['B4'].font = header_font
-    
-    clients = [
-        ["C001", "A運送株式会社"],
-        ["C002", "B物流センター"],
-        ["C003", "C製造工場"],
-        ["C004", "D商事"],
-        ["C005", "E倉庫"]
-    ]
-    for i, client in enumerate(clients, 5):
-        ws_master[f'A{i}'] = client[0]
-        ws_master[f'B{i}'] = client[1]
-    
-    # 車両マスタ
-    ws_master['D3'] = "車両番号一覧"
-    ws_master['D3'].font = subtitle_font
-    ws_master['D4'] = "車両番号"
-    ws_master['E4'] = "車種"
-    ws_master['D4'].fill = header_fill
-    ws_master['D4'].font = header_font
-    ws_master['E4'].fill = header_fill
-    ws_master['E4'].font = header_font
-    
-    vehicles = [
-        ["車両001", "2tトラック"],
-        ["車両002", "4tトラック"],
-        ["車両003", "4tトラック"],
-        ["車両004", "10tトラック"],
-        ["車両005", "10tトラック"]
-    ]
-    for i, vehicle in enumerate(vehicles, 5):
-        ws_master[f'D{i}'] = vehicle[0]
-        ws_master[f'E{i}'] = vehicle[1]
-    
-    # ドライバーマスタ
-    ws_master['G3'] = "ドライバー一覧"
-    ws_master['G3'].font = subtitle_font
-    ws_master['G4'] = "社員番号"
-    ws_master['H4'] = "ドライバー名"
-    ws_master['G4'].fill = header_fill
-    ws_master['G4'].font = header_font
-    ws_master['H4'].fill = header_fill
-    ws_master['H4'].font = header_font
-    
-    drivers = [
-        ["D001", "田中太郎"],
-        ["D002", "佐藤次郎"],
-        ["D003", "鈴木三郎"],
-        ["D004", "高橋四郎"],
-        ["D005", "山田五郎"]
-    ]
-    for i, driver in enumerate(drivers, 5):
-        ws_master[f'G{i}'] = driver[0]
-        ws_master[f'H{i}'] = driver[1]
-    
-    # 列幅調整
-    ws_master.column_dimensions['A'].width = 15
-    ws_master.column_dimensions['B'].width = 20
-    ws_master.column_dimensions['D'].width = 15
-    ws_master.column_dimensions['E'].width = 20
-    ws_master.column_dimensions['G'].width = 15
-    ws_master.column_dimensions['H'].width = 20
-    
-    # =========================
-    # 2. 売上入力シート
-    # =========================
-    ws_sales = wb.create_sheet("売上入力")
-    ws_sales.sheet_view.showGridLines = False
-    
-    ws_sales['A1'] = "売上データ入力"
-    ws_sales['A1'].font = title_font
-    ws_sales.merge_cells('A1:F1')
-    
-    # ヘッダー設定
-    headers = ["日付", "月", "取引先名", "車両番号", "売上金額", "備考"]
-    for col, header in enumerate(headers, 1):
-        cell = ws_sales.cell(row=3, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center')
-        cell.border = thin_border
-    
-    # データ検証（プルダウン）設定
-    dv_client = DataValidation(type="list", formula1="=マスタ!$B$5:$B$9", allow_blank=True)
-    dv_vehicle = DataValidation(type="list", formula1="=マスタ!$D$5:$D$9", allow_blank=True)
-    
-    ws_sales.add_data_validation(dv_client)
-    ws_sales.add_data_validation(dv_vehicle)
-    
-    # サンプルデータと数式
-    sample_sales = [
-        [date(2025, 1, 5), "", "A運送株式会社", "車両001", 150000, "定期便"],
-        [date(2025, 1, 10), "", "B物流センター", "車両002", 200000, "特別便"],
-        [date(2025, 1, 15), "", "C製造工場", "車両003", 180000, ""],
-    ]
-    
-    for row_idx, data in enumerate(sample_sales, 4):
-        ws_sales.cell(row=row_idx, column=1, value=data[0]).number_format = 'yyyy/mm/dd'
-        ws_sales.cell(row=row_idx, column=2, value=f'=MONTH(A{row_idx})')  # 月を自動抽出
-        ws_sales.cell(row=row_idx, column=3, value=data[2])
-        ws_sales.cell(row=row_idx, column=4, value=data[3])
-        ws_sales.cell(row=row_idx, column=5, value=data[4]).number_format = '#,##0'
-        ws_sales.cell(row=row_idx, column=6, value=data[5])
-        
-        # プルダウン適用
-        dv_client.add(ws_sales.cell(row=row_idx, column=3))
-        dv_vehicle.add(ws_sales.cell(row=row_idx, column=4))
-    
-    # 列幅調整
-    ws_sales.column_dimensions['A'].width = 12
-    ws_sales.column_dimensions['B'].width = 8
-    ws_sales.column_dimensions['C'].width = 20
-    ws_sales.column_dimensions['D'].width = 15
-    ws_sales.column_dimensions['E'].width = 15
-    ws_sales.column_dimensions['F'].width = 20
-    
-    # =========================
-    # 3. 経費入力シート
-    # =========================
-    ws_expense = wb.create_sheet("経費入力")
-    ws_expense.sheet_view.showGridLines = False
-    
-    ws_expense['A1'] = "経費データ入力"
-    ws_expense['A1'].font = title_font
-    ws_expense.merge_cells('A1:F1')
-    
-    # ヘッダー設定
-    headers = ["日付", "月", "車両番号", "経費区分", "金額", "備考"]
-    for col, header in enumerate(headers, 1):
-        cell = ws_expense.cell(row=3, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center')
-        cell.border = thin_border
-    
-    # 経費区分のプルダウン
-    expense_types = "燃料費,修理費,保険料,リース料,その他"
-    dv_expense = DataValidation(type="list", formula1=f'"{expense_types}"', allow_blank=True)
-    ws_expense.add_data_validation(dv_expense)
-    
-    # サンプルデータ
-    sample_expenses = [
-        [date(2025, 1, 5), "", "車両001", "燃料費", 25000, "軽油"],
-        [date(2025, 1, 10), "", "車両002", "修理費", 50000, "タイヤ交換"],
-        [date(2025, 1, 15), "", "車両001", "保険料", 30000, ""],
-    ]
-    
-    for row_idx, data in enumerate(sample_expenses, 4):
-        ws_expense.cell(row=row_idx, column=1, value=data[0]).number_format = 'yyyy/mm/dd'
-        ws_expense.cell(row=row_idx, column=2, value=f'=MONTH(A{row_idx})')
-        ws_expense.cell(row=row_idx, column=3, value=data[2])
-        ws_expense.cell(row=row_idx, column=4, value=data[3])
-        ws_expense.cell(row=row_idx, column=5, value=data[4]).number_format = '#,##0'
-        ws_expense.cell(row=row_idx, column=6, value=data[5])
-        
-        dv_vehicle.add(ws_expense.cell(row=row_idx, column=3))
-        dv_expense.add(ws_expense.cell(row=row_idx, column=4))
-    
-    # 列幅調整
-    ws_expense.column_dimensions['A'].width = 12
-    ws_expense.column_dimensions['B'].width = 8
-    ws_expense.column_dimensions['C'].width = 15
-    ws_expense.column_dimensions['D'].width = 15
-    ws_expense.column_dimensions['E'].width = 15
-    ws_expense.column_dimensions['F'].width = 20
-    
+    ws_master = _open_sheet(wb, MASTER_SHEET)
+
+    # 取引先・車両・ドライバーの3表を横に並べて出力
+    ws_master.append([
+        _cell(ws_master, "取引先一覧", "subtitle"), None, None,
+        _cell(ws_master, "車両番号一覧", "subtitle"), None, None,
+        _cell(ws_master, "ドライバー一覧", "subtitle"),
+    ])
+    ws_master.append([
+        _cell(ws_master, "取引先コード", "header_label"),
+        _cell(ws_master, "取引先名", "header_label"), None,
+        _cell(ws_master, "車両番号", "header_label"),
+        _cell(ws_master, "車種", "header_label"), None,
+        _cell(ws_master, "社員番号", "header_label"),
+        _cell(ws_master, "ドライバー名", "header_label"),
+    ])
+    for client, vehicle, driver in zip_longest(*master.lists.values(), fillvalue=[None, None]):
+        ws_master.append([*client, None, *vehicle, None, *driver])
+
     # =========================
-    # 4. 人件費入力シート
+    # 2〜5. 入力シート（売上・経費・人件費・資金繰り + 追加分）
     # =========================
-    ws_labor = wb.create_sheet("人件費入力")
-    ws_labor.sheet_view.showGridLines = False
-    
-    ws_labor['A1'] = "人件費データ入力"
-    ws_labor['A1'].font = title_font
-    ws_labor.merge_cells('A1:G1')
-    
-    # ヘッダー設定
-    headers = ["ドライバー名", "車両番号", "按分比率(%)", "月", "支給額", "按分額", "備考"]
-    for col, header in enumerate(headers, 1):
-        cell = ws_labor.cell(row=3, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center')
-        cell.border = thin_border
-    
-    # データ検証
-    dv_driver = DataValidation(type="list", formula1="=マスタ!$H$5:$H$9", allow_blank=True)
-    ws_labor.add_data_validation(dv_driver)
-    
-    # サンプルデータ
-    sample_labor = [
-        ["田中太郎", "車両001", 100, 1, 300000, "", ""],
-        ["佐藤次郎", "車両002", 100, 1, 280000, "", ""],
-        ["鈴木三郎", "車両003", 50, 1, 260000, "", "複数車両担当"],
-        ["鈴木三郎", "車両004", 50, 1, 260000, "", "複数車両担当"],
-    ]
-    
-    for row_idx, data in enumerate(sample_labor, 4):
-        ws_labor.cell(row=row_idx, column=1, value=data[0])
-        ws_labor.cell(row=row_idx, column=2, value=data[1])
-        ws_labor.cell(row=row_idx, column=3, value=data[2]/100).number_format = '0%'
-        ws_labor.cell(row=row_idx, column=4, value=data[3])
-        ws_labor.cell(row=row_idx, column=5, value=data[4]).number_format = '#,##0'
-        ws_labor.cell(row=row_idx, column=6, value=f'=E{row_idx}*C{row_idx}').number_format = '#,##0'
-        ws_labor.cell(row=row_idx, column=7, value=data[6])
-        
-        dv_driver.add(ws_labor.cell(row=row_idx, column=1))
-        dv_vehicle.add(ws_labor.cell(row=row_idx, column=2))
-    
-    # 列幅調整
-    ws_labor.column_dimensions['A'].width = 15
-    ws_labor.column_dimensions['B'].width = 15
-    ws_labor.column_dimensions['C'].width = 12
-    ws_labor.column_dimensions['D'].width = 8
-    ws_labor.column_dimensions['E'].width = 15
-    ws_labor.column_dimensions['F'].width = 15
-    ws_labor.column_dimensions['G'].width = 20
-    
+    lists = {key: master.list_formula(key) for key in MASTER_LISTS}
+    # 車両ランキングを Python 側で求める場合は、数式モードでも車両ごとの合計を集計する
+    if ranking == "auto":
+        ranking = "values" if len(master.vehicle_codes) > RANKING_FORMULA_MAX_VEHICLES else "formulas"
+    totals = agg if agg is not None else LedgerAggregator() if ranking == "values" else None
+    allocation = LaborAllocation() if validate or totals is not None else None
+    single_year = SingleFiscalYear(fiscal_start_month) if period is None else None
+    history = CashFlowHistory() if forecast is not None else None
+    last = {}
+    try:
+        for spec in ledger_specs:
+            stage(spec.name, wb)
+            records = inputs.get(spec.arg)
+            records = spec.sample if records is None else records
+            if validate:
+                records = master.check_records(spec, records)
+                records = (period or single_year).check_records(spec, records)
+            if spec.arg == "labor" and allocation is not None:
+                records = allocation.collect(records)
+            tap = getattr(history, f"tap_{spec.arg}", None)  # 資金繰り予測の実績
+            if tap is not None:
+                records = tap(records)
+            if fingerprint is None:
+                records = hasher.tap(spec.name, records)
+            last[spec.arg] = _render_ledger(wb, spec, records, lists, totals)
+
+        # 人件費の按分（比率の合計チェックと車両×月の人件費の一括計算）
+        if allocation is not None:
+            if validate:
+                allocation.check_ratios()
+            if totals is not None:
+                totals.labor_by_month, totals.labor_by_vehicle = allocation.totals()
+
+        # 資金繰り予測（実績の翌月以降のシナリオを一括計算）
+        projection = simulate(forecast, history, opening_balance, cash_threshold) if forecast is not None else None
+    except BaseException:
+        if backend == "xlsxwriter":
+            wb.discard()
+        elif streaming:
+            _discard_write_only(wb)
+        raise
+
     # =========================
-    # 5. 資金繰り入力シート
+    # 集計式・集計値の準備
     # =========================
-    ws_cash = wb.create_sheet("資金繰り入力")
-    ws_cash.sheet_view.showGridLines = False
-    
-    ws_cash['A1'] = "資金繰りデータ入力"
-    ws_cash['A1'].font = title_font
-    ws_cash.merge_cells('A1:F1')
-    
-    # ヘッダー設定
-    headers = ["日付", "月", "入金/出金", "科目", "金額", "備考"]
-    for col, header in enumerate(headers, 1):
-        cell = ws_cash.cell(row=3, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center')
-        cell.border = thin_border
-    
-    # プルダウン設定
-    dv_inout = DataValidation(type="list", formula1='"入金,出金"', allow_blank=True)
-    dv_category = DataValidation(type="list", formula1='"売上入金,燃料費支払,リース料支払,借入返済,利息,その他"', allow_blank=True)
-    ws_cash.add_data_validation(dv_inout)
-    ws_cash.add_data_validation(dv_category)
-    
-    # サンプルデータ
-    sample_cash = [
-        [date(2025, 1, 1), "", "入金", "売上入金", 500000, "前月売上回収"],
-        [date(2025, 1, 10), "", "出金", "燃料費支払", 150000, ""],
-        [date(2025, 1, 20), "", "出金", "リース料支払", 200000, "車両リース"],
-    ]
-    
-    for row_idx, data in enumerate(sample_cash, 4):
-        ws_cash.cell(row=row_idx, column=1, value=data[0]).number_format = 'yyyy/mm/dd'
-        ws_cash.cell(row=row_idx, column=2, value=f'=MONTH(A{row_idx})')
-        ws_cash.cell(row=row_idx, column=3, value=data[2])
-        ws_cash.cell(row=row_idx, column=4, value=data[3])
-        ws_cash.cell(row=row_idx, column=5, value=data[4]).number_format = '#,##0'
-        ws_cash.cell(row=row_idx, column=6, value=data[5])
-        
-        dv_inout.add(ws_cash.cell(row=row_idx, column=3))
-        dv_category.add(ws_cash.cell(row=row_idx, column=4))
-    
-    # 列幅調整
-    ws_cash.column_dimensions['A'].width = 12
-    ws_cash.column_dimensions['B'].width = 8
-    ws_cash.column_dimensions['C'].width = 12
-    ws_cash.column_dimensions['D'].width = 18
-    ws_cash.column_dimensions['E'].width = 15
-    ws_cash.column_dimensions['F'].width = 20
-    
+    stage(PL_SHEET.name, wb)
+    # summary="formulas" では入力シートの実データ範囲だけを参照する数式、
+    # summary="values" では書き出し時に集計済みの値をセルに入れる
+    sales_amount = SALES_SPEC.range("売上金額", last["sales"])
+    sales_month = SALES_SPEC.range("月", last["sales"])
+    sales_vehicle = SALES_SPEC.range("車両番号", last["sales"])
+    expense_amount = EXPENSE_SPEC.range("金額", last["expenses"])
+    expense_month = EXPENSE_SPEC.range("月", last["expenses"])
+    expense_vehicle = EXPENSE_SPEC.range("車両番号", last["expenses"])
+    expense_kind = EXPENSE_SPEC.range("経費区分", last["expenses"])
+    labor_amount = LABOR_SPEC.range("按分額", last["labor"])
+    labor_month = LABOR_SPEC.range("月", last["labor"])
+    labor_vehicle = LABOR_SPEC.range("車両番号", last["labor"])
+    cash_amount = CASH_SPEC.range("金額", last["cash"])
+    cash_month = CASH_SPEC.range("月", last["cash"])
+    cash_kind = CASH_SPEC.range("入金/出金", last["cash"])
+
+    def sales_total(month):
+        if agg is not None:
+            return agg.sales_by_month.get(month, 0)
+        return f'=SUMIFS({sales_amount},{sales_month},{month})'
+
+    def expense_total(month, kind):
+        if agg is not None:
+            return agg.expense_by_month.get((month, kind), 0)
+        return f'=SUMIFS({expense_amount},{expense_month},{month},{expense_kind},"{kind}")'
+
+    def labor_total(month):
+        if agg is not None:
+            return agg.labor_by_month.get(month, 0)
+        return f'=SUMIFS({labor_amount},{labor_month},{month})'
+
+    def cash_total(month, kind):
+        if agg is not None:
+            return agg.cash_by_month.get((month, kind), 0)
+        return f'=SUMIFS({cash_amount},{cash_month},{month},{cash_kind},"{kind}")'
+
     # =========================
     # 6. 損益計算表
     # =========================
-    ws_pl = wb.create_sheet("損益計算表")
-    ws_pl.sheet_view.showGridLines = False
-    
-    ws_pl['A1'] = "月次損益計算表"
-    ws_pl['A1'].font = title_font
-    ws_pl.merge_cells('A1:P1')
-    
-    # 月ヘッダー
-    ws_pl['A3'] = "項目"
-    ws_pl['A3'].fill = header_fill
-    ws_pl['A3'].font = header_font
-    
-    months = ["1月", "2月", "3月", "4月", "5月", "6月", "7月", "8月", "9月", "10月", "11月", "12月", "年間合計"]
-    for col, month in enumerate(months, 2):
-        cell = ws_pl.cell(row=3, column=col, value=month)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center')
-    
-    # 損益項目
-    pl_items = [
-        "売上高（予算）",
-        "売上高（実績）",
-        "差異",
-        "",
-        "燃料費",
-        "修理費",
-        "保険料",
-        "リース料",
-        "人件費",
-        "その他経費",
-        "経費合計",
-        "",
-        "営業利益",
-        "営業利益率"
+    ws_pl = _open_sheet(wb, PL_SHEET, period)
+
+    # 月ヘッダー（年度の月順）
+    month_headers = [f"{m}月" for m in months] + ["年間合計"]
+    ws_pl.append([_cell(ws_pl, "項目", "header_label")] + _header_row(ws_pl, month_headers, style="header_center"))
+
+    # 損益項目と数式（年度の12か月 + 年間合計）
+    # 各項目は (項目名, 月ごとの値を返す関数(列, 月), 年間合計, 表示形式)。
+    # 年間合計が None の項目は月と同じ式を N 列に適用する（差異・経費合計・営業利益など）
+    pl_rows = [
+        # 予算（前年実績の110%と仮定）
+        ("売上高（予算）", lambda c, m: 500000, "sum", "yen"),
+        ("売上高（実績）", lambda c, m: sales_total(m), "sum", "yen"),
+        ("差異", lambda c, m: f'={c}5-{c}4', None, "yen"),
+        ("", None, None, None),
+        ("燃料費", lambda c, m: expense_total(m, "燃料費"), "sum", None),
+        ("修理費", lambda c, m: expense_total(m, "修理費"), "sum", None),
+        ("保険料", lambda c, m: expense_total(m, "保険料"), "sum", None),
+        ("リース料", lambda c, m: expense_total(m, "リース料"), "sum", None),
+        ("人件費", lambda c, m: labor_total(m), "sum", None),
+        ("その他経費", lambda c, m: expense_total(m, "その他"), "sum", None),
+        ("経費合計", lambda c, m: f'=SUM({c}8:{c}13)', None, None),
+        ("", None, None, None),
+        # 営業利益
+        ("営業利益", lambda c, m: f'={c}5-{c}14', None, None),
+        ("営業利益率", lambda c, m: f'=IF({c}5=0,0,{c}16/{c}5)', None, "percent1"),
     ]
-    
-    for row_idx, item in enumerate(pl_items, 4):
-        ws_pl.cell(row=row_idx, column=1, value=item).font = Font(bold=True if item in ["売上高（実績）", "経費合計", "営業利益"] else False)
-    
-    # 数式設定（1月の例）
-    # 売上高実績
-    ws_pl['B5'] = '=SUMIFS(売上入力!E:E,売上入力!B:B,1)'
-    ws_pl['B5'].number_format = '#,##0'
-    
-    # 予算（前年実績の110%と仮定）
-    ws_pl['B4'] = 500000
-    ws_pl['B4'].number_format = '#,##0'
-    
-    # 差異
-    ws_pl['B6'] = '=B5-B4'
-    ws_pl['B6'].number_format = '#,##0'
-    
-    # 経費項目
-    ws_pl['B8'] = '=SUMIFS(経費入力!E:E,経費入力!B:B,1,経費入力!D:D,"燃料費")'
-    ws_pl['B9'] = '=SUMIFS(経費入力!E:E,経費入力!B:B,1,経費入力!D:D,"修理費")'
-    ws_pl['B10'] = '=SUMIFS(経費入力!E:E,経費入力!B:B,1,経費入力!D:D,"保険料")'
-    ws_pl['B11'] = '=SUMIFS(経費入力!E:E,経費入力!B:B,1,経費入力!D:D,"リース料")'
-    ws_pl['B12'] = '=SUMIFS(人件費入力!F:F,人件費入力!D:D,1)'
-    ws_pl['B13'] = '=SUMIFS(経費入力!E:E,経費入力!B:B,1,経費入力!D:D,"その他")'
-    ws_pl['B14'] = '=SUM(B8:B13)'
-    
-    # 営業利益
-    ws_pl['B16'] = '=B5-B14'
-    ws_pl['B17'] = '=IF(B5=0,0,B16/B5)'
-    ws_pl['B17'].number_format = '0.0%'
-    
+    for row_idx, (item, month_value, total, style) in enumerate(pl_rows, 4):
+        row = [_cell(ws_pl, item, "bold" if item in ["売上高（実績）", "経費合計", "営業利益"] else None)]
+        if month_value is not None:
+            for col, m in enumerate(months, 2):
+                row.append(_cell(ws_pl, month_value(get_column_letter(col), m), style))
+            total_value = f'=SUM(B{row_idx}:M{row_idx})' if total == "sum" else month_value('N', None)
+            row.append(_cell(ws_pl, total_value, style))
+        ws_pl.append(row)
+
     # 条件付き書式（営業利益がマイナスの場合赤文字）
-    red_font = Font(color="FF0000")
     ws_pl.conditional_formatting.add('B16:N16',
         CellIsRule(operator='lessThan', formula=['0'], font=red_font))
-    
-    # 列幅調整
-    ws_pl.column_dimensions['A'].width = 20
-    for col in range(2, 15):
-        ws_pl.column_dimensions[chr(64 + col)].width = 12
-    
+
     # =========================
     # 7. 車両別収支
     # =========================
-    ws_vehicle = wb.create_sheet("車両別収支")
-    ws_vehicle.sheet_view.showGridLines = False
-    
-    ws_vehicle['A1'] = "車両別収支一覧"
-    ws_vehicle['A1'].font = title_font
-    ws_vehicle.merge_cells('A1:F1')
-    
-    # ヘッダー
-    headers = ["車両番号", "売上高", "経費", "人件費", "利益", "利益率"]
-    for col, header in enumerate(headers, 1):
-        cell = ws_vehicle.cell(row=3, column=col, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center')
-    
+    stage(VEHICLE_SHEET.name, wb)
+    ws_vehicle = _open_sheet(wb, VEHICLE_SHEET)
+    ws_vehicle.append(
+        _header_row(ws_vehicle, ["車両番号", "売上高", "経費", "人件費", "利益", "利益率", "利益順位"],
+                    style="header_center")
+        + [None] + _header_row(ws_vehicle, ["車両番号（利益上位）", "利益"], style="header_center"))
+
     # 車両データ
-    vehicles = ["車両001", "車両002", "車両003", "車両004", "車両005"]
+    vehicles = master.vehicle_codes
+    profits = None
+    if totals is not None:
+        profits = {vehicle: totals.sales_by_vehicle.get(vehicle, 0) - totals.expense_by_vehicle.get(vehicle, 0)
+                   - totals.labor_by_vehicle.get(vehicle, 0) for vehicle in vehicles}
+    last_vehicle_row = 3 + len(vehicles)
+    if profits is not None:
+        # 順位はランキング・グラフに載せる上位の車両だけに付ける（全車両は並べ替えない）
+        ranked = _top_vehicles(vehicles, profits, max(top_k, chart_top_n))
+        ranks = {vehicle: rank for rank, (vehicle, _) in enumerate(ranked, 1)}
+    vehicle_rows = []
     for row_idx, vehicle in enumerate(vehicles, 4):
-        ws_vehicle.cell(row=row_idx, column=1, value=vehicle)
-        # 売上高
-        ws_vehicle.cell(row=row_idx, column=2, value=f'=SUMIF(売上入力!D:D,A{row_idx},売上入力!E:E)').number_format = '#,##0'
-        # 経費
-        ws_vehicle.cell(row=row_idx, column=3, value=f'=SUMIF(経費入力!C:C,A{row_idx},経費入力!E:E)').number_format = '#,##0'
-        # 人件費
-        ws_vehicle.cell(row=row_idx, column=4, value=f'=SUMIF(人件費入力!B:B,A{row_idx},人件費入力!F:F)').number_format = '#,##0'
-        # 利益
-        ws_vehicle.cell(row=row_idx, column=5, value=f'=B{row_idx}-C{row_idx}-D{row_idx}').number_format = '#,##0'
-        # 利益率
-        ws_vehicle.cell(row=row_idx, column=6, value=f'=IF(B{row_idx}=0,0,E{row_idx}/B{row_idx})').number_format = '0.0%'
-    
-    # 合計行
-    ws_vehicle.cell(row=10, column=1, value="合計").font = Font(bold=True)
-    for col in range(2, 6):
-        ws_vehicle.cell(row=10, column=col, value=f'=SUM({chr(64+col)}4:{chr(64+col)}8)').number_format = '#,##0'
-    ws_vehicle.cell(row=10, column=6, value='=IF(B10=0,0,E10/B10)').number_format = '0.0%'
-    
-    # 列幅調整
-    ws_vehicle.column_dimensions['A'].width = 15
-    for col in range(2, 7):
-        ws_vehicle.column_dimensions[chr(64 + col)].width = 15
-    
+        if agg is not None:
+            vehicle_sales = agg.sales_by_vehicle.get(vehicle, 0)
+            vehicle_expense = agg.expense_by_vehicle.get(vehicle, 0)
+            vehicle_labor = agg.labor_by_vehicle.get(vehicle, 0)
+        else:
+            vehicle_sales = f'=SUMIF({sales_vehicle},A{row_idx},{sales_amount})'
+            vehicle_expense = f'=SUMIF({expense_vehicle},A{row_idx},{expense_amount})'
+            vehicle_labor = f'=SUMIF({labor_vehicle},A{row_idx},{labor_amount})'
+        vehicle_rows.append([
+            vehicle,
+            # 売上高
+            _cell(ws_vehicle, vehicle_sales, "yen"),
+            # 経費
+            _cell(ws_vehicle, vehicle_expense, "yen"),
+            # 人件費
+            _cell(ws_vehicle, vehicle_labor, "yen"),
+            # 利益
+            _cell(ws_vehicle, f'=B{row_idx}-C{row_idx}-D{row_idx}', "yen"),
+            # 利益率
+            _cell(ws_vehicle, f'=IF(B{row_idx}=0,0,E{row_idx}/B{row_idx})', "percent1"),
+            # 利益順位（ランキング・グラフ用の上位表が参照する）
+            ranks.get(vehicle) if profits is not None else _profit_rank_formula(row_idx, last_vehicle_row),
+        ])
+
+    # 合計行（車両一覧の1行下）
+    vehicle_rows.append([])
+    total_row = 4 + len(vehicles) + 1
+    vehicle_rows.append(
+        [_cell(ws_vehicle, "合計", "bold")]
+        + [_cell(ws_vehicle, f'=SUM({c}4:{c}{total_row - 2})', "yen") for c in "BCDE"]
+        + [_cell(ws_vehicle, f'=IF(B{total_row}=0,0,E{total_row}/B{total_row})', "percent1")]
+    )
+
+    # グラフ用の利益上位表（I:J 列）。車両一覧と同じ行に横並びで書き出す
+    chart_rows = _vehicle_chart_rows(ws_vehicle, vehicles, profits, chart_top_n, total_row)
+    for left, right in zip_longest(vehicle_rows, chart_rows, fillvalue=[]):
+        ws_vehicle.append(left + [None] * (8 - len(left)) + right)
+
     # =========================
     # 8. 資金繰り表
     # =========================
-    ws_cashflow = wb.create_sheet("資金繰り表")
-    ws_cashflow.sheet_view.showGridLines = False
-    
-    ws_cashflow['A1'] = "月次資金繰り表"
-    ws_cashflow['A1'].font = title_font
-    ws_cashflow.merge_cells('A1:N1')
-    
+    stage(CASHFLOW_SHEET.name, wb)
+    ws_cashflow = _open_sheet(wb, CASHFLOW_SHEET, period)
+
     # ヘッダー
-    ws_cashflow['A3'] = "項目"
-    ws_cashflow['A3'].fill = header_fill
-    ws_cashflow['A3'].font = header_font
-    
-    for col, month in enumerate(months[:12], 2):
-        cell = ws_cashflow.cell(row=3, column=col, value=month)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center')
-    
-    # 資金繰り項目
-    cf_items = ["月初残高", "入金合計", "出金合計", "月末残高"]
-    for row_idx, item in enumerate(cf_items, 4):
-        ws_cashflow.cell(row=row_idx, column=1, value=item).font = Font(bold=True)
-    
-    # 初期残高
-    ws_cashflow['B4'] = 1000000
-    ws_cashflow['B4'].number_format = '#,##0'
-    
-    # 数式（1月の例）
-    ws_cashflow['B5'] = '=SUMIFS(資金繰り入力!E:E,資金繰り入力!B:B,1,資金繰り入力!C:C,"入金")'
-    ws_cashflow['B6'] = '=SUMIFS(資金繰り入力!E:E,資金繰り入力!B:B,1,資金繰り入力!C:C,"出金")'
-    ws_cashflow['B7'] = '=B4+B5-B6'
-    
-    # 条件付き書式（残高50万円未満で赤背景）
-    red_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
+    ws_cashflow.append([_cell(ws_cashflow, "項目", "header_label")]
+                       + _header_row(ws_cashflow, month_headers, style="header_center"))
+
+    # 資金繰り項目（年度の12か月 + 年間合計）
+    # 月初残高は期首月（B列）のみ期首残高を入力し、以降は前月（左隣の列）の月末残高を繰り越す。
+    # 年間合計の月初残高は期首残高、月末残高は期末残高になる
+    cf_rows = [
+        ("月初残高", lambda c, m: opening_balance if c == 'B' else f'={_previous_column(c)}7', '=B4', "yen"),
+        ("入金合計", lambda c, m: cash_total(m, "入金"), '=SUM(B5:M5)', None),
+        ("出金合計", lambda c, m: cash_total(m, "出金"), '=SUM(B6:M6)', None),
+        ("月末残高", lambda c, m: f'={c}4+{c}5-{c}6', '=N4+N5-N6', None),
+    ]
+    for item, month_value, total, style in cf_rows:
+        ws_cashflow.append(
+            [_cell(ws_cashflow, item, "bold")]
+            + [_cell(ws_cashflow, month_value(get_column_letter(col), m), style)
+               for col, m in enumerate(months, 2)]
+            + [_cell(ws_cashflow, total, style)]
+        )
+
+    # 条件付き書式（残高が閾値未満で赤背景）
     ws_cashflow.conditional_formatting.add('B7:M7',
-        CellIsRule(operator='lessThan', formula=['500000'], fill=red_fill))
-    
-    # 列幅調整
-    ws_cashflow.column_dimensions['A'].width = 15
-    for col in range(2, 14):
-        ws_cashflow.column_dimensions[chr(64 + col)].width = 12
-    
+        CellIsRule(operator='lessThan', formula=[str(cash_threshold)], fill=red_fill))
+
+    if projection is not None:
+        _write_forecast(ws_cashflow, projection, cash_threshold)
+
     # =========================
     # 9. ダッシュボード
     # =========================
-    ws_dashboard = wb.create_sheet("ダッシュボード", 0)  # 最初のシートに配置
-    ws_dashboard.sheet_view.showGridLines = False
-    
-    ws_dashboard['A1'] = "経営ダッシュボード"
-    ws_dashboard['A1'].font = Font(bold=True, size=16)
-    ws_dashboard.merge_cells('A1:H1')
-    
-    # 現在の状況サマリー
-    ws_dashboard['A3'] = "現在の経営状況"
-    ws_dashboard['A3'].font = subtitle_font
-    
-    ws_dashboard['A5'] = "当月売上高:"
-    ws_dashboard['B5'] = '=損益計算表!B5'
-    ws_dashboard['B5'].number_format = '#,##0"円"'
-    
-    ws_dashboard['A6'] = "当月営業利益:"
-    ws_dashboard['B6'] = '=損益計算表!B16'
-    ws_dashboard['B6'].number_format = '#,##0"円"'
-    
-    ws_dashboard['A7'] = "当月営業利益率:"
-    ws_dashboard['B7'] = '=損益計算表!B17'
-    ws_dashboard['B7'].number_format = '0.0%'
-    
-    ws_dashboard['A8'] = "現在資金残高:"
-    ws_dashboard['B8'] = '=資金繰り表!B7'
-    ws_dashboard['B8'].number_format = '#,##0"円"'
-    
+    stage(DASHBOARD_SHEET.name, wb)
+    _write_title(ws_dashboard, DASHBOARD_SHEET.title, DASHBOARD_SHEET.merge_to, style=DASHBOARD_SHEET.title_style)
+
+    ws_dashboard.append([
+        # 現在の状況サマリー
+        _cell(ws_dashboard, "現在の経営状況", "subtitle"), None, None,
+        # 警告メッセージエリア
+        _cell(ws_dashboard, "警告・注意事項", "notice"), None,
+        # グラフ（F5 以降に配置）
+        _cell(ws_dashboard, "グラフ表示エリア", "subtitle"),
+    ])
+    ws_dashboard.append([])
+    ws_dashboard.append([
+        "当月売上高:", _cell(ws_dashboard, '=損益計算表!B5', "yen_label"), None,
+        _cell(ws_dashboard, '=IF(損益計算表!B16<0,"⚠ 当月は赤字です","")', "warning"),
+    ])
+    ws_dashboard.append([
+        "当月営業利益:", _cell(ws_dashboard, '=損益計算表!B16', "yen_label"), None,
+        _cell(ws_dashboard, f'=IF(資金繰り表!B7<{cash_threshold},'
+                            f'"⚠ 資金残高が{_yen_text(cash_threshold)}を下回っています","")', "warning"),
+    ])
+    margin_row = ["当月営業利益率:", _cell(ws_dashboard, '=損益計算表!B17', "percent1")]
+    balance_row = ["現在資金残高:", _cell(ws_dashboard, '=資金繰り表!B7', "yen_label")]
+    if projection is not None:
+        # 資金繰り予測の見込み（資金繰り表の予測ブロックと同じ説明文）
+        expected, risk = _forecast_notes(projection, cash_threshold)
+        margin_row += [None, _cell(ws_dashboard, expected, "warning" if projection.first_below else None)]
+        balance_row += [None, risk]
+    ws_dashboard.append(margin_row)
+    ws_dashboard.append(balance_row)
+
     # 条件付き書式設定
     ws_dashboard.conditional_formatting.add('B6',
         CellIsRule(operator='lessThan', formula=['0'], font=red_font))
     ws_dashboard.conditional_formatting.add('B8',
-        CellIsRule(operator='lessThan', formula=['500000'], fill=red_fill))
-    
-    # 警告メッセージエリア
-    ws_dashboard['D3'] = "警告・注意事項"
-    ws_dashboard['D3'].font = subtitle_font
-    ws_dashboard['D3'].fill = PatternFill(start_color="FFE699", end_color="FFE699", fill_type="solid")
-    
-    ws_dashboard['D5'] = '=IF(損益計算表!B16<0,"⚠ 当月は赤字です","")'
-    ws_dashboard['D5'].font = Font(color="FF0000", bold=True)
-    
-    ws_dashboard['D6'] = '=IF(資金繰り表!B7<500000,"⚠ 資金残高が50万円を下回っています","")'
-    ws_dashboard['D6'].font = Font(color="FF0000", bold=True)
-    
+        CellIsRule(operator='lessThan', formula=[str(cash_threshold)], fill=red_fill))
+
     # 車両別収支サマリー
-    ws_dashboard['A11'] = "車両別収支TOP3"
-    ws_dashboard['A11'].font = subtitle_font
-    
-    ws_dashboard['A13'] = "順位"
-    ws_dashboard['B13'] = "車両番号"
-    ws_dashboard['C13'] = "利益"
-    for col in range(1, 4):
-        ws_dashboard.cell(row=13, column=col).fill = header_fill
-        ws_dashboard.cell(row=13, column=col).font = header_font
-    
-    # グラフプレースホルダー説明
-    ws_dashboard['F3'] = "グラフ表示エリア"
-    ws_dashboard['F3'].font = subtitle_font
-    ws_dashboard['F5'] = "※ Excel上でグラフを挿入してください"
-    ws_dashboard['F6'] = "1. 損益推移グラフ（月次）"
-    ws_dashboard['F7'] = "2. 資金残高推移グラフ（月次）"
-    ws_dashboard['F8'] = "3. 車両別収支グラフ（棒グラフ）"
-    
-    # 列幅調整
-    ws_dashboard.column_dimensions['A'].width = 20
-    ws_dashboard.column_dimensions['B'].width = 20
-    ws_dashboard.column_dimensions['C'].width = 15
-    ws_dashboard.column_dimensions['D'].width = 35
-    
+    ws_dashboard.append([])
+    ws_dashboard.append([])
+    ws_dashboard.append([_cell(ws_dashboard, f"車両別収支TOP{top_k}", "subtitle")])
+    ws_dashboard.append([])
+    ws_dashboard.append([_cell(ws_dashboard, h, "header_label")
+                         for h in ["順位", "車両番号", "利益"]])
+    for row in _ranking_rows(ws_dashboard, vehicles, profits, top_k):
+        ws_dashboard.append(row)
+
+    # グラフ
+    _add_dashboard_charts(ws_dashboard, ws_pl, ws_cashflow, ws_vehicle, len(chart_rows),
+                          len(projection.months) if projection is not None else 0)
+
     # ワークブック保存
-    wb.save("運送会社経営管理_v1.0.xlsx")
-    print("✅ Excelファイルを作成しました: 運送会社経営管理_v1.0.xlsx")
+    stage("保存", wb)
+    timestamp = _reproducible_timestamp()
+    wb.properties.created = timestamp
+    wb.custom_doc_props.append(StringProperty(name=FINGERPRINT_PROPERTY, value=fingerprint or hasher.hexdigest()))
+    wb.save(output_path)
+    if calculate:
+        from transport_excel_calc import calculate_workbook  # transport_excel_calc はこのモジュールを参照する
+        stage("計算", wb)
+        calculate_workbook(output_path)
+    _repack(output_path, timestamp, getattr(wb, "repack_rewrite", None))
+    stage(None, wb)
+    print(f"✅ Excelファイルを作成しました: {output_path}")
+    return output_path
+
+# =========================
+# コマンドライン
+# =========================
+def _parse_input(value):
+    """--input の「シート名=ファイルパス」"""
+    sheet, sep, path = value.partition("=")
+    if not sep or not sheet or not path:
+        raise argparse.ArgumentTypeError(f"「シート名=ファイルパス」の形式で指定してください: {value}")
+    return sheet, os.path.abspath(path)
+
+
+def main(argv=None):
+    """コマンドラインから生成する
+
+        python create_transport_excel.py                                   # サンプルデータで生成
+        python create_transport_excel.py -c yamada.json -o out/yamada.xlsx --streaming
+        python create_transport_excel.py --name 山田運輸 -i 売上入力=sales.csv -i 経費入力=fuel.parquet
+        python create_transport_excel.py -c a.json -c b.json --workers 4 --output-dir out
+
+    会社設定（--config）は transport_excel_batch のマニフェスト、または1社分の会社定義の JSON。
+    コマンドラインの指定は会社設定より優先する。複数社の場合は --workers のプロセス数で並列に生成する。
+    入力ファイル・設定が前回から変わっていなければ生成を省略する（--force で常に再生成）。
+    """
+    from transport_excel_batch import generate_batch, generate_company, load_manifest  # batch はこのモジュールを参照する
+
+    parser = argparse.ArgumentParser(description="運送会社経営管理Excel の生成")
+    parser.add_argument("-c", "--config", action="append", default=[],
+                        help="会社設定（JSON。マニフェストまたは1社分の定義。複数指定可）")
+    parser.add_argument("-i", "--input", action="append", default=[], type=_parse_input, metavar="シート名=PATH",
+                        help="入力ファイル（CSV / Parquet。例: 売上入力=sales.csv。複数指定可）")
+    parser.add_argument("-o", "--output", help="出力先のファイル（1社の場合）")
+    parser.add_argument("--output-dir", default=".", help="出力先を指定しない会社の出力先ディレクトリ")
+    parser.add_argument("--name", help="会社名（--config を指定しない場合。出力ファイル名に使う）")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--streaming", dest="streaming", action="store_true", default=None,
+                      help="write_only モードで書き出す（大量の入力行向け）")
+    mode.add_argument("--in-memory", dest="streaming", action="store_false", help="通常モードで書き出す")
+    parser.add_argument("--summary", choices=["formulas", "values"], help="集計シートの書き方")
+    parser.add_argument("--backend", choices=WRITER_BACKENDS, help="書き出しに使うライブラリ")
+    parser.add_argument("--calculate", action="store_true", default=None, help="数式の計算結果も書き込む")
+    parser.add_argument("--fiscal-year", type=int, help="会計年度")
+    parser.add_argument("--fiscal-start-month", type=int, help="会計年度の開始月")
+    parser.add_argument("--workers", type=int, default=None, help="複数社を生成する並列プロセス数（既定: CPU コア数）")
+    parser.add_argument("--force", action="store_true", help="入力に変更がなくても再生成する")
+    parser.add_argument("--profile", nargs="?", const="", metavar="REPORT",
+                        help="工程ごとの所要時間を表示する（REPORT を指定すると JSON でも書き出す。1社の場合のみ）")
+    args = parser.parse_args(argv)
+
+    if args.config:
+        companies = [company for path in args.config for company in load_manifest(path)]
+    else:
+        companies = [{"name": args.name or "",
+                      "output": None if args.name else os.path.join(args.output_dir, DEFAULT_OUTPUT)}]
+    if len(companies) > 1 and (args.output or args.profile is not None):
+        parser.error("--output・--profile は1社の場合のみ指定できます（複数社は --output-dir を使ってください）")
+
+    overrides = {"streaming": args.streaming, "summary": args.summary, "backend": args.backend,
+                 "calculate": args.calculate, "fiscal_year": args.fiscal_year,
+                 "fiscal_start_month": args.fiscal_start_month,
+                 "output": os.path.abspath(args.output) if args.output else None,
+                 "skip_unchanged": False if args.force else None}
+    for company in companies:
+        company.update((key, value) for key, value in overrides.items() if value is not None)
+        company["sources"] = {**company.get("sources", {}), **dict(args.input)}
+
+    if len(companies) > 1:
+        results = generate_batch(companies, args.workers, args.output_dir)
+    else:
+        profiler = None
+        if args.profile is not None:
+            from transport_excel_profile import GenerationProfiler
+            profiler = GenerationProfiler(log=False)
+        result = generate_company(companies[0], args.output_dir, on_stage=profiler)
+        if not result["ok"]:
+            print(f"❌ {result['name'] or result['output']}: {result['error']}")
+        if profiler is not None and profiler.sections:
+            for section in profiler.sections:
+                print(f"  {section['name']}: {section['seconds']:.3f}秒 {section['rows']:,}行")
+            if args.profile:
+                with open(args.profile, "w", encoding="utf-8") as f:
+                    json.dump(profiler.summary(), f, ensure_ascii=False, indent=2)
+        results = [result]
+    raise SystemExit(0 if all(result["ok"] for result in results) else 1)
+
 
 # 実行
 if __name__ == "__main__":
-    create_transport_management_excel()
+    main()
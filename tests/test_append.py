@@ -0,0 +1,73 @@
+"""追記モード（transport_excel_append）の確認"""
+import re
+from datetime import date
+
+import openpyxl
+import pytest
+
+from create_transport_excel import LEDGER_SPECS, create_transport_management_excel
+from transport_excel_append import append_ledgers
+
+SALES = [
+    [date(2025, 2, 1), "", "A運送株式会社", "車両001", 100000, ""],
+    [date(2025, 2, 2), "", "B物流センター", "車両002", 200000, ""],
+]
+SAMPLE_ROWS = len(LEDGER_SPECS[0].sample)
+
+
+def _sqrefs(path, sheet):
+    wb = openpyxl.load_workbook(path)
+    return sorted(str(dv.sqref) for dv in wb[sheet].data_validations.dataValidation)
+
+
+def _formulas(path, sheet):
+    wb = openpyxl.load_workbook(path)
+    return " ".join(str(cell.value) for row in wb[sheet].iter_rows() for cell in row
+                    if isinstance(cell.value, str) and cell.value.startswith("="))
+
+
+@pytest.mark.parametrize("options", [
+    {"streaming": False},
+    {"streaming": True},
+    {"backend": "xlsxwriter"},
+], ids=["openpyxl", "write_only", "xlsxwriter"])
+@pytest.mark.parametrize("existing", [0, SAMPLE_ROWS], ids=["empty", "sample"])
+def test_append_extends_ranges(tmp_path, options, existing):
+    if options.get("backend") == "xlsxwriter":
+        pytest.importorskip("xlsxwriter")
+    path = str(tmp_path / "book.xlsx")
+    create_transport_management_excel(path, sales=None if existing else [], **options)
+    first, last = 4 + existing, 4 + existing + len(SALES) - 1
+
+    assert append_ledgers(path, sales=SALES, calculate=True) == {"売上入力": (first, last)}
+
+    # データ検証（取引先・車両のプルダウン）が追記行まで届く
+    assert _sqrefs(path, "売上入力") == [f"C4:C{last}", f"D4:D{last}"]
+    # 集計シート（損益計算表・車両別収支 = ランキングの元）の参照が追記行まで延長される
+    for sheet in ("損益計算表", "車両別収支"):
+        formulas = _formulas(path, sheet)
+        assert f"売上入力!E4:E{last}" in formulas
+        assert not re.search(rf"売上入力!\$?E\$?4:\$?E\$?{max(first - 1, 4)}\b", formulas)
+    # 追記した行が計算結果に反映される
+    wb = openpyxl.load_workbook(path, data_only=True)
+    vehicle_sales = {row[0]: row[1] for row in wb["車両別収支"].iter_rows(min_row=4, max_col=2, values_only=True)}
+    assert vehicle_sales["車両002"] >= 200000
+
+
+def test_append_rejects_invalid_rows(tmp_path):
+    path = str(tmp_path / "book.xlsx")
+    create_transport_management_excel(path, fiscal_year=2025)
+    with open(path, "rb") as f:
+        before = f.read()
+    rows = [
+        [[date(2025, 2, 1), "", "存在しない", "車両001", 1, ""]],
+        [[date(2025, 2, 1), "", "A運送株式会社", "車両999", 1, ""]],
+        [[date(2026, 2, 1), "", "A運送株式会社", "車両001", 1, ""]],
+    ]
+    for records in rows:
+        with pytest.raises(ValueError, match="売上入力 7行目"):
+            append_ledgers(path, sales=records)
+    with pytest.raises(ValueError, match="按分比率"):
+        append_ledgers(path, labor=[["田中太郎", "車両001", 60, 2, 300000, "", ""]])
+    with open(path, "rb") as f:
+        assert f.read() == before
@@ -0,0 +1,105 @@
+"""数式の計算（transport_excel_calc）の確認"""
+import openpyxl
+import pytest
+from openpyxl import Workbook
+
+from create_transport_excel import create_transport_management_excel
+from transport_excel_bench import synthetic_fleet, synthetic_ledgers
+from transport_excel_calc import CellError, load_calculator
+
+DATA = [
+    # A: 区分, B: 金額, C: 月
+    ["燃料費", 100, 1],
+    ["修理費", 200, 1],
+    ["燃料費", 300, 2],
+    ["保険料", None, 2],
+    ["燃料費", "abc", 3],
+]
+
+
+def _evaluate(tmp_path, formulas):
+    """DATA を A1:C5 に置いたシートで数式を評価し、結果のリストを返す"""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "S"
+    for row in DATA:
+        ws.append(row)
+    for row, formula in enumerate(formulas, 1):
+        ws.cell(row=row, column=5, value=formula)
+    path = tmp_path / "calc.xlsx"
+    wb.save(path)
+    calc = load_calculator(str(path))
+    return [calc.cell("S", row, 5) for row in range(1, len(formulas) + 1)]
+
+
+@pytest.mark.parametrize("formula, expected", [
+    ("=1+2*3", 7),
+    ("=(1+2)*3", 9),
+    ("=2^3^2", 64),  # Excel のべき乗は左結合
+    ("=-2^2", 4),  # 単項マイナスはべき乗より先
+    ("=2*-3+10%", -5.9),
+    ("=10-4-3", 3),
+    ("=12/4/3", 1),
+    ('="a"&1+2', "a3"),  # 文字列連結は四則演算より後
+    ("=1+2=3", True),  # 比較は最後
+    ("=B1+B4", 100),  # 空欄は 0
+])
+def test_operator_precedence(tmp_path, formula, expected):
+    assert _evaluate(tmp_path, [formula]) == [pytest.approx(expected) if isinstance(expected, float) else expected]
+
+
+@pytest.mark.parametrize("formula, expected", [
+    ('=SUMIFS(B1:B5,A1:A5,"燃料費")', 400),  # 数値以外の金額は合計しない
+    ('=SUMIFS(B1:B5,A1:A5,"燃料費",C1:C5,2)', 300),
+    ('=SUMIFS(B1:B5,C1:C5,"1")', 300),  # 数値と数値文字列は同じ条件
+    ('=SUMIF(A1:A5,"修理費",B1:B5)', 200),
+    ('=SUMIF(C1:C5,3)', 3),
+    ('=COUNTIF(A1:A5,"燃料費")', 3),
+    ('=COUNTIF(A1:A5,"<>燃料費")', 2),
+    ('=COUNTIF(B1:B5,">=200")', 2),  # 数値との比較は数値のセルだけ
+    ('=COUNTIF(B1:B5,"<"&B3)', 2),
+    ('=COUNTIF(B1:B5,"=100")', 1),
+    # 比較演算子・ワイルドカードの条件は SUMIFS では使わないため #VALUE!（誤った合計を返さない）
+    ('=SUMIFS(B1:B5,A1:A5,"<>燃料費")', "#VALUE!"),
+    ('=SUMIFS(B1:B5,C1:C5,">=2")', "#VALUE!"),
+    ('=SUMIFS(B1:B5,A1:A5,"燃*")', "#VALUE!"),
+    ('=COUNTIF(A1:A5,"燃?費")', "#VALUE!"),
+])
+def test_criteria(tmp_path, formula, expected):
+    assert _evaluate(tmp_path, [formula]) == [expected]
+
+
+@pytest.mark.parametrize("formula, expected", [
+    ("=1/0", "#DIV/0!"),
+    ("=B1/B4", "#DIV/0!"),  # 空欄で割る
+    ("=(1/0)+1", "#DIV/0!"),  # エラーは演算を通して伝わる
+    ("=IF(1/0>1,1,2)", "#DIV/0!"),
+    ("=B5+1", "#VALUE!"),
+    ('=MATCH("車両",A1:A5,0)', "#N/A"),
+    ('=INDEX(B1:B5,MATCH("車両",A1:A5,0))', "#N/A"),
+    ('=MATCH("修理費",A1:A5,0)', 2),
+    ("=INDEX(B1:B5,6)", "#REF!"),
+    ("=LARGE(B1:B5,4)", "#NUM!"),
+    ("=NOSUCH(1)", "#NAME?"),
+])
+def test_error_values(tmp_path, formula, expected):
+    result, = _evaluate(tmp_path, [formula])
+    assert result == expected
+    if isinstance(expected, str):
+        assert isinstance(result, CellError)
+
+
+def test_calculated_formulas_match_values_mode(tmp_path):
+    """数式モードのブックを計算した結果が、集計値モード（書き出し時に集計）と一致する"""
+    data = {}
+    for summary in ("formulas", "values"):
+        path = tmp_path / f"{summary}.xlsx"
+        create_transport_management_excel(str(path), summary=summary, calculate=True, streaming=True,
+                                          **synthetic_fleet(8), **synthetic_ledgers(500, 8))
+        wb = openpyxl.load_workbook(path, data_only=True)
+        data[summary] = {name: [[cell.value for cell in row] for row in wb[name].iter_rows()]
+                         for name in ("損益計算表", "車両別収支", "資金繰り表", "ダッシュボード")}
+    for name, rows in data["values"].items():
+        assert len(rows) == len(data["formulas"][name]), name
+        for row_idx, (expected, actual) in enumerate(zip(rows, data["formulas"][name]), 1):
+            assert actual == pytest.approx(expected), f"{name} {row_idx}行目"
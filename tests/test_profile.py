@@ -0,0 +1,22 @@
+"""GenerationProfiler の工程ごとの計測値の確認"""
+import pytest
+
+from create_transport_excel import create_transport_management_excel
+from transport_excel_profile import GenerationProfiler
+
+
+@pytest.mark.parametrize("options", [
+    {"streaming": False},
+    {"streaming": True},
+    {"backend": "xlsxwriter"},
+], ids=["openpyxl", "write_only", "xlsxwriter"])
+def test_dashboard_section_is_counted(tmp_path, options):
+    if options.get("backend") == "xlsxwriter":
+        pytest.importorskip("xlsxwriter")
+    profiler = GenerationProfiler(log=False)
+    create_transport_management_excel(str(tmp_path / "out.xlsx"), on_stage=profiler, **options)
+    sections = {section["name"]: section for section in profiler.sections}
+    assert sections["ダッシュボード"]["rows"] > 0
+    assert sections["ダッシュボード"]["cells"] > 0
+    assert sections["ダッシュボード"]["conditional_formats"] > 0
+    assert sections["マスタ"]["conditional_formats"] == 0
@@ -0,0 +1,112 @@
+"""生成サーバー（transport_excel_server）の応答の確認"""
+import io
+import json
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import openpyxl
+import pytest
+
+from transport_excel_server import create_server
+
+COMPANY = {
+    "name": "山田運輸",
+    "streaming": True,
+    "ledgers": {
+        "売上入力": [{"日付": "2025-01-05", "取引先名": "A運送株式会社", "車両番号": "車両001", "売上金額": 150000}],
+    },
+}
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = create_server(port=0, workers=1, max_pending=2, timeout=60)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _post(server, payload):
+    data = payload if isinstance(payload, bytes) else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    request = urllib.request.Request(f"http://127.0.0.1:{server.server_port}/generate", data=data, method="POST")
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def _raw_request(server, head):
+    """本文を送らずにリクエストヘッダーだけを送り、応答のステータス行を返す"""
+    with socket.create_connection(("127.0.0.1", server.server_port), timeout=10) as sock:
+        sock.sendall(head)
+        return sock.recv(4096).split(b"\r\n", 1)[0]
+
+
+def _active(server):
+    """処理中のリクエスト数（応答の送信後に枠を戻すため、0 になるまで少し待つ）"""
+    for _ in range(50):
+        if server.active == 0:
+            break
+        time.sleep(0.1)
+    return server.active
+
+
+def test_generates_workbook(server):
+    status, body = _post(server, COMPANY)
+    assert status == 200
+    wb = openpyxl.load_workbook(io.BytesIO(body))
+    assert wb["売上入力"]["E4"].value == 150000
+
+
+@pytest.mark.parametrize("payload", [
+    b"{nope",
+    {**COMPANY, "summary": "bogus"},
+    {**COMPANY, "vehicles": "abc"},
+    {**COMPANY, "forecast": {"monthz": 3}},
+    {**COMPANY, "output": "/tmp/x.xlsx"},
+], ids=["json", "summary", "vehicles", "forecast", "output"])
+def test_rejects_malformed_definition(server, payload):
+    status, body = _post(server, payload)
+    assert status == 400
+    assert json.loads(body)["error"]
+
+
+def test_rejects_invalid_data(server):
+    rows = [{**COMPANY["ledgers"]["売上入力"][0], "売上金額": "abc"}]
+    status, body = _post(server, {**COMPANY, "ledgers": {"売上入力": rows}})
+    assert status == 422
+    assert "売上入力" in json.loads(body)["error"]
+
+
+def test_rejects_large_body(server, monkeypatch):
+    monkeypatch.setattr(server, "max_body", 10)
+    status, _ = _post(server, COMPANY)
+    assert status == 413
+
+
+def test_rejects_negative_content_length(server):
+    status_line = _raw_request(server, b"POST /generate HTTP/1.1\r\nHost: x\r\nContent-Length: -1\r\n\r\n")
+    assert status_line.endswith(b"400 Bad Request")
+    assert _active(server) == 0
+
+
+def test_rejects_when_busy_without_reading_body(server, monkeypatch):
+    monkeypatch.setattr(server, "max_pending", 0)
+    status_line = _raw_request(server, b"POST /generate HTTP/1.1\r\nHost: x\r\nContent-Length: 1000000\r\n\r\n")
+    assert status_line.endswith(b"503 Service Unavailable")
+    assert _active(server) == 0
+
+
+def test_times_out_and_recovers(server, monkeypatch):
+    with monkeypatch.context() as m:
+        m.setattr(server, "generation_timeout", 0.01)
+        status, _ = _post(server, COMPANY)
+    assert status == 504
+    status, _ = _post(server, COMPANY)  # 停止したワーカーは作り直される
+    assert status == 200
+    assert _active(server) == 0
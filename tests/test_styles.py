@@ -0,0 +1,33 @@
+"""書式の登録数が入力行数によらず一定であることの確認（名前付きスタイルで書式を共有する）"""
+import re
+import zipfile
+
+import pytest
+
+from create_transport_excel import create_transport_management_excel
+from transport_excel_bench import synthetic_fleet, synthetic_ledgers
+
+
+def _style_counts(path):
+    """xl/styles.xml の cellXfs・fonts の count"""
+    with zipfile.ZipFile(path) as zf:
+        styles = zf.read("xl/styles.xml").decode("utf-8")
+    return {tag: int(re.search(rf'<{tag} count="(\d+)"', styles).group(1)) for tag in ("cellXfs", "fonts")}
+
+
+@pytest.mark.parametrize("options", [
+    {"streaming": False},
+    {"streaming": True},
+    {"streaming": True, "summary": "values"},
+    {"backend": "xlsxwriter"},
+], ids=["openpyxl", "write_only", "values", "xlsxwriter"])
+def test_style_counts_do_not_grow_with_rows(tmp_path, options):
+    if options.get("backend") == "xlsxwriter":
+        pytest.importorskip("xlsxwriter")
+    counts = {}
+    for rows in (100, 5000):
+        path = tmp_path / f"{rows}.xlsx"
+        create_transport_management_excel(str(path), **synthetic_fleet(10), **synthetic_ledgers(rows, 10),
+                                          **options)
+        counts[rows] = _style_counts(path)
+    assert counts[100] == counts[5000]
@@ -0,0 +1,37 @@
+"""入力レコードの検証（validate=True）と、検証しない場合の集計の確認"""
+import pytest
+
+from create_transport_excel import LEDGER_SPECS, create_transport_management_excel
+
+SPECS = {spec.arg: spec for spec in LEDGER_SPECS}
+
+
+def _with_row(arg, **values):
+    """サンプルの先頭行を元に、指定した列を置き換えた行を末尾に加えたレコード"""
+    spec = SPECS[arg]
+    row = list(spec.sample[0])
+    for header, value in values.items():
+        row[[col.header for col in spec.columns].index(header)] = value
+    return list(spec.sample) + [row]
+
+
+@pytest.mark.parametrize("arg, values, message", [
+    ("sales", {"日付": None}, "売上入力 7行目: 日付が空欄です"),
+    ("sales", {"売上金額": ""}, "売上入力 7行目: 売上金額が空欄です"),
+    ("expenses", {"金額": None}, "経費入力 7行目: 金額が空欄です"),
+    ("cash", {"日付": ""}, "資金繰り入力 7行目: 日付が空欄です"),
+    ("sales", {"取引先名": "存在しない"}, "売上入力 7行目: 取引先名「存在しない」がマスタ・選択肢にありません"),
+])
+def test_rejects_blank_and_unknown_values(tmp_path, arg, values, message):
+    with pytest.raises(ValueError, match=message):
+        create_transport_management_excel(str(tmp_path / "out.xlsx"), summary="values",
+                                          **{arg: _with_row(arg, **values)})
+
+
+def test_values_mode_skips_blanks_without_validation(tmp_path):
+    sales = _with_row("sales", **{"日付": None}) + _with_row("sales", **{"売上金額": ""})[-1:]
+    cash = _with_row("cash", **{"金額": None})
+    path = tmp_path / "out.xlsx"
+    create_transport_management_excel(str(path), summary="values", ranking="values", validate=False,
+                                      sales=sales, cash=cash)
+    assert path.exists()
@@ -0,0 +1,32 @@
+"""backend="xlsxwriter" の書き出し結果が openpyxl と一致することの確認"""
+import tempfile
+
+import pytest
+
+pytest.importorskip("xlsxwriter")
+
+from create_transport_excel import WRITER_BACKENDS, create_transport_management_excel  # noqa: E402
+from transport_excel_bench import compare_workbooks, synthetic_fleet, synthetic_ledgers  # noqa: E402
+
+
+@pytest.mark.parametrize("options", [
+    {},
+    {"summary": "values", "calculate": True},
+    {"ranking": "values", "fiscal_year": 2025},
+], ids=["formulas", "values", "fiscal_year"])
+def test_backends_write_the_same_workbook(tmp_path, options):
+    paths = []
+    for backend in WRITER_BACKENDS:
+        paths.append(str(tmp_path / f"{backend}.xlsx"))
+        create_transport_management_excel(paths[-1], streaming=True, backend=backend, **synthetic_fleet(8),
+                                          **synthetic_ledgers(300, 8), **options)
+    assert compare_workbooks(*paths) == []
+
+
+def test_failed_generation_leaves_no_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    output = tmp_path / "out.xlsx"
+    sales = [[None, "", "存在しない取引先", "車両001", 100000, ""]]
+    with pytest.raises(ValueError):
+        create_transport_management_excel(str(output), backend="xlsxwriter", **synthetic_fleet(3), sales=sales)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,343 @@
+"""運送会社経営管理Excel 追記モード
+
+生成済みの運送会社経営管理ワークブックに、新しい月の入力データだけを追記する。
+
+    from transport_excel_append import append_ledgers
+    from transport_excel_loader import load_ledgers
+
+    append_ledgers("運送会社経営管理_v1.0.xlsx", **load_ledgers({"売上入力": "sales_2025_02.csv"}))
+
+openpyxl で開き直すとセルを全件オブジェクト化するため、ここでは xlsx 内の XML を
+直接書き換える。既存の行はバイト列のままストリームコピーし、Python 側で処理するのは
+追記する行と、範囲を延長するデータ検証・集計数式だけである（処理量は追記行数に比例する）。
+
+各入力シートでは </sheetData> の直前に行を追加し、次の範囲の終端行を更新する:
+    - データ検証（dv_client / dv_vehicle / dv_expense など）の sqref
+    - 集計シートの実データ範囲参照（例: 売上入力!E4:E120 -> 売上入力!E4:E150）
+データのない入力シートの範囲は先頭行だけ（売上入力!E4:E4）で書かれているため、それを延長する。
+データ検証のない空の入力シート（範囲を先頭行に揃える前の版で生成したもの）には、
+マスタの件数からプルダウンを作って加える。シートの寸法（dimension）は追記後の行数と
+合わなくなるため削除する（openpyxl の read_only などは寸法がなければ行を走査して求める）。
+
+追記する行は生成時と同じくマスタシートの一覧・年度（年度を指定して生成したブックは文書プロパティの
+fiscal_year・fiscal_start_month の年度内であること）・人件費の按分比率を確認する。
+誤りがあればブックは変更しない。
+
+計算結果を埋め込んだブック（calculate=True で生成したもの）は、追記後の集計セルに
+追記前の計算結果が残る。append_ledgers(calculate=True) で計算し直す。
+
+追記したブックは生成時の入力と内容が異なるため、文書プロパティの入力の指紋（input_fingerprint）を
+削除する（同じ入力で create_transport_management_excel(skip_unchanged=True) を実行すると再生成される）。
+
+summary="values" で生成したブックは集計値が固定値で書かれているため追記できない
+（追記後に集計が合わなくなる）。その場合は create_transport_management_excel で再生成する。
+"""
+import os
+import posixpath
+import re
+import tempfile
+import zipfile
+from datetime import date, datetime
+from functools import partial
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.datetime import to_excel
+
+from create_transport_excel import (
+    CUSTOM_PROPS_NS, FINGERPRINT_PROPERTY, LEDGER_SPECS, MASTER_LISTS, MASTER_SHEET, OPTIONAL_LEDGER_SPECS,
+    FiscalPeriod, LaborAllocation, MasterIndex, SingleFiscalYear,
+)
+
+MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# 引数名 -> 入力シートの定義
+LEDGERS = {spec.arg: spec for spec in LEDGER_SPECS + OPTIONAL_LEDGER_SPECS}
+
+CHUNK_SIZE = 1 << 20
+_ROW_RE = re.compile(rb'<row[^>]*?\sr="(\d+)"')
+_SHEET_DATA_END = b"</sheetData>"
+_DIMENSION_RE = re.compile(rb"<dimension\b[^>]*/>")
+_FINGERPRINT_RE = re.compile(rb'<property\b[^>]*\bname="' + FINGERPRINT_PROPERTY.encode() + rb'"[^>]*>.*?</property>',
+                             re.S)
+_SQREF_RE = re.compile(rb'sqref="[^"]*"')
+# マスタシートの一覧の位置（5行目から。取引先 A:B・車両 D:E・ドライバー G:H のコードと名称）
+_MASTER_FIRST_ROW = 5
+_MASTER_COLUMNS = {"clients": 0, "vehicles": 3, "drivers": 6}
+# ワークシートの子要素のうち dataValidations より後に置くもの
+_AFTER_VALIDATIONS = (b"<hyperlinks", b"<printOptions", b"<pageMargins", b"<pageSetup", b"<headerFooter",
+                      b"<rowBreaks", b"<colBreaks", b"<drawing", b"<legacyDrawing", b"<tableParts", b"<extLst",
+                      b"</worksheet>")
+
+
+def _sheet_parts(zin):
+    """シート名 -> xlsx 内のパス"""
+    workbook = ElementTree.fromstring(zin.read("xl/workbook.xml"))
+    rels = ElementTree.fromstring(zin.read("xl/_rels/workbook.xml.rels"))
+    targets = {}
+    for rel in rels.iter(f"{PKG_REL_NS}Relationship"):
+        target = rel.get("Target")
+        # openpyxl は絶対パス（/xl/...）、Excel は xl/ からの相対パスで書く
+        targets[rel.get("Id")] = target.lstrip("/") if target.startswith("/") else posixpath.join("xl", target)
+    return {sheet.get("name"): targets[sheet.get(f"{REL_NS}id")]
+            for sheet in workbook.iter(f"{MAIN_NS}sheet")}
+
+
+def _style_ids(zin):
+    """名前付きスタイル名 -> cellXfs のインデックス"""
+    styles = ElementTree.fromstring(zin.read("xl/styles.xml"))
+    named = {cs.get("name"): cs.get("xfId") for cs in styles.iter(f"{MAIN_NS}cellStyle")}
+    xfs = styles.find(f"{MAIN_NS}cellXfs")
+    by_xf_id = {}
+    for index, xf in enumerate(xfs if xfs is not None else []):
+        by_xf_id.setdefault(xf.get("xfId", "0"), index)
+    return {name: by_xf_id[xf_id] for name, xf_id in named.items() if xf_id in by_xf_id}
+
+
+def _custom_properties(zin):
+    """文書プロパティ（ユーザー設定）の 名前 -> 値の文字列"""
+    if "docProps/custom.xml" not in zin.namelist():
+        return {}
+    return {prop.get("name"): prop[0].text
+            for prop in ElementTree.fromstring(zin.read("docProps/custom.xml")).iter(f"{CUSTOM_PROPS_NS}property")
+            if len(prop)}
+
+
+def _fiscal_check(properties):
+    """追記する行の年度の確認（生成時の fiscal_year があればその年度内、なければ1会計年度に収まること）"""
+    start_month = int(properties.get("fiscal_start_month") or 1)
+    if properties.get("fiscal_year"):
+        return FiscalPeriod(int(properties["fiscal_year"]), start_month)
+    return SingleFiscalYear(start_month)
+
+
+def _cell_xml(ref, value, style_id):
+    """1セル分の XML（文字列はインライン文字列として書く）"""
+    s = f' s="{style_id}"' if style_id is not None else ""
+    if value is None or value == "":
+        return f'<c r="{ref}"{s}/>' if s else ""
+    if isinstance(value, bool):
+        return f'<c r="{ref}"{s} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"{s}><v>{value!r}</v></c>'
+    if isinstance(value, (date, datetime)):
+        return f'<c r="{ref}"{s}><v>{to_excel(value)!r}</v></c>'
+    value = str(value)
+    if value.startswith("="):
+        return f'<c r="{ref}"{s}><f>{escape(value[1:])}</f></c>'
+    return f'<c r="{ref}"{s} t="inlineStr"><is><t xml:space="preserve">{escape(value)}</t></is></c>'
+
+
+def _write_rows(dst, records, values, first_row, style_ids):
+    """追記行を書き込み、最終行番号を返す"""
+    columns = {}
+    last_row = first_row - 1
+    for last_row, data in enumerate(records, first_row):
+        cells = []
+        for col, (value, style) in enumerate(values(data, last_row), 1):
+            letter = columns.get(col) or columns.setdefault(col, get_column_letter(col))
+            cells.append(_cell_xml(f"{letter}{last_row}", value, style_ids.get(style)))
+        dst.write(f'<row r="{last_row}">{"".join(cells)}</row>'.encode("utf-8"))
+    return last_row
+
+
+def _extend_ranges(xml, first_row, old_last, new_last):
+    """データ検証などの X{first_row}:X{old_last} 形式の範囲の終端を new_last に延長する"""
+    first = str(first_row).encode()
+    pattern = re.compile(rb"\b([A-Z]{1,3})" + first + rb":([A-Z]{1,3})" + str(old_last).encode() + rb"(?!\d)")
+    xml = pattern.sub(rb"\g<1>" + first + rb":\g<2>" + str(new_last).encode(), xml)
+    if old_last == first_row:  # openpyxl は1行だけの範囲（C4:C4）を sqref に C4 と書く
+        cell = re.compile(rb'(?<=[" ])([A-Z]{1,3})' + first + rb'(?=[" ])')
+        xml = _SQREF_RE.sub(
+            lambda m: cell.sub(rb"\g<1>" + first + rb":\g<1>" + str(new_last).encode(), m.group(0)), xml)
+    return xml
+
+
+def _master_index(path):
+    """ブックのマスタシートの一覧から MasterIndex を作る（読み取り専用で開き、マスタシートだけを読む）"""
+    wb = load_workbook(path, read_only=True)
+    try:
+        if MASTER_SHEET.name not in wb.sheetnames:
+            raise ValueError(f"{path}: シート「{MASTER_SHEET.name}」がありません")
+        lists = {key: [] for key in _MASTER_COLUMNS}
+        for row in wb[MASTER_SHEET.name].iter_rows(min_row=_MASTER_FIRST_ROW, max_col=8, values_only=True):
+            row = (*row, None, None)
+            for key, pos in _MASTER_COLUMNS.items():
+                if row[pos] is not None:
+                    lists[key].append([row[pos], row[pos + 1]])
+    finally:
+        wb.close()
+    return MasterIndex(**lists)
+
+
+def _checked(records, first_row, spec, master, fiscal, allocation):
+    """追記行をマスタ・年度と照合し、人件費は按分比率の確認用に集める（生成時の validate=True と同じ）"""
+    records = fiscal.check_records(spec, master.check_records(spec, records, first_row), first_row)
+    return allocation.collect(records) if spec.arg == "labor" and allocation is not None else records
+
+
+def _validations(spec, list_formulas):
+    """入力シートのプルダウン [(列文字, formula1)]（create_transport_excel の _render_ledger と同じ設定）"""
+    result = []
+    for i, col in enumerate(spec.columns, 1):
+        if col.validation is None:
+            continue
+        if isinstance(col.validation, str):
+            formula1 = list_formulas[col.validation]
+        else:
+            formula1 = '"' + ",".join(col.validation) + '"'
+        result.append((get_column_letter(i), formula1))
+    return result
+
+
+def _insert_validations(tail, validations, first_row, last_row):
+    """</sheetData> 以降の XML にデータ検証を加える（スキーマの順序どおり pageMargins などの前に置く）"""
+    items = "".join(
+        f'<dataValidation sqref="{col}{first_row}:{col}{last_row}" allowBlank="1" type="list">'
+        f"<formula1>{escape(formula1)}</formula1></dataValidation>" for col, formula1 in validations)
+    xml = f'<dataValidations count="{len(validations)}">{items}</dataValidations>'.encode("utf-8")
+    pos = min(i for i in (tail.find(tag) for tag in _AFTER_VALIDATIONS) if i >= 0)
+    return tail[:pos] + xml + tail[pos:]
+
+
+def _append_to_part(src, dst, records, values, first_row, style_ids, validations=(), check=None):
+    """入力シートの XML をストリームコピーしながら末尾に行を追記する
+
+    validations はデータ検証がない場合に加えるプルダウン [(列文字, formula1)]。
+    check は追記行の確認 check(records, 追記開始行) -> records（行番号は既存の行数が分かってから決まる）。
+    戻り値は (追記前の最終行, 追記後の最終行)。
+    """
+    carry = b""
+    last_row = 0
+    head = True
+    while True:
+        chunk = src.read(CHUNK_SIZE)
+        data = carry + chunk
+        if head:  # dimension はシートの先頭付近（sheetData より前）にある
+            data = _DIMENSION_RE.sub(b"", data, count=1)
+            head = False
+        end = data.find(_SHEET_DATA_END)
+        for m in _ROW_RE.finditer(data if end < 0 else data[:end]):
+            last_row = int(m.group(1))
+        if end >= 0:
+            break
+        if not chunk:
+            raise ValueError("sheetData の終端が見つかりません")
+        # 行タグや </sheetData> がチャンク境界で分断されても検出できるよう末尾を持ち越す
+        keep = 64
+        dst.write(data[:-keep])
+        carry = data[-keep:]
+
+    dst.write(data[:end])
+    old_last = max(last_row, first_row - 1)
+    if check is not None:
+        records = check(records, old_last + 1)
+    new_last = _write_rows(dst, records, values, old_last + 1, style_ids)
+    tail = data[end:] + src.read()  # </sheetData> 以降（結合セル・データ検証など）は小さい
+    range_last = max(old_last, first_row)  # データのないシートの範囲は先頭行だけ
+    if new_last > range_last:
+        tail = _extend_ranges(tail, first_row, range_last, new_last)
+    if validations and new_last >= first_row and b"<dataValidations" not in tail:
+        tail = _insert_validations(tail, validations, first_row, new_last)
+    dst.write(tail)
+    return old_last, new_last
+
+
+def _extend_references(xml, sheet, first_row, old_last, new_last):
+    """集計シートの「シート名!X4:Y{old_last}」参照の終端を延長する"""
+    pattern = re.compile(
+        rb"('?" + re.escape(sheet.encode("utf-8")) + rb"'?!\$?[A-Z]{1,3}\$?" + str(first_row).encode()
+        + rb":\$?[A-Z]{1,3}\$?)" + str(old_last).encode() + rb"(?!\d)")
+    return pattern.sub(rb"\g<1>" + str(new_last).encode(), xml)
+
+
+def append_ledgers(path, sales=None, expenses=None, labor=None, cash=None, output_path=None, calculate=False,
+                   validate=True, **extra_ledgers):
+    """既存ワークブックの入力シートに新しい行を追記する
+
+    sales/expenses/labor/cash は create_transport_management_excel と同じ形式のレコード。
+    追加の入力シート（高速代入力など）は LedgerSpec.arg をキーワード引数名として渡す。
+    output_path を省略すると path を置き換える。戻り値は {シート名: (追記開始行, 最終行)}。
+    calculate=True の場合、追記後に transport_excel_calc で数式の計算結果を書き込み直す。
+
+    validate=True では生成時と同じく追記する行を確認し、誤りがあれば ValueError とする
+    （ブックは変更しない）:
+        - 取引先・車両・ドライバーがブックのマスタシートにあり、選択肢の列が選択肢のいずれかであること
+        - 年度を指定して生成したブック（文書プロパティ fiscal_year）では日付が年度内、
+          それ以外では追記する行が2つ以上の年度にまたがらないこと
+        - 人件費はドライバーごと・月ごとの按分比率の合計が100%であること（追記する行だけで
+          確認するため、人件費は月単位でまとめて追記する）
+    """
+    unknown = set(extra_ledgers) - set(LEDGERS)
+    if unknown:
+        raise TypeError(f"入力シートの定義がない引数です: {', '.join(sorted(unknown))}")
+    deltas = {name: records for name, records in
+              (("sales", sales), ("expenses", expenses), ("labor", labor), ("cash", cash), *extra_ledgers.items())
+              if records is not None}
+    output_path = output_path or path
+    appended = {}
+
+    with zipfile.ZipFile(path) as zin:
+        parts = _sheet_parts(zin)
+        style_ids = _style_ids(zin)
+        master = _master_index(path)
+        list_formulas = {key: master.list_formula(key) for key in MASTER_LISTS}
+        fiscal = _fiscal_check(_custom_properties(zin))
+        allocation = LaborAllocation() if validate and "labor" in deltas else None
+        ledger_parts = {}
+        for name in deltas:
+            sheet = LEDGERS[name].name
+            if sheet not in parts:
+                raise ValueError(f"{path}: シート「{sheet}」がありません")
+            ledger_parts[parts[sheet]] = name
+        ledger_sheets = [spec.name for spec in LEDGERS.values()]
+        summary_parts = [p for s, p in parts.items() if s not in ledger_sheets]
+
+        # 集計値モードのブックは数式が入力シートを参照していない
+        reference = re.compile(rb"(?:" + b"|".join(re.escape(s.encode("utf-8")) for s in ledger_sheets) + rb")'?!")
+        if deltas and not any(reference.search(zin.read(p)) for p in summary_parts):
+            raise ValueError(f"{path}: 集計値モード（summary=\"values\"）のブックには追記できません。再生成してください")
+
+        fd, tmp_path = tempfile.mkstemp(suffix=".xlsx", dir=os.path.dirname(os.path.abspath(output_path)))
+        os.close(fd)
+        try:
+            with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as zout:
+                # 入力シートを先に書き、延長後の最終行を確定させる
+                for info in zin.infolist():
+                    if info.filename in ledger_parts:
+                        name = ledger_parts[info.filename]
+                        spec = LEDGERS[name]
+                        values = partial(spec.row_values, plan=spec.row_plan())
+                        check = partial(_checked, spec=spec, master=master, fiscal=fiscal,
+                                        allocation=allocation) if validate else None
+                        with zin.open(info) as src, zout.open(info.filename, "w", force_zip64=True) as dst:
+                            appended[spec.name] = (spec.first_row, *_append_to_part(
+                                src, dst, deltas[name], values, spec.first_row, style_ids,
+                                _validations(spec, list_formulas), check))
+                for info in zin.infolist():
+                    if info.filename in ledger_parts:
+                        continue
+                    data = zin.read(info)
+                    if info.filename == "docProps/custom.xml" and appended:
+                        data = _FINGERPRINT_RE.sub(b"", data)
+                    if info.filename in summary_parts:
+                        for sheet, (first_row, old_last, new_last) in appended.items():
+                            range_last = max(old_last, first_row)
+                            if new_last > range_last:
+                                data = _extend_references(data, sheet, first_row, range_last, new_last)
+                    zout.writestr(info, data, compress_type=zipfile.ZIP_DEFLATED)
+            if allocation is not None:
+                allocation.check_ratios()
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    if calculate:
+        from transport_excel_calc import calculate_workbook  # transport_excel_calc はこのモジュールを参照する
+        calculate_workbook(output_path)
+    return {sheet: (old_last + 1, new_last) for sheet, (_, old_last, new_last) in appended.items()}
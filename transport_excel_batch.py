@@ -0,0 +1,222 @@
+"""運送会社経営管理Excel 複数社一括生成
+
+マニフェスト（JSON）に記載した会社ごとに1ファイルずつ、CPU コア数に応じた
+プロセスプールで並列生成する。1社の入力エラーで一括処理全体は止まらず、
+会社ごとの所要時間と失敗理由を結果として返す。
+
+    python transport_excel_batch.py manifest.json --workers 4 --output-dir out
+
+マニフェストの形式（パスはマニフェストのあるディレクトリからの相対パスで可）:
+
+    {
+      "companies": [
+        {
+          "name": "山田運輸",
+          "output": "山田運輸_経営管理.xlsx",
+          "clients": [["C001", "A運送株式会社"], ["C002", "B物流センター"]],
+          "vehicles": [["車両001", "2tトラック"], ["車両002", "4tトラック"]],
+          "drivers": [["D001", "田中太郎"]],
+          "sources": {"売上入力": "yamada/sales.csv", "経費入力": "yamada/fuel.parquet"},
+          "streaming": true,
+          "summary": "values",
+          "backend": "xlsxwriter",
+          "calculate": true,
+          "fiscal_year": 2025,
+          "fiscal_start_month": 4,
+          "forecast": {"months": 12, "recurring": [{"name": "リース料", "amount": 250000}]}
+        }
+      ]
+    }
+
+GENERATION_OPTIONS にある項目は create_transport_management_excel の同名の引数に渡す。
+forecast は transport_excel_forecast.CashForecast の設定（CashForecast.from_config）。
+マニフェストの代わりに1社分の定義（"companies" のない会社定義の JSON）も読める。
+入力データは sources（ファイル）のほか、"ledgers": {"売上入力": [{"日付": "2025-01-05", ...}, ...]}
+のように JSON の行で直接書いてもよい（transport_excel_loader.load_json_ledgers）。
+output を省略した場合は「運送会社経営管理_<name>.xlsx」を出力先ディレクトリに作成する。
+入力ファイル・設定が前回の生成時から変わっていない会社は生成を省略する
+（"skip_unchanged": false で常に再生成）。
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from create_transport_excel import LEDGER_SPECS, WRITER_BACKENDS, create_transport_management_excel
+from transport_excel_forecast import CashForecast
+from transport_excel_loader import fingerprint_sources, load_json_ledgers, load_ledgers
+
+# 会社定義からそのまま create_transport_management_excel に渡す項目
+GENERATION_OPTIONS = ("streaming", "summary", "backend", "calculate", "clients", "vehicles", "drivers",
+                      "fiscal_year", "fiscal_start_month", "opening_balance", "cash_threshold", "ranking", "top_k",
+                      "chart_top_n")
+
+# 会社定義の項目（GENERATION_OPTIONS 以外）
+COMPANY_KEYS = ("name", "output", "sources", "ledgers", "encoding", "skip_unchanged", "forecast")
+_CHOICES = {"summary": ("formulas", "values"), "ranking": ("auto", "formulas", "values"), "backend": WRITER_BACKENDS}
+_FLAGS = ("streaming", "calculate", "skip_unchanged")
+_COUNTS = ("top_k", "chart_top_n")
+_AMOUNTS = ("opening_balance", "cash_threshold")
+_LEDGER_SHEETS = [spec.name for spec in LEDGER_SPECS]
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def validate_company(company):
+    """会社定義の項目と値の形式を確認する（誤りは ValueError。入力データの中身は生成時に確認する）"""
+    name = company.get("name", "")
+    unknown = sorted(set(company) - set(COMPANY_KEYS) - set(GENERATION_OPTIONS))
+    if unknown:
+        raise ValueError(f"{name}: 不明な項目があります: {', '.join(unknown)}")
+    for key, choices in _CHOICES.items():
+        if key in company and company[key] not in choices:
+            raise ValueError(f"{name}: {key} は {'・'.join(choices)} のいずれかを指定してください: {company[key]!r}")
+    for key in _FLAGS:
+        if key in company and not isinstance(company[key], bool):
+            raise ValueError(f"{name}: {key} は true / false で指定してください: {company[key]!r}")
+    for key in _COUNTS:
+        if key in company and not (_is_int(company[key]) and company[key] >= 0):
+            raise ValueError(f"{name}: {key} は0以上の整数で指定してください: {company[key]!r}")
+    for key in _AMOUNTS:
+        if key in company and not (_is_int(company[key]) or isinstance(company[key], float)):
+            raise ValueError(f"{name}: {key} は金額（数値）で指定してください: {company[key]!r}")
+    if company.get("fiscal_year") is not None and not _is_int(company["fiscal_year"]):
+        raise ValueError(f"{name}: fiscal_year は整数で指定してください: {company['fiscal_year']!r}")
+    if "fiscal_start_month" in company and company["fiscal_start_month"] not in range(1, 13):
+        raise ValueError(f"{name}: fiscal_start_month は1〜12を指定してください: {company['fiscal_start_month']!r}")
+    for key in ("clients", "vehicles", "drivers"):
+        records = company.get(key)
+        if records is not None and not (isinstance(records, list) and all(
+                isinstance(r, list) and len(r) == 2 and all(isinstance(v, str) for v in r) for r in records)):
+            raise ValueError(f"{name}: {key} は [コード, 名称] の組のリストで指定してください")
+    for key, kind in (("sources", "ファイルパス"), ("ledgers", "行のリスト")):
+        ledgers = company.get(key, {})
+        if not isinstance(ledgers, dict) or not all(
+                isinstance(v, str if key == "sources" else list) for v in ledgers.values()):
+            raise ValueError(f"{name}: {key} は {{シート名: {kind}}} の形式で指定してください")
+        unknown = sorted(set(ledgers) - set(_LEDGER_SHEETS))
+        if unknown:
+            raise ValueError(f"{name}: {key} に指定できるシートは {'・'.join(_LEDGER_SHEETS)} です: {', '.join(unknown)}")
+    if company.get("forecast"):
+        if not isinstance(company["forecast"], dict):
+            raise ValueError(f"{name}: forecast は資金繰り予測の設定（オブジェクト）で指定してください")
+        try:
+            CashForecast.from_config(company["forecast"])
+        except (AttributeError, TypeError, ValueError) as e:
+            raise ValueError(f"{name}: forecast の設定が正しくありません: {e}") from e
+
+
+def load_manifest(path):
+    """マニフェストを読み込み、相対パスをマニフェストの位置基準で解決した会社定義のリストを返す"""
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    if isinstance(manifest, dict):
+        companies = manifest["companies"] if "companies" in manifest else [manifest]
+    else:
+        companies = manifest
+    for company in companies:
+        if "name" not in company:
+            raise ValueError(f"{path}: name のない会社定義があります")
+        company["sources"] = {sheet: os.path.join(base, p)
+                              for sheet, p in company.get("sources", {}).items()}
+        if company.get("output"):
+            company["output"] = os.path.join(base, company["output"])
+    return companies
+
+
+def generate_company(company, output_dir=".", on_stage=None):
+    """1社分のワークブックを生成し、結果（所要時間・失敗理由）を dict で返す
+
+    プロセスプールのワーカーから呼ばれるため例外は送出せず結果に記録する。
+    on_stage は create_transport_management_excel にそのまま渡す（計測用）。
+    """
+    name = company["name"]
+    output = company.get("output") or os.path.join(output_dir, f"運送会社経営管理_{name}.xlsx")
+    start = time.perf_counter()
+    skipped = False
+    error_type = None
+    try:
+        validate_company(company)
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        sources = company.get("sources", {})
+        inline = company.get("ledgers", {})
+        encoding = company.get("encoding", "utf-8-sig")
+        if set(sources) & set(inline):
+            raise ValueError(f"sources と ledgers の両方に指定されたシートがあります: {', '.join(set(sources) & set(inline))}")
+        before = os.stat(output).st_mtime_ns if os.path.exists(output) else None
+        options = {key: company[key] for key in GENERATION_OPTIONS if key in company}
+        if company.get("forecast"):
+            options["forecast"] = CashForecast.from_config(company["forecast"])
+        create_transport_management_excel(
+            output,
+            on_stage=on_stage,
+            skip_unchanged=company.get("skip_unchanged", True),
+            # JSON の行を含む会社は入力ファイルの指紋では変更を判定できない
+            input_fingerprint=fingerprint_sources(sources, encoding) if sources and not inline else None,
+            **options,
+            **load_ledgers(sources, encoding=encoding),
+            **load_json_ledgers(inline),
+        )
+        skipped = before is not None and os.stat(output).st_mtime_ns == before  # 指紋が一致して書き換えなかった
+        error = None
+    except Exception as e:
+        error_type = type(e).__name__
+        error = f"{error_type}: {e}"
+        if isinstance(e, ValueError):  # 入力の誤りはメッセージだけで足りる
+            print(f"❌ {name}: {error}", file=sys.stderr)
+        else:
+            traceback.print_exc()
+    return {
+        "name": name,
+        "output": output,
+        "ok": error is None,
+        "skipped": skipped,
+        "seconds": round(time.perf_counter() - start, 3),
+        "error": error,
+        "error_type": error_type,  # 入力の誤りは ValueError（transport_excel_server が応答を分ける）
+    }
+
+
+def generate_batch(companies, max_workers=None, output_dir="."):
+    """会社定義のリストをプロセスプールで並列生成し、会社ごとの結果をリストで返す"""
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(generate_company, company, output_dir): company["name"]
+                   for company in companies}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:  # ワーカープロセスの異常終了など
+                result = {"name": futures[future], "output": None, "ok": False, "skipped": False,
+                          "seconds": None, "error": f"{type(e).__name__}: {e}", "error_type": type(e).__name__}
+            status = "❌" if not result["ok"] else "⏭" if result["skipped"] else "✅"
+            print(f"{status} {result['name']}: {result['seconds']}秒 {result['error'] or ''}".rstrip())
+            results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="運送会社経営管理Excel 複数社一括生成")
+    parser.add_argument("manifest", help="会社定義のマニフェスト（JSON）")
+    parser.add_argument("--workers", type=int, default=None, help="並列プロセス数（既定: CPU コア数）")
+    parser.add_argument("--output-dir", default=".", help="output 未指定の会社の出力先ディレクトリ")
+    parser.add_argument("--report", help="結果を JSON で書き出すパス")
+    args = parser.parse_args()
+
+    results = generate_batch(load_manifest(args.manifest), args.workers, args.output_dir)
+    failed = [r for r in results if not r["ok"]]
+    print(f"完了: {len(results) - len(failed)}社 / 失敗: {len(failed)}社")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+"""運送会社経営管理Excel ベンチマーク
+
+1. 生成処理のスケーリング（--suite）
+
+    python transport_excel_bench.py --suite --report bench.json
+    python transport_excel_bench.py --suite --fleets 5,50 --ledger-rows 1000,100000 --baseline bench.json
+
+合成した車両台数（既定 5 / 50 / 500 台）と入力シートの行数（既定 1千 / 10万 / 100万行）の
+組み合わせごとにワークブックを生成し、工程（master / ledgers / summaries / dashboard / save）
+ごとの所要時間・セル数と tracemalloc によるメモリ使用量のピーク（シート単位の内訳は
+sections）、全体の所要時間・最大 RSS・ファイルサイズを JSON で出力する。各ケースは別プロセスで実行するため、最大 RSS は
+ケースごとの値になる。--baseline に以前のレポートを渡すと、許容幅（--tolerance）を
+超えて悪化した項目を表示して終了コード 1 を返す。tracemalloc は処理を遅くするため、
+所要時間だけを比べる場合は --no-tracemalloc を付ける。
+
+2. 書き出し先（backend）の比較（--backends）
+
+    python transport_excel_bench.py --backends --parity-rows 2000 --rows 100000
+
+同じ合成データを openpyxl と XlsxWriter（backend="xlsxwriter"）で書き出し、
+parity-rows 行のブックを openpyxl で読み直して値・数式・書式・セル結合・データ検証・
+条件付き書式・グラフ・文書プロパティが一致するかを確かめ（相違があれば終了コード 1）、
+rows 行での所要時間・行数/秒・ファイルサイズを比べる。
+
+3. 再計算時間（LibreOffice headless）
+
+    python transport_excel_bench.py --rows 100000
+
+LibreOffice headless で生成済みワークブックを開き直し、再計算にかかる時間を測る。
+同じ合成データから summary="formulas"（実データ範囲限定の数式）と
+summary="values"（集計済みの値）の2種類を生成し、それぞれを soffice で
+xlsx に変換する時間を計測する。変換時間には読み込み・保存も含まれるため、
+両者の差を集計数式の再計算時間とみなす。
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+import openpyxl
+
+from openpyxl.utils import get_column_letter
+
+from create_transport_excel import FINGERPRINT_PROPERTY, WRITER_BACKENDS, create_transport_management_excel
+from transport_excel_profile import GenerationProfiler
+
+EXPENSE_TYPES = ["燃料費", "修理費", "保険料", "リース料", "その他"]
+CLIENTS = ["A運送株式会社", "B物流センター", "C製造工場", "D商事", "E倉庫"]
+VEHICLE_TYPES = ["2tトラック", "4tトラック", "10tトラック"]
+
+DEFAULT_FLEETS = [5, 50, 500]
+DEFAULT_LEDGER_ROWS = [1000, 100000, 1000000]
+
+
+def synthetic_fleet(vehicles):
+    """合成データのマスタ（取引先・車両・ドライバー。ドライバーは車両と同数）"""
+    return {
+        "clients": [[f"C{i:03d}", name] for i, name in enumerate(CLIENTS, 1)],
+        "vehicles": [[f"車両{i:03d}", VEHICLE_TYPES[i % len(VEHICLE_TYPES)]] for i in range(1, vehicles + 1)],
+        "drivers": [[f"D{i:03d}", f"ドライバー{i:03d}"] for i in range(1, vehicles + 1)],
+    }
+
+
+def synthetic_ledgers(rows, vehicles=5, year=2025, seed=0):
+    """合成データの入力レコードジェネレーターを返す（売上・経費・資金繰りは各 rows 行）"""
+    vehicle_ids = [f"車両{i:03d}" for i in range(1, vehicles + 1)]
+
+    def sales():
+        rnd = random.Random(seed)
+        for i in range(rows):
+            yield [date(year, 1 + i % 12, 1 + i % 28), "", rnd.choice(CLIENTS),
+                   rnd.choice(vehicle_ids), rnd.randrange(50000, 300000, 1000), ""]
+
+    def expenses():
+        rnd = random.Random(seed + 1)
+        for i in range(rows):
+            yield [date(year, 1 + i % 12, 1 + i % 28), "", rnd.choice(vehicle_ids),
+                   rnd.choice(EXPENSE_TYPES), rnd.randrange(1000, 100000, 100), ""]
+
+    def labor():
+        for m in range(1, 13):
+            for i, vehicle in enumerate(vehicle_ids):
+                yield [f"ドライバー{i + 1:03d}", vehicle, 100, m, 300000, "", ""]
+
+    def cash():
+        rnd = random.Random(seed + 2)
+        for i in range(rows):
+            kind = rnd.choice(["入金", "出金"])
+            yield [date(year, 1 + i % 12, 1 + i % 28), "", kind,
+                   "売上入金" if kind == "入金" else "燃料費支払", rnd.randrange(1000, 500000, 1000), ""]
+
+    return {"sales": sales(), "expenses": expenses(), "labor": labor(), "cash": cash()}
+
+
+def _convert_seconds(soffice, path, outdir):
+    """soffice で xlsx -> xlsx 変換（読み込み・再計算・保存）にかかる秒数"""
+    start = time.perf_counter()
+    subprocess.run(
+        [soffice, "--headless", "--norestore", "--convert-to", "xlsx", "--outdir", outdir, path],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def bench_recalc(rows=100000, vehicles=5, soffice="soffice", workdir=None):
+    """LibreOffice headless での再計算時間を計測して結果を dict で返す"""
+    if shutil.which(soffice) is None:
+        raise RuntimeError(f"{soffice} が見つかりません（LibreOffice をインストールしてください）")
+
+    tmpdir = None if workdir else tempfile.mkdtemp(prefix="transport_bench_")
+    workdir = workdir or tmpdir
+    result = {"rows": rows, "vehicles": vehicles}
+    try:
+        for summary in ("formulas", "values"):
+            path = os.path.join(workdir, f"bench_{summary}.xlsx")
+            start = time.perf_counter()
+            create_transport_management_excel(path, streaming=True, summary=summary,
+                                              **synthetic_fleet(vehicles), **synthetic_ledgers(rows, vehicles))
+            result[f"generate_{summary}_sec"] = round(time.perf_counter() - start, 3)
+            outdir = os.path.join(workdir, f"converted_{summary}")
+            result[f"soffice_{summary}_sec"] = round(_convert_seconds(soffice, path, outdir), 3)
+    finally:
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+    result["recalc_sec"] = round(result["soffice_formulas_sec"] - result["soffice_values_sec"], 3)
+    return result
+
+
+def _max_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / 2 ** 20 if sys.platform == "darwin" else rss / 2 ** 10, 1)  # macOS はバイト単位
+
+
+def run_case(vehicles, rows, streaming=True, summary="formulas", workdir=None, trace_memory=True, keep=False,
+             backend="openpyxl"):
+    """1ケース（車両台数 × 行数）を生成し、工程ごとの計測結果を dict で返す
+
+    keep=True では生成したブックを workdir に残す（workdir を指定しない場合は一時ディレクトリごと削除する）。
+    """
+    tmpdir = None if workdir else tempfile.mkdtemp(prefix="transport_bench_")
+    workdir = workdir or tmpdir
+    path = os.path.join(workdir, f"bench_{vehicles}v_{rows}r_{backend}.xlsx")
+    profiler = GenerationProfiler(trace_memory=trace_memory, log=False)
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(sys.stderr):  # 標準出力は JSON レポート用に空けておく
+            create_transport_management_excel(path, streaming=streaming, summary=summary, on_stage=profiler,
+                                              backend=backend,
+                                              **synthetic_fleet(vehicles), **synthetic_ledgers(rows, vehicles))
+        result = {
+            "vehicles": vehicles,
+            "rows": rows,
+            "wall_sec": round(time.perf_counter() - start, 3),
+            "max_rss_mb": _max_rss_mb(),
+            "file_bytes": os.path.getsize(path),
+            "stages": profiler.stages(),
+            "sections": profiler.sections,
+        }
+        if not keep:
+            os.remove(path)
+        return result
+    finally:
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def run_suite(fleets=DEFAULT_FLEETS, ledger_rows=DEFAULT_LEDGER_ROWS, streaming=True, summary="formulas",
+              workdir=None, trace_memory=True):
+    """車両台数 × 行数の全組み合わせを計測し、JSON に書き出せるレポートを返す"""
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "openpyxl": openpyxl.__version__,
+        "platform": platform.platform(),
+        "streaming": streaming,
+        "summary": summary,
+        "trace_memory": trace_memory,
+        "cases": [],
+    }
+    tmpdir = None if workdir else tempfile.mkdtemp(prefix="transport_bench_")
+    context = multiprocessing.get_context("spawn")  # ケースごとに新しいプロセスで最大 RSS を測る
+    try:
+        for vehicles in fleets:
+            for rows in ledger_rows:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    case = executor.submit(run_case, vehicles, rows, streaming, summary,
+                                           workdir or tmpdir, trace_memory).result()
+                print(f"{vehicles}台 × {rows}行: {case['wall_sec']}秒 "
+                      f"{case['file_bytes'] / 2 ** 20:.1f}MB", file=sys.stderr)
+                report["cases"].append(case)
+    finally:
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+    return report
+
+
+def _cell_format(cell):
+    """比較用のセルの書式（スタイルの登録方法によらない実際の表示）"""
+    font, fill = cell.font, cell.fill
+    return (
+        cell.number_format,
+        bool(font.b), font.sz or 11.0,  # サイズの指定がなければ既定の11ポイント
+        font.color.rgb[-6:] if font.color is not None and font.color.type == "rgb" else None,
+        fill.fgColor.rgb[-6:] if fill.fill_type == "solid" else None,
+        cell.alignment.horizontal,
+        cell.border.left.style,
+    )
+
+
+def _chart_summary(chart):
+    """比較用のグラフの内容（種類・位置・タイトル・系列の参照）"""
+    title = None
+    if chart.title is not None and chart.title.tx is not None and chart.title.tx.rich is not None:
+        title = "".join(run.t for p in chart.title.tx.rich.p for run in (p.r or []))
+    marker = chart.anchor._from
+    series = []
+    for s in chart.series:
+        refs = [s.tx.strRef.f if s.tx is not None and s.tx.strRef is not None else None]
+        for source in (s.val, s.cat):
+            ref = source and (source.numRef or source.strRef)
+            refs.append(ref.f if ref is not None else None)
+        series.append(tuple(refs))
+    return chart.tagname, (marker.col, marker.row), title, tuple(series)
+
+
+def _column_widths(ws):
+    """列 -> 幅（同じ幅の連続した列をまとめて保存したブックも列ごとに展開する）"""
+    return {get_column_letter(col): dim.width for dim in ws.column_dimensions.values() if dim.customWidth
+            for col in range(dim.min, dim.max + 1)}
+
+
+def compare_workbooks(path_a, path_b):
+    """2つのブックを openpyxl で読み直して比べ、相違点の説明をリストで返す（一致すれば空）"""
+    wb_a, wb_b = openpyxl.load_workbook(path_a), openpyxl.load_workbook(path_b)
+    differences = []
+    if wb_a.sheetnames != wb_b.sheetnames:
+        return [f"シートの並び: {wb_a.sheetnames} != {wb_b.sheetnames}"]
+
+    def check(label, a, b):
+        if a != b:
+            differences.append(f"{label}: {a!r} != {b!r}")
+
+    for name in wb_a.sheetnames:
+        ws_a, ws_b = wb_a[name], wb_b[name]
+        cells_a = {(c.row, c.column): c for row in ws_a.iter_rows() for c in row}
+        cells_b = {(c.row, c.column): c for row in ws_b.iter_rows() for c in row}
+        for key in sorted(cells_a.keys() | cells_b.keys()):
+            a, b = cells_a.get(key), cells_b.get(key)
+            ref = f"{name}!{get_column_letter(key[1])}{key[0]}"
+            check(f"{ref} 値", a.value if a is not None and a.value != "" else None,
+                  b.value if b is not None and b.value != "" else None)
+            if a is not None and b is not None and (a.value is not None or a.has_style or b.has_style):
+                check(f"{ref} 書式", _cell_format(a), _cell_format(b))
+        check(f"{name} セル結合", sorted(map(str, ws_a.merged_cells.ranges)), sorted(map(str, ws_b.merged_cells.ranges)))
+        check(f"{name} 枠線", ws_a.sheet_view.showGridLines, ws_b.sheet_view.showGridLines)
+        check(f"{name} ウィンドウ枠の固定", ws_a.freeze_panes, ws_b.freeze_panes)
+        widths_a, widths_b = _column_widths(ws_a), _column_widths(ws_b)
+        for col in sorted(widths_a.keys() | widths_b.keys()):
+            if abs(widths_a.get(col, 0) - widths_b.get(col, 0)) > 1:
+                check(f"{name} {col}列の幅", widths_a.get(col), widths_b.get(col))
+
+        def validations(ws):
+            return sorted((dv.type, (dv.formula1 or "").lstrip("="), str(dv.sqref), bool(dv.allow_blank))
+                          for dv in ws.data_validations.dataValidation)
+
+        def conditional_formats(ws):
+            rules = []
+            for cf in ws.conditional_formatting:
+                for rule in cf.rules:
+                    fill = rule.dxf.fill if rule.dxf is not None else None
+                    font = rule.dxf.font if rule.dxf is not None else None
+                    rules.append((str(cf.sqref), rule.type, rule.operator, tuple(rule.formula),
+                                  fill and ((fill.bgColor.rgb if fill.bgColor.type == "rgb" else None)
+                                            or fill.fgColor.rgb)[-6:],
+                                  font and font.color is not None and font.color.rgb[-6:]))
+            return sorted(rules, key=repr)
+
+        check(f"{name} データ検証", validations(ws_a), validations(ws_b))
+        check(f"{name} 条件付き書式", conditional_formats(ws_a), conditional_formats(ws_b))
+        check(f"{name} グラフ", sorted(map(_chart_summary, ws_a._charts), key=repr),
+              sorted(map(_chart_summary, ws_b._charts), key=repr))
+    # 入力の指紋は書き出し先も含めて求めるため比べない
+    check("文書プロパティ", sorted((p.name, p.value) for p in wb_a.custom_doc_props if p.name != FINGERPRINT_PROPERTY),
+          sorted((p.name, p.value) for p in wb_b.custom_doc_props if p.name != FINGERPRINT_PROPERTY))
+    return differences
+
+
+def compare_backends(parity_rows=2000, rows=100000, vehicles=5, workdir=None, trace_memory=False):
+    """openpyxl と XlsxWriter の書き出し結果の一致と、書き出し速度の比較結果を dict で返す"""
+    tmpdir = None if workdir else tempfile.mkdtemp(prefix="transport_bench_")
+    workdir = workdir or tmpdir
+    try:
+        paths = {}
+        for backend in WRITER_BACKENDS:
+            paths[backend] = os.path.join(workdir, f"parity_{backend}.xlsx")
+            with contextlib.redirect_stdout(sys.stderr):
+                create_transport_management_excel(paths[backend], streaming=True, backend=backend,
+                                                  **synthetic_fleet(vehicles),
+                                                  **synthetic_ledgers(parity_rows, vehicles))
+        result = {
+            "parity": {"rows": parity_rows, "vehicles": vehicles, "differences": compare_workbooks(*paths.values())},
+            "throughput": [],
+        }
+        context = multiprocessing.get_context("spawn")
+        for backend in WRITER_BACKENDS:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                case = executor.submit(run_case, vehicles, rows, True, "formulas", workdir, trace_memory,
+                                       False, backend).result()
+            written = rows * 3 + 12 * vehicles  # 売上・経費・資金繰り + 人件費入力の行数
+            result["throughput"].append({
+                "backend": backend, "rows": written, "wall_sec": case["wall_sec"],
+                "rows_per_sec": round(written / case["wall_sec"]), "max_rss_mb": case["max_rss_mb"],
+                "file_bytes": case["file_bytes"], "stages": case["stages"],
+            })
+            print(f"{backend}: {case['wall_sec']}秒 {written / case['wall_sec']:,.0f}行/秒", file=sys.stderr)
+        return result
+    finally:
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def compare_reports(baseline, current, tolerance=0.2, min_seconds=0.05):
+    """2つのレポートを比較し、tolerance（割合）を超えて悪化した項目の説明をリストで返す
+
+    所要時間は min_seconds 未満の差を誤差として無視する。
+    """
+    regressions = []
+
+    def check(label, old, new, floor=0):
+        if old is None or new is None:
+            return
+        if new > old * (1 + tolerance) and new - old > floor:
+            regressions.append(f"{label}: {old} -> {new}")
+
+    cases = {(c["vehicles"], c["rows"]): c for c in baseline["cases"]}
+    for case in current["cases"]:
+        old = cases.get((case["vehicles"], case["rows"]))
+        if old is None:
+            continue
+        key = f'{case["vehicles"]}台×{case["rows"]}行'
+        check(f"{key} wall_sec", old["wall_sec"], case["wall_sec"], min_seconds)
+        check(f"{key} file_bytes", old["file_bytes"], case["file_bytes"])
+        for stage, record in case["stages"].items():
+            old_record = old["stages"].get(stage, {})
+            check(f"{key} {stage}.seconds", old_record.get("seconds"), record["seconds"], min_seconds)
+            check(f"{key} {stage}.peak_mb", old_record.get("peak_mb"), record.get("peak_mb"), 1)
+    return regressions
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="運送会社経営管理Excel ベンチマーク")
+    parser.add_argument("--suite", action="store_true", help="生成処理のスケーリングを計測する")
+    parser.add_argument("--backends", action="store_true", help="openpyxl と XlsxWriter の一致と速度を比べる")
+    parser.add_argument("--parity-rows", type=int, default=2000, help="--backends で内容を比べるブックの行数")
+    parser.add_argument("--fleets", type=_int_list, default=DEFAULT_FLEETS, help="車両台数（カンマ区切り）")
+    parser.add_argument("--ledger-rows", type=_int_list, default=DEFAULT_LEDGER_ROWS,
+                        help="入力シートの行数（カンマ区切り）")
+    parser.add_argument("--summary", choices=["formulas", "values"], default="formulas")
+    parser.add_argument("--no-streaming", action="store_true", help="通常モードのワークブックで生成する")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="メモリ使用量のピークを計測しない")
+    parser.add_argument("--report", help="レポートを JSON で書き出すパス")
+    parser.add_argument("--baseline", help="比較対象の以前のレポート（JSON）")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="悪化とみなす割合（既定 0.2 = 20%%）")
+    parser.add_argument("--rows", type=int, default=100000, help="各入力シートの行数")
+    parser.add_argument("--vehicles", type=int, default=5, help="車両数")
+    parser.add_argument("--soffice", default="soffice", help="LibreOffice の実行ファイル")
+    args = parser.parse_args()
+
+    if args.backends:
+        result = compare_backends(args.parity_rows, args.rows, args.vehicles)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        for line in result["parity"]["differences"]:
+            print(f"❌ {line}", file=sys.stderr)
+        raise SystemExit(1 if result["parity"]["differences"] else 0)
+    if not args.suite:
+        print(json.dumps(bench_recalc(args.rows, args.vehicles, args.soffice), ensure_ascii=False, indent=2))
+        return
+
+    report = run_suite(args.fleets, args.ledger_rows, streaming=not args.no_streaming,
+                       summary=args.summary, trace_memory=not args.no_tracemalloc)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare_reports(json.load(f), report, args.tolerance)
+        for line in regressions:
+            print(f"❌ {line}", file=sys.stderr)
+        raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
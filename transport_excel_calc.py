@@ -0,0 +1,811 @@
+"""運送会社経営管理Excel 数式の計算結果の埋め込み
+
+openpyxl が保存する数式セルには計算結果（キャッシュ値）が入らないため、openpyxl の
+data_only=True や pandas で読むと損益計算表・ダッシュボードの集計セルはすべて None になる。
+calculate_workbook は保存済みの xlsx を読み、このワークブックで使う関数
+（SUMIFS / SUMIF / SUM / IF / MONTH と、ランキング用の COUNTIF / INDEX / MATCH。以前の版の
+ランキングで使っていた LARGE も計算できる）と
+四則演算・比較・文字列連結を Python で評価して、各数式セルに計算結果を書き込む。
+
+    from transport_excel_calc import calculate_workbook
+
+    calculate_workbook("運送会社経営管理_v1.0.xlsx")
+
+create_transport_management_excel(calculate=True) でも生成直後に同じ処理を行う。
+
+同じ計算を繰り返さないよう、次の単位で結果を保持する:
+    - セルの値は1回だけ評価する（何度参照されても再計算しない）
+    - 数式は行・列を相対化した形ごとに1回だけ構文解析する（=MONTH(A4) と =MONTH(A5) は共通）
+    - SUMIFS / SUMIF は (合計範囲, 条件範囲) ごとに「条件値 -> 合計」の表を1回の走査で作り、
+      月 × 区分の各セルは表の参照だけで求める
+    - MATCH は範囲ごとに位置の索引を、LARGE は並べ替え済みリストを1回だけ作る
+
+対応していない関数を含む数式は #NAME? とする。Excel で開けば fullCalcOnLoad により
+再計算されるため、埋め込んだ値が Excel 上の表示に影響することはない。
+"""
+import operator
+import os
+import re
+import tempfile
+import zipfile
+from collections import defaultdict
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape, unescape
+
+from openpyxl.utils import column_index_from_string
+from openpyxl.utils.datetime import from_excel
+
+from transport_excel_append import CHUNK_SIZE, MAIN_NS, _sheet_parts
+
+_UNESCAPE = {"&quot;": '"', "&apos;": "'"}
+
+# 読み込み: セル（r 属性・その他の属性・数式・値・インライン文字列）
+_CELL_RE = re.compile(rb'<c r="([A-Z]{1,3})(\d+)"([^>]*?)(?:/>|>(?:<f(?:\s[^>]*)?>([^<]*)</f>)?'
+                      rb'(?:<v>([^<]*)</v>|<v\s*/>)?(?:<is>(.*?)</is>)?</c>)', re.S)
+_T_RE = re.compile(rb'<t(?:\s[^>]*)?>([^<]*)</t>')
+_TYPE_RE = re.compile(rb'\st="([A-Za-z]+)"')
+# 書き込み: openpyxl が出力する数式セル（計算結果は空の <v />）
+_FORMULA_CELL_RE = re.compile(rb'<c r="([A-Z]{1,3})(\d+)"([^>]*)>(<f>[^<]*</f>)(?:<v\s*/>|<v>[^<]*</v>)?</c>')
+
+# 数式の字句: 文字列 / セル・範囲参照（シート名付き可）/ 数値 / 関数名 / 論理値 / 演算子
+_TOKEN_RE = re.compile(r"""\s*(?:
+    (?P<str>"(?:[^"]|"")*")
+  | (?P<ref>(?:(?P<sheet>'(?:[^']|'')+'|[^\s'"!(),:=<>+\-*/&^%$]+)!)?
+        (?P<c1a>\$?)(?P<c1>[A-Z]{1,3})(?P<r1a>\$?)(?P<r1>\d+)
+        (?::(?P<c2a>\$?)(?P<c2>[A-Z]{1,3})(?P<r2a>\$?)(?P<r2>\d+))?)(?![\w(])
+  | (?P<num>\d+(?:\.\d+)?(?:[Ee][+-]?\d+)?)
+  | (?P<bool>TRUE|FALSE)(?![\w(])
+  | (?P<func>[A-Z][A-Z0-9.]*)\(
+  | (?P<op><>|<=|>=|[-+*/&^=<>(),%])
+)""", re.X)
+# 構文解析の共有に使う相対化: 文字列リテラルはそのまま、セル参照は行・列の差分に置き換える
+_REF_RE = re.compile(r'"(?:[^"]|"")*"|(?<![\w$.])(\$?)([A-Z]{1,3})(\$?)(\d+)(?![\w(])')
+_NUMERIC_RE = re.compile(r'\s*[-+]?(?:\d+\.?\d*|\.\d+)(?:[Ee][-+]?\d+)?\s*')
+
+# 二項演算子の優先順位（大きいほど先に結合する）
+_BINARY = {"=": 1, "<>": 1, "<": 1, ">": 1, "<=": 1, ">=": 1, "&": 2, "+": 3, "-": 3, "*": 4, "/": 4, "^": 5}
+_CRITERIA_RE = re.compile(r"(<>|<=|>=|<|>|=)(.*)", re.S)  # COUNTIF の比較演算子付きの条件
+_COMPARE = {"=": operator.eq, "<>": operator.ne, "<": operator.lt, ">": operator.gt,
+            "<=": operator.le, ">=": operator.ge}
+
+
+class CellError(str):
+    """Excel のエラー値（#DIV/0! など）"""
+
+
+class _Formula:
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+
+_PENDING = object()  # 評価中（循環参照の検出用）
+
+
+class _Range:
+    """評価済みの範囲（値は行優先の1次元リスト）"""
+    __slots__ = ("key", "values", "rows", "cols")
+
+    def __init__(self, key, values, rows, cols):
+        self.key = key
+        self.values = values
+        self.rows = rows
+        self.cols = cols
+
+
+_column_index = {}
+
+
+def _col(letters):
+    """列名（str / bytes）-> 列番号"""
+    index = _column_index.get(letters)
+    if index is None:
+        name = letters.decode("ascii") if isinstance(letters, bytes) else letters
+        index = _column_index[letters] = column_index_from_string(name)
+    return index
+
+
+def _text(raw):
+    text = raw.decode("utf-8")
+    return unescape(text, _UNESCAPE) if "&" in text else text
+
+
+def _number(raw):
+    """<v> の中身（bytes）-> int / float"""
+    return float(raw) if b"." in raw or b"E" in raw or b"e" in raw else int(raw)
+
+
+# =========================
+# 読み込み
+# =========================
+def _shared_strings(zin):
+    """共有文字列のリスト（openpyxl はインライン文字列で書くが、Excel で保存したブックに対応するため）"""
+    if "xl/sharedStrings.xml" not in zin.namelist():
+        return []
+    root = ElementTree.fromstring(zin.read("xl/sharedStrings.xml"))
+    return ["".join(t.text or "" for t in si.iter(f"{MAIN_NS}t")) for si in root.iter(f"{MAIN_NS}si")]
+
+
+def _iter_chunks(src):
+    """シートの XML を行の区切り（</row>）で切ったチャンクで返す"""
+    carry = b""
+    while True:
+        chunk = src.read(CHUNK_SIZE)
+        if not chunk:
+            if carry:
+                yield carry
+            return
+        data = carry + chunk
+        cut = data.rfind(b"</row>")
+        if cut < 0:
+            carry = data
+            continue
+        cut += len(b"</row>")
+        yield data[:cut]
+        carry = data[cut:]
+
+
+def _read_sheet(src, shared, cached=False):
+    """シートのセルを {列番号: [行番号で引ける値のリスト]} で返す
+
+    数式セルは _Formula とする。cached=True の場合は保存済みの計算結果（なければ None）を返す。
+    """
+    columns = {}
+    intern = {}.setdefault  # 同じ文字列（取引先名など）を1つのオブジェクトで共有する
+    column_index = _column_index.get
+    for chunk in _iter_chunks(src):
+        for letters, row, attrs, formula, raw, inline in _CELL_RE.findall(chunk):
+            if formula and not cached:
+                value = _Formula(_text(formula))
+            elif inline:
+                value = _text(b"".join(_T_RE.findall(inline)))
+                value = intern(value, value)
+            elif raw:
+                kind = _TYPE_RE.search(attrs) if b"t=" in attrs else None
+                kind = kind.group(1) if kind else b"n"
+                if kind == b"n":
+                    value = float(raw) if b"." in raw or b"E" in raw or b"e" in raw else int(raw)
+                elif kind == b"s":
+                    value = shared[int(raw)]
+                elif kind == b"str":
+                    value = _text(raw)
+                    value = intern(value, value)
+                elif kind == b"b":
+                    value = raw == b"1"
+                elif kind == b"e":
+                    value = CellError(_text(raw))
+                else:
+                    value = _number(raw)
+            else:
+                continue
+            col = column_index(letters) or _col(letters)
+            row = int(row)
+            cells = columns.get(col)
+            if cells is None:
+                cells = columns[col] = []
+            if len(cells) <= row:
+                cells.extend([None] * (row + 1 - len(cells)))
+            cells[row] = value
+    return columns
+
+
+# =========================
+# 構文解析
+# =========================
+def _relative_key(text, row, col):
+    """行・列を数式セルからの相対位置に置き換えた数式（構文木の共有に使う）"""
+    def relative(m):
+        if m.group(2) is None:
+            return m.group(0)
+        c, r = _col(m.group(2)), int(m.group(4))
+        return (f"C{c}" if m.group(1) else f"C[{c - col}]") + (f"R{r}" if m.group(3) else f"R[{r - row}]")
+    return _REF_RE.sub(relative, text)
+
+
+class _Parser:
+    """数式を構文木（タプル）に変換する。相対参照はセルからの差分で持つ
+
+    ('c', 定数) / ('r', シート, 列は絶対か, 列, 行は絶対か, 行) / ('a', シート, 左上, 右下) /
+    ('f', 関数名, 引数) / ('b', 演算子, 左辺, 右辺) / ('u', 演算子, 被演算子)
+    """
+
+    def __init__(self, text, row, col):
+        self.tokens = []
+        pos = 0
+        text = text.strip()
+        while pos < len(text):
+            m = _TOKEN_RE.match(text, pos)
+            if m is None or m.end() == pos:
+                raise ValueError(f"数式を解析できません: ={text}")
+            self.tokens.append(m)
+            pos = m.end()
+        self.pos = 0
+        self.row = row
+        self.col = col
+
+    def parse(self):
+        node = self._expr(1)
+        if self.pos != len(self.tokens):
+            raise ValueError("数式の末尾を解析できません")
+        return node
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _take_op(self, op):
+        m = self._peek()
+        if m is not None and m.group("op") == op:
+            self.pos += 1
+            return True
+        return False
+
+    def _expr(self, min_prec):
+        left = self._unary()
+        while True:
+            m = self._peek()
+            op = m.group("op") if m is not None else None
+            if op not in _BINARY or _BINARY[op] < min_prec:
+                return left
+            self.pos += 1
+            left = ("b", op, left, self._expr(_BINARY[op] + 1))
+
+    def _unary(self):
+        if self._take_op("-"):
+            return ("u", "-", self._unary())
+        if self._take_op("+"):
+            return self._unary()
+        node = self._primary()
+        while self._take_op("%"):
+            node = ("u", "%", node)
+        return node
+
+    def _point(self, col_abs, col, row_abs, row):
+        c, r = _col(col), int(row)
+        return (bool(col_abs), c if col_abs else c - self.col, bool(row_abs), r if row_abs else r - self.row)
+
+    def _primary(self):
+        m = self._peek()
+        if m is None:
+            raise ValueError("数式が途中で終わっています")
+        self.pos += 1
+        if m.group("str") is not None:
+            return ("c", m.group("str")[1:-1].replace('""', '"'))
+        if m.group("num") is not None:
+            return ("c", _number(m.group("num").encode("ascii")))
+        if m.group("bool") is not None:
+            return ("c", m.group("bool") == "TRUE")
+        if m.group("ref") is not None:
+            sheet = m.group("sheet")
+            if sheet and sheet.startswith("'"):
+                sheet = sheet[1:-1].replace("''", "'")
+            first = self._point(m.group("c1a"), m.group("c1"), m.group("r1a"), m.group("r1"))
+            if m.group("c2") is None:
+                return ("r", sheet, *first)
+            return ("a", sheet, first, self._point(m.group("c2a"), m.group("c2"), m.group("r2a"), m.group("r2")))
+        if m.group("func") is not None:
+            args = []
+            if not self._take_op(")"):
+                while True:
+                    args.append(self._expr(1))
+                    if self._take_op(")"):
+                        break
+                    if not self._take_op(","):
+                        raise ValueError("関数の引数を解析できません")
+            return ("f", m.group("func"), args)
+        if m.group("op") == "(":
+            node = self._expr(1)
+            if not self._take_op(")"):
+                raise ValueError("括弧が閉じていません")
+            return node
+        raise ValueError(f"予期しない記号です: {m.group(0).strip()}")
+
+
+# =========================
+# 値の変換・比較
+# =========================
+def _is_number(value):
+    return type(value) in (int, float)
+
+
+def _to_number(value):
+    """四則演算用の数値変換（空欄は 0、論理値は 1/0）。変換できなければ #VALUE!"""
+    if _is_number(value):
+        return value
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, CellError):
+        return value
+    if _NUMERIC_RE.fullmatch(value):
+        return _number(value.strip().encode())
+    return CellError("#VALUE!")
+
+
+def _to_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _criteria_key(value):
+    """SUMIFS / MATCH の一致判定用のキー（数値と数値文字列を同一視し、文字列は大文字小文字を区別しない）"""
+    if isinstance(value, bool):
+        return ("b", value)
+    if _is_number(value):
+        return float(value)
+    if value is None:
+        return ""
+    if _NUMERIC_RE.fullmatch(value):
+        return float(value)
+    return value.lower()
+
+
+def _compare(op, a, b):
+    """Excel の比較（数値 < 文字列 < 論理値、空欄は相手の型の空値として扱う）"""
+    if a is None:
+        a = "" if isinstance(b, str) else False if isinstance(b, bool) else 0
+    if b is None:
+        b = "" if isinstance(a, str) else False if isinstance(a, bool) else 0
+    rank_a = 2 if isinstance(a, bool) else 1 if isinstance(a, str) else 0
+    rank_b = 2 if isinstance(b, bool) else 1 if isinstance(b, str) else 0
+    if rank_a != rank_b:
+        return _COMPARE[op](rank_a, rank_b)
+    if rank_a == 1:
+        return _COMPARE[op](a.lower(), b.lower())
+    return _COMPARE[op](a, b)
+
+
+def _arith(op, a, b):
+    a, b = _to_number(a), _to_number(b)
+    if isinstance(a, CellError):
+        return a
+    if isinstance(b, CellError):
+        return b
+    if op == "+":
+        return a + b
+    if op == "-":
+        return a - b
+    if op == "*":
+        return a * b
+    if op == "/":
+        return CellError("#DIV/0!") if b == 0 else a / b
+    return a ** b
+
+
+# =========================
+# 評価
+# =========================
+class WorkbookCalculator:
+    """読み込んだセルの数式を必要になった順に評価し、結果をセルに保持する"""
+
+    def __init__(self, sheets):
+        self.sheets = sheets  # シート名 -> {列番号: [行番号で引ける値]}
+        self.evaluated = 0
+        self._compiled = {}
+        self._ranges = {}
+        self._sumifs = {}
+        self._sorted = {}
+        self._positions = {}
+
+    def cell(self, sheet, row, col):
+        """セルの値（数式なら評価して結果を保持する）"""
+        columns = self.sheets.get(sheet)
+        if columns is None:
+            return CellError("#REF!")
+        cells = columns.get(col)
+        if cells is None or row >= len(cells):
+            return None
+        value = cells[row]
+        if type(value) is _Formula:
+            cells[row] = _PENDING
+            try:
+                result = self._evaluate(value.text, sheet, row, col)
+            except BaseException:
+                cells[row] = value
+                raise
+            cells[row] = result
+            self.evaluated += 1
+            return result
+        if value is _PENDING:
+            raise ValueError(f"循環参照があります: {sheet} {row}行 {col}列")
+        return value
+
+    def _evaluate(self, text, sheet, row, col):
+        key = _relative_key(text, row, col)
+        node = self._compiled.get(key)
+        if node is None:
+            try:
+                node = _Parser(text, row, col).parse()
+            except ValueError:
+                node = ("c", CellError("#NAME?"))
+            self._compiled[key] = node
+        return self._eval(node, sheet, row, col)
+
+    def _eval(self, node, sheet, row, col):
+        kind = node[0]
+        if kind == "c":
+            return node[1]
+        if kind == "r":
+            _, ref_sheet, col_abs, c, row_abs, r = node
+            return self.cell(ref_sheet or sheet, r if row_abs else row + r, c if col_abs else col + c)
+        if kind == "a":
+            return self._range(node, sheet, row, col)
+        if kind == "f":
+            function = _FUNCTIONS.get(node[1])
+            if function is None:
+                return CellError("#NAME?")
+            return function(self, node[2], sheet, row, col)
+        if kind == "u":
+            value = self._scalar(node[2], sheet, row, col)
+            value = _to_number(value)
+            if isinstance(value, CellError):
+                return value
+            return -value if node[1] == "-" else value / 100
+        _, op, left, right = node
+        a = self._scalar(left, sheet, row, col)
+        b = self._scalar(right, sheet, row, col)
+        if isinstance(a, CellError):
+            return a
+        if isinstance(b, CellError):
+            return b
+        if op in _COMPARE:
+            return _compare(op, a, b)
+        if op == "&":
+            return _to_text(a) + _to_text(b)
+        return _arith(op, a, b)
+
+    def _scalar(self, node, sheet, row, col):
+        value = self._eval(node, sheet, row, col)
+        if isinstance(value, _Range):  # 範囲を単一値として使う式はこのブックにはない
+            return CellError("#VALUE!")
+        return value
+
+    def _range(self, node, sheet, row, col):
+        """範囲参照を評価する（同じ範囲は1回だけ評価して共有する）"""
+        _, ref_sheet, first, last = node
+        ref_sheet = ref_sheet or sheet
+        c1 = first[1] if first[0] else col + first[1]
+        r1 = first[3] if first[2] else row + first[3]
+        c2 = last[1] if last[0] else col + last[1]
+        r2 = last[3] if last[2] else row + last[3]
+        key = (ref_sheet, min(r1, r2), min(c1, c2), max(r1, r2), max(c1, c2))
+        cached = self._ranges.get(key)
+        if cached is not None:
+            return cached
+        _, r1, c1, r2, c2 = key
+        columns = self.sheets.get(ref_sheet, {})
+        by_column = []
+        for c in range(c1, c2 + 1):
+            cells = columns.get(c, [])
+            values = cells[r1:r2 + 1]
+            values.extend([None] * (r2 - r1 + 1 - len(values)))
+            for i, value in enumerate(values):
+                if type(value) is _Formula or value is _PENDING:
+                    values[i] = self.cell(ref_sheet, r1 + i, c)
+            by_column.append(values)
+        if len(by_column) == 1:
+            flat = by_column[0]
+        else:
+            flat = [value for values in zip(*by_column) for value in values]
+        result = self._ranges[key] = _Range(key, flat, r2 - r1 + 1, c2 - c1 + 1)
+        return result
+
+    def _values(self, node, sheet, row, col):
+        value = self._eval(node, sheet, row, col)
+        return value.values if isinstance(value, _Range) else [value]
+
+    def _as_range(self, node, sheet, row, col):
+        value = self._eval(node, sheet, row, col)
+        if isinstance(value, _Range):
+            return value
+        return _Range(None, [value], 1, 1)
+
+    def sumifs(self, total_range, conditions):
+        """SUMIFS の本体。(合計範囲, 条件範囲) ごとに条件値 -> 合計 の表を1回だけ作る"""
+        criteria = [value for _, value in conditions]
+        for value in criteria:
+            if isinstance(value, CellError):
+                return value
+        if any(len(r.values) != len(total_range.values) for r, _ in conditions):
+            return CellError("#VALUE!")
+        if any(isinstance(value, str) and value[:1] in "<>=" and value for value in criteria) or \
+                any(isinstance(value, str) and ("*" in value or "?" in value) for value in criteria):
+            return CellError("#VALUE!")  # 比較演算子・ワイルドカードの条件はこのブックでは使わない
+
+        key = (total_range.key, tuple(r.key for r, _ in conditions))
+        table = self._sumifs.get(key) if None not in key[1] else None
+        if table is None:
+            table = defaultdict(int)
+            for total, *values in zip(total_range.values, *(r.values for r, _ in conditions)):
+                if _is_number(total):
+                    table[tuple(map(_criteria_key, values))] += total
+            if total_range.key is not None and None not in key[1]:
+                self._sumifs[key] = table
+        return table.get(tuple(map(_criteria_key, criteria)), 0)
+
+    def sorted_numbers(self, values_range):
+        key = values_range.key
+        numbers = self._sorted.get(key) if key is not None else None
+        if numbers is None:
+            numbers = sorted((v for v in values_range.values if _is_number(v)), reverse=True)
+            if key is not None:
+                self._sorted[key] = numbers
+        return numbers
+
+    def positions(self, values_range):
+        key = values_range.key
+        index = self._positions.get(key) if key is not None else None
+        if index is None:
+            index = {}
+            for i, value in enumerate(values_range.values, 1):
+                if value is not None:
+                    index.setdefault(_criteria_key(value), i)
+            if key is not None:
+                self._positions[key] = index
+        return index
+
+
+# =========================
+# 関数
+# =========================
+def _fn_sum(calc, args, sheet, row, col):
+    total = 0
+    for arg in args:
+        value = calc._eval(arg, sheet, row, col)
+        if isinstance(value, _Range):
+            for v in value.values:
+                if isinstance(v, CellError):
+                    return v
+                if _is_number(v):
+                    total += v
+        else:
+            value = _to_number(value)
+            if isinstance(value, CellError):
+                return value
+            total += value
+    return total
+
+
+def _fn_sumifs(calc, args, sheet, row, col):
+    if len(args) < 3 or len(args) % 2 == 0:
+        return CellError("#VALUE!")
+    total_range = calc._as_range(args[0], sheet, row, col)
+    conditions = [(calc._as_range(args[i], sheet, row, col), calc._scalar(args[i + 1], sheet, row, col))
+                  for i in range(1, len(args), 2)]
+    return calc.sumifs(total_range, conditions)
+
+
+def _fn_sumif(calc, args, sheet, row, col):
+    if len(args) not in (2, 3):
+        return CellError("#VALUE!")
+    criteria_range = calc._as_range(args[0], sheet, row, col)
+    total_range = calc._as_range(args[2], sheet, row, col) if len(args) == 3 else criteria_range
+    return calc.sumifs(total_range, [(criteria_range, calc._scalar(args[1], sheet, row, col))])
+
+
+def _fn_if(calc, args, sheet, row, col):
+    if not 1 <= len(args) <= 3:
+        return CellError("#VALUE!")
+    condition = calc._scalar(args[0], sheet, row, col)
+    if isinstance(condition, CellError):
+        return condition
+    if isinstance(condition, str):
+        return CellError("#VALUE!")
+    if condition:
+        return calc._scalar(args[1], sheet, row, col) if len(args) > 1 else True
+    return calc._scalar(args[2], sheet, row, col) if len(args) > 2 else False
+
+
+_months = {}  # シリアル値 -> 月（入力シートの日付は同じ日が繰り返し現れる）
+
+
+def _fn_month(calc, args, sheet, row, col):
+    if len(args) != 1:
+        return CellError("#VALUE!")
+    value = _to_number(calc._scalar(args[0], sheet, row, col))
+    if isinstance(value, CellError):
+        return value
+    if value < 0:
+        return CellError("#NUM!")
+    if value < 1:
+        return 1  # シリアル値 0 は 1900/1/0 扱い
+    month = _months.get(value)
+    if month is None:
+        month = _months[value] = from_excel(value).month
+    return month
+
+
+def _fn_large(calc, args, sheet, row, col):
+    if len(args) != 2:
+        return CellError("#VALUE!")
+    numbers = calc.sorted_numbers(calc._as_range(args[0], sheet, row, col))
+    k = _to_number(calc._scalar(args[1], sheet, row, col))
+    if isinstance(k, CellError):
+        return k
+    k = int(k)
+    if not 1 <= k <= len(numbers):
+        return CellError("#NUM!")
+    return numbers[k - 1]
+
+
+def _fn_index(calc, args, sheet, row, col):
+    if not 2 <= len(args) <= 3:
+        return CellError("#VALUE!")
+    area = calc._as_range(args[0], sheet, row, col)
+    indexes = [_to_number(calc._scalar(arg, sheet, row, col)) for arg in args[1:]]
+    for value in indexes:
+        if isinstance(value, CellError):
+            return value
+    r = int(indexes[0])
+    c = int(indexes[1]) if len(indexes) > 1 else 1
+    if area.rows == 1 and len(indexes) == 1:  # 1行の範囲は列番号として扱う
+        r, c = 1, r
+    if not (1 <= r <= area.rows and 1 <= c <= area.cols):
+        return CellError("#REF!")
+    return area.values[(r - 1) * area.cols + (c - 1)]
+
+
+def _fn_match(calc, args, sheet, row, col):
+    if not 2 <= len(args) <= 3:
+        return CellError("#VALUE!")
+    value = calc._scalar(args[0], sheet, row, col)
+    if isinstance(value, CellError):
+        return value
+    area = calc._as_range(args[1], sheet, row, col)
+    match_type = _to_number(calc._scalar(args[2], sheet, row, col)) if len(args) == 3 else 1
+    if match_type == 0:
+        position = calc.positions(area).get(_criteria_key(value))
+        return CellError("#N/A") if position is None else position
+    # 近似一致（範囲は昇順 / 降順に並んでいる前提）
+    found = None
+    for i, v in enumerate(area.values, 1):
+        if v is None or isinstance(v, CellError):
+            continue
+        if (match_type > 0 and _compare("<=", v, value)) or (match_type < 0 and _compare(">=", v, value)):
+            found = i
+        else:
+            break
+    return CellError("#N/A") if found is None else found
+
+
+def _fn_countif(calc, args, sheet, row, col):
+    """COUNTIF（条件は値、または ">"&E4 のような比較演算子付きの文字列）
+
+    ワイルドカード（* ?）の条件はこのブックでは使わないため、SUMIFS と同じく #VALUE! とする
+    （文字どおりの一致として数えると Excel と異なる結果になる）。
+    """
+    if len(args) != 2:
+        return CellError("#VALUE!")
+    area = calc._as_range(args[0], sheet, row, col)
+    criteria = calc._scalar(args[1], sheet, row, col)
+    if isinstance(criteria, CellError):
+        return criteria
+    if isinstance(criteria, str) and ("*" in criteria or "?" in criteria):
+        return CellError("#VALUE!")
+    m = _CRITERIA_RE.fullmatch(criteria) if isinstance(criteria, str) else None
+    if m is None:
+        key = _criteria_key(criteria)
+        return sum(1 for v in area.values if _criteria_key(v) == key)
+    op, operand = m.groups()
+    if op == "=" or op == "<>":
+        key = _criteria_key(operand)
+        return sum(1 for v in area.values if (_criteria_key(v) == key) == (op == "="))
+    if _NUMERIC_RE.fullmatch(operand):  # 数値との大小比較は数値のセルだけを数える
+        number = _number(operand.strip().encode())
+        return sum(1 for v in area.values if _is_number(v) and _COMPARE[op](v, number))
+    return sum(1 for v in area.values if isinstance(v, str) and _compare(op, v, operand))
+
+
+_FUNCTIONS = {
+    "SUM": _fn_sum,
+    "SUMIFS": _fn_sumifs,
+    "SUMIF": _fn_sumif,
+    "IF": _fn_if,
+    "MONTH": _fn_month,
+    "LARGE": _fn_large,
+    "INDEX": _fn_index,
+    "MATCH": _fn_match,
+    "COUNTIF": _fn_countif,
+}
+
+
+# =========================
+# 書き込み
+# =========================
+def _value_xml(value):
+    """計算結果 -> (t 属性, <v> の中身)"""
+    if value is None:
+        return "", "0"  # 空欄への参照は 0
+    if isinstance(value, CellError):
+        return ' t="e"', escape(value)
+    if isinstance(value, bool):
+        return ' t="b"', "1" if value else "0"
+    if isinstance(value, str):
+        return ' t="str"', escape(value)
+    if isinstance(value, float) and value.is_integer():
+        return "", str(int(value))
+    return "", repr(value)
+
+
+def _write_sheet(src, dst, calc, sheet):
+    """シートの XML をストリームコピーしながら数式セルに計算結果を入れる"""
+    def with_value(m):
+        row = int(m.group(2))
+        value = calc.cell(sheet, row, _col(m.group(1)))
+        kind, text = _value_xml(value)
+        attrs = _TYPE_RE.sub(b"", m.group(3))
+        return (b'<c r="' + m.group(1) + m.group(2) + b'"' + attrs + kind.encode() + b">"
+                + m.group(4) + b"<v>" + text.encode("utf-8") + b"</v></c>")
+
+    for chunk in _iter_chunks(src):
+        dst.write(_FORMULA_CELL_RE.sub(with_value, chunk))
+
+
+def _load(zin, parts):
+    shared = _shared_strings(zin)
+    sheets = {}
+    for name, part in parts.items():
+        with zin.open(part) as src:
+            sheets[name] = _read_sheet(src, shared)
+    return WorkbookCalculator(sheets)
+
+
+def load_calculator(path):
+    """ワークブックを読み込んだ WorkbookCalculator を返す（ファイルは書き換えない）
+
+    calc.cell(シート名, 行, 列番号) で任意のセルの計算結果を得られる。
+    """
+    with zipfile.ZipFile(path) as zin:
+        return _load(zin, _sheet_parts(zin))
+
+
+def read_values(path, sheet_names):
+    """指定したシートだけを読み、{シート名: {列番号: [行番号で引ける値]}} で返す
+
+    数式セルは保存済みの計算結果（なければ None）。他のシートは展開しない。
+    """
+    with zipfile.ZipFile(path) as zin:
+        parts = _sheet_parts(zin)
+        missing = [name for name in sheet_names if name not in parts]
+        if missing:
+            raise ValueError(f"{path}: シート「{'」「'.join(missing)}」がありません")
+        shared = _shared_strings(zin)
+        values = {}
+        for name in sheet_names:
+            with zin.open(parts[name]) as src:
+                values[name] = _read_sheet(src, shared, cached=True)
+    return values
+
+
+def calculate_workbook(path, output_path=None):
+    """ワークブックの数式を評価し、計算結果を埋め込んで保存する
+
+    output_path を省略すると path を置き換える。戻り値は評価した数式セルの数。
+    """
+    output_path = output_path or path
+    with zipfile.ZipFile(path) as zin:
+        parts = _sheet_parts(zin)
+        calc = _load(zin, parts)
+        sheet_names = {part: name for name, part in parts.items()}
+
+        fd, tmp_path = tempfile.mkstemp(suffix=".xlsx", dir=os.path.dirname(os.path.abspath(output_path)))
+        os.close(fd)
+        try:
+            with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as zout:
+                for info in zin.infolist():
+                    if info.filename in sheet_names:
+                        with zin.open(info) as src, zout.open(info.filename, "w", force_zip64=True) as dst:
+                            _write_sheet(src, dst, calc, sheet_names[info.filename])
+                    else:
+                        zout.writestr(info, zin.read(info), compress_type=zipfile.ZIP_DEFLATED)
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    return calc.evaluated
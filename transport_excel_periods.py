@@ -0,0 +1,179 @@
+"""運送会社経営管理Excel 会計年度ごとの分割出力
+
+集計シートは月番号で集計するため、複数年のデータを1つのブックに入れると
+2025年1月と2026年1月が同じ列に合算され、入力シートも際限なく伸びる。
+write_fiscal_years は入力レコードを会計年度（fiscal_start_month 月始まり）ごとに振り分け、
+1年度1ファイルのワークブックを生成し、年度をまたぐ推移は小さな年度推移ブックにまとめる。
+
+    from transport_excel_loader import load_ledgers
+    from transport_excel_periods import write_fiscal_years
+
+    result = write_fiscal_years("out", fiscal_start_month=4, streaming=True, calculate=True,
+                                **load_ledgers({"売上入力": "sales_all.csv", "資金繰り入力": "cash_all.csv"}))
+    # result["years"] == {2024: "out/運送会社経営管理_2024年度.xlsx", 2025: ...}
+    # result["summary"] == "out/運送会社経営管理_年度推移.xlsx"
+
+振り分けは1パスで、レコードは年度・入力シートごとの一時ファイルに書き出す（pickle）ため、
+ジェネレーターで渡せば行数に関わらずメモリ使用量は一定に保たれる。
+各年度の期首残高は前年度の期首残高 + 入金 - 出金（資金繰り入力の合計）で引き継ぐ。
+
+人件費入力の「月」は年を含まないため、年度をまたぐデータでは支給月を日付
+（例: date(2025, 4, 1)）で渡す。各年度のブックには月番号に変換して書き出す。
+"""
+import os
+import pickle
+import tempfile
+from datetime import date, datetime
+
+from openpyxl import Workbook
+
+from create_transport_excel import (
+    LEDGER_SPECS, OPTIONAL_LEDGER_SPECS, FiscalPeriod, SheetSpec,
+    _cell, _header_row, _open_sheet, _register_styles, create_transport_management_excel,
+)
+from transport_excel_reader import read_summary
+
+# 引数名 -> 入力シートの定義
+LEDGERS = {spec.arg: spec for spec in LEDGER_SPECS + OPTIONAL_LEDGER_SPECS}
+LABOR_MONTH = 3  # 人件費入力の「月」の位置
+
+YEARLY_SHEET = SheetSpec("年度別推移", "年度別推移", {'A': 10, 'B': 24, **{c: 15 for c in "CDEFGH"}, 'I': 40}, 'I')
+MONTHLY_SHEET = SheetSpec("月次推移", "月次推移", {'A': 10, 'B': 10, **{c: 15 for c in "CDEFG"}}, 'G')
+
+
+def _date_position(spec):
+    return next((pos for pos, col in enumerate(spec.columns) if col.kind == "date"), None)
+
+
+def _fiscal_year(spec, data, pos, start_month):
+    """レコードの属する会計年度"""
+    day = data[pos] if pos is not None else data[LABOR_MONTH]
+    if isinstance(day, datetime):
+        day = day.date()
+    if not isinstance(day, date):
+        if pos is None:
+            raise ValueError(f"{spec.name}: 年度ごとに分けて出力する場合、月は日付（支給月の1日など）で指定してください: {day}")
+        raise ValueError(f"{spec.name}: 日付がないレコードは年度を判定できません: {data}")
+    return FiscalPeriod.of(day, start_month).year
+
+
+def _replay(path):
+    """一時ファイルに書き出したレコードを順に読み戻すジェネレーター"""
+    if path is None:
+        return
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def _spool(ledgers, start_month, spool_dir):
+    """レコードを年度・入力シートごとの一時ファイルに振り分ける
+
+    戻り値は ({(年度, 引数名): 一時ファイル}, {年度: 入金 - 出金})。
+    """
+    files, paths, net_cash = {}, {}, {}
+    try:
+        for arg, records in ledgers.items():
+            spec = LEDGERS[arg]
+            pos = _date_position(spec)
+            for data in records:
+                year = _fiscal_year(spec, data, pos, start_month)
+                if pos is None:  # 人件費入力: 支給月の日付を月番号に置き換える
+                    data = list(data)
+                    data[LABOR_MONTH] = data[LABOR_MONTH].month
+                f = files.get((year, arg))
+                if f is None:
+                    paths[year, arg] = os.path.join(spool_dir, f"{year}_{arg}.pickle")
+                    f = files[year, arg] = open(paths[year, arg], "wb")
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+                if arg == "cash":
+                    net_cash[year] = net_cash.get(year, 0) + (data[4] if data[2] == "入金" else -data[4])
+    finally:
+        for f in files.values():
+            f.close()
+    return paths, net_cash
+
+
+def write_fiscal_years(output_dir, fiscal_start_month=1, opening_balance=1000000, name="運送会社経営管理",
+                       sales=None, expenses=None, labor=None, cash=None, summary_output=None, **kwargs):
+    """入力レコードを会計年度ごとのワークブックに分けて出力し、年度推移ブックを作成する
+
+    kwargs のうち入力シートの引数名（highway など）は年度ごとに振り分け、それ以外は
+    create_transport_management_excel にそのまま渡す（streaming / summary / clients など）。
+    指定しない入力シートは空で出力する（サンプルデータは入れない）。データのない年度を
+    挟む場合もその年度のブックを作り、期首残高を途切れさせない。
+    戻り値は {"years": {年度: パス}, "summary": 年度推移ブックのパス}。
+    """
+    ledgers = {arg: records for arg, records in
+               (("sales", sales), ("expenses", expenses), ("labor", labor), ("cash", cash)) if records is not None}
+    ledgers.update((arg, kwargs.pop(arg)) for arg in list(kwargs) if arg in LEDGERS)
+    for reserved in ("fiscal_year", "output_path"):
+        if reserved in kwargs:
+            raise TypeError(f"write_fiscal_years では {reserved} は指定できません")
+    os.makedirs(output_dir, exist_ok=True)
+
+    years = {}
+    with tempfile.TemporaryDirectory(dir=output_dir) as spool_dir:
+        paths, net_cash = _spool(ledgers, fiscal_start_month, spool_dir)
+        found = {year for year, _ in paths}
+        if not found:
+            raise ValueError("入力レコードがありません")
+        balance = opening_balance
+        for year in range(min(found), max(found) + 1):
+            path = os.path.join(output_dir, f"{name}_{year}年度.xlsx")
+            inputs = {arg: _replay(paths.get((year, arg))) for arg in ledgers}
+            inputs.update({spec.arg: [] for spec in LEDGER_SPECS if spec.arg not in inputs})
+            create_transport_management_excel(path, fiscal_year=year, fiscal_start_month=fiscal_start_month,
+                                              opening_balance=balance, **kwargs, **inputs)
+            years[year] = path
+            balance += net_cash.get(year, 0)
+
+    summary_output = summary_output or os.path.join(output_dir, f"{name}_年度推移.xlsx")
+    write_cross_year_summary(years, summary_output)
+    return {"years": years, "summary": summary_output}
+
+
+def write_cross_year_summary(years, output_path):
+    """年度ごとのブックから年度別・月次の推移表（値のみの小さなブック）を作成する
+
+    years は {年度: ワークブックのパス}。計算結果が保存されていないブックは
+    transport_excel_calc でその場で計算して読む。
+    """
+    wb = Workbook()
+    wb.remove(wb.active)
+    _register_styles(wb)
+    ws_yearly = _open_sheet(wb, YEARLY_SHEET)
+    ws_yearly.append(_header_row(ws_yearly, ["年度", "期間", "売上高", "経費合計", "営業利益", "営業利益率",
+                                             "期首残高", "期末残高", "ファイル"], style="header_center"))
+    ws_monthly = _open_sheet(wb, MONTHLY_SHEET)
+    ws_monthly.append(_header_row(ws_monthly, ["年度", "月", "売上高", "経費合計", "営業利益", "月末残高"],
+                                  style="header_center"))
+
+    for year, path in sorted(years.items()):
+        records = read_summary(path, calculate=True)
+        period = FiscalPeriod(year, records[0].month)
+        sales = sum(r.sales for r in records)
+        profit = sum(r.operating_profit for r in records)
+        ws_yearly.append([
+            year, period.span,
+            _cell(ws_yearly, sales, "yen"),
+            _cell(ws_yearly, sum(r.expenses for r in records), "yen"),
+            _cell(ws_yearly, profit, "yen"),
+            _cell(ws_yearly, profit / sales if sales else 0, "percent1"),
+            _cell(ws_yearly, records[0].opening_balance, "yen"),
+            _cell(ws_yearly, records[-1].closing_balance, "yen"),
+            os.path.basename(path),
+        ])
+        for r in records:
+            ws_monthly.append([year, f"{r.month}月", _cell(ws_monthly, r.sales, "yen"),
+                               _cell(ws_monthly, r.expenses, "yen"), _cell(ws_monthly, r.operating_profit, "yen"),
+                               _cell(ws_monthly, r.closing_balance, "yen")])
+
+    ws_yearly.freeze_panes = "B4"
+    ws_monthly.freeze_panes = "C4"
+    wb.save(output_path)
+    print(f"✅ 年度推移を作成しました: {output_path}")
+    return output_path
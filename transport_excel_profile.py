@@ -0,0 +1,132 @@
+"""運送会社経営管理Excel 生成処理の計測
+
+create_transport_management_excel の on_stage に GenerationProfiler を渡すと、
+工程（マスタ・各入力シート・損益計算表・車両別収支・資金繰り表・ダッシュボード・保存・計算）
+ごとに所要時間・書き込んだ行数とセル数・データ検証と条件付き書式の数を記録する。
+trace_memory=True では tracemalloc によるメモリ使用量のピークも記録する。
+
+    from create_transport_excel import create_transport_management_excel
+    from transport_excel_profile import GenerationProfiler
+
+    profiler = GenerationProfiler(trace_memory=True)
+    create_transport_management_excel(streaming=True, on_stage=profiler)
+    print(profiler.summary())
+
+工程が終わるたびに、ロガー "transport_excel.profile" へ1工程1行の JSON を INFO で出力する
+（logging.basicConfig(level=logging.INFO) などで有効にする）。
+on_stage を渡さなければ計測処理は一切行われず、生成処理への影響はない。
+セル数の集計は計測時のみ ws.append を包んで行う。
+"""
+import json
+import logging
+import time
+import tracemalloc
+
+logger = logging.getLogger("transport_excel.profile")
+
+# 工程名 -> ベンチマークでの集計区分（ここにない工程は入力シート）
+STAGE_GROUPS = {
+    "マスタ": "master",
+    "損益計算表": "summaries",
+    "車両別収支": "summaries",
+    "資金繰り表": "summaries",
+    "ダッシュボード": "dashboard",
+    "保存": "save",
+    "計算": "calculate",
+}
+
+
+class GenerationProfiler:
+    """on_stage コールバックとして工程ごとの計測値を記録する"""
+
+    def __init__(self, trace_memory=False, log=True):
+        self.trace_memory = trace_memory
+        self.log = log
+        self.sections = []
+        self._current = None
+        self._sheets = {}  # 工程中に作成・書き込みしたシート（id -> シート）
+        self._start = None
+        self._started_tracemalloc = False
+        self._hooked = set()
+
+    def __call__(self, name, wb):
+        now = time.perf_counter()
+        if self._current is not None:
+            self._finish(now)
+        if name is None:
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+            return
+
+        if id(wb) not in self._hooked:
+            self._hook_workbook(wb)
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            tracemalloc.reset_peak()
+        self._current = {"name": name, "group": STAGE_GROUPS.get(name, "ledgers"),
+                         "seconds": None, "rows": 0, "cells": 0, "validations": 0, "conditional_formats": 0}
+        self._sheets = {}
+        self._start = time.perf_counter()
+
+    def _hook_workbook(self, wb):
+        """以降に作成されるシートの ws.append を行数・セル数を数える関数に置き換える
+
+        先に作成して後の工程で書き込むシート（ダッシュボード）もあるため、データ検証・
+        条件付き書式はその工程で作成または書き込みしたシートの分を数える。
+        """
+        self._hooked.add(id(wb))
+        create_sheet = wb.create_sheet
+
+        def counted_create_sheet(*args, **kwargs):
+            ws = create_sheet(*args, **kwargs)
+            key = id(ws)
+            self._sheets[key] = ws
+            append = ws.append
+
+            def counted_append(row):
+                section = self._current
+                section["rows"] += 1
+                section["cells"] += sum(1 for value in row if value is not None)
+                self._sheets[key] = ws
+                append(row)
+
+            ws.append = counted_append
+            return ws
+
+        wb.create_sheet = counted_create_sheet
+
+    def _finish(self, now):
+        section = self._current
+        section["seconds"] = round(now - self._start, 4)
+        for ws in self._sheets.values():
+            section["validations"] += len(ws.data_validations.dataValidation)
+            section["conditional_formats"] += sum(len(cf.rules) for cf in ws.conditional_formatting)
+        if self.trace_memory:
+            section["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+        self.sections.append(section)
+        self._current = None
+        if self.log:
+            logger.info(json.dumps(section, ensure_ascii=False))
+
+    def stages(self):
+        """集計区分（master / ledgers / summaries / dashboard / save / calculate）ごとの合計"""
+        stages = {}
+        for section in self.sections:
+            stage = stages.setdefault(section["group"], {"seconds": 0, "rows": 0, "cells": 0})
+            stage["seconds"] = round(stage["seconds"] + section["seconds"], 4)
+            stage["rows"] += section["rows"]
+            stage["cells"] += section["cells"]
+            if "peak_mb" in section:
+                stage["peak_mb"] = max(stage.get("peak_mb", 0), section["peak_mb"])
+        return stages
+
+    def summary(self):
+        """計測結果を JSON に書き出せる dict で返す"""
+        return {
+            "total_sec": round(sum(section["seconds"] for section in self.sections), 4),
+            "sections": self.sections,
+            "stages": self.stages(),
+        }
@@ -0,0 +1,232 @@
+"""運送会社経営管理Excel 集計値の読み出し
+
+生成済みワークブックから損益計算表・資金繰り表の月次集計（売上高・経費・営業利益・
+月末残高など）を読み出し、会社 × 月ごとの MonthlySummary として返す。
+xlsx 内の損益計算表・資金繰り表の XML だけを読み、集計表の決まった範囲
+（4〜17行・A〜M列）の値を取り出すため、入力シート（数十万行になりうる）は開かない。
+openpyxl の read_only モードは開く際に全シートの大きさを調べ、寸法情報のない
+ブック（streaming=True で生成したもの）では入力シートを最後まで走査してしまうため使わない。
+
+    from transport_excel_reader import read_summary, read_directory, to_dataframe
+
+    records = read_summary("運送会社経営管理_山田運輸.xlsx")
+    records, failures = read_directory("out", max_workers=4)
+    to_dataframe(records).pivot(index="company", columns="month", values="operating_profit")
+
+コマンドラインからはディレクトリ内のブックを並列に読んで CSV に書き出せる:
+
+    python transport_excel_reader.py out --csv group_summary.csv --workers 4
+
+集計セルは数式のため、計算結果が保存されていないブック（calculate=True を指定せずに
+生成したもの）では値を読めない。その場合は ValueError とするが、calculate=True を
+指定すると transport_excel_calc でその場で計算する（入力シートも読むため遅くなる）。
+"""
+import argparse
+import csv
+import glob
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import astuple, dataclass, fields
+from xml.etree import ElementTree
+
+from create_transport_excel import CASHFLOW_SHEET, CUSTOM_PROPS_NS, PL_SHEET
+from transport_excel_calc import load_calculator, read_values
+
+COMPANY_PREFIX = "運送会社経営管理_"
+HEADER_ROW = 3  # 集計シートの月見出し（年度の月順に並ぶ）
+
+# 項目 -> (シート名, 行, A列の項目名)。列は B〜M が1〜12月
+SUMMARY_CELLS = {
+    "sales_budget": (PL_SHEET.name, 4, "売上高（予算）"),
+    "sales": (PL_SHEET.name, 5, "売上高（実績）"),
+    "fuel": (PL_SHEET.name, 8, "燃料費"),
+    "repair": (PL_SHEET.name, 9, "修理費"),
+    "insurance": (PL_SHEET.name, 10, "保険料"),
+    "lease": (PL_SHEET.name, 11, "リース料"),
+    "labor": (PL_SHEET.name, 12, "人件費"),
+    "other_expenses": (PL_SHEET.name, 13, "その他経費"),
+    "expenses": (PL_SHEET.name, 14, "経費合計"),
+    "operating_profit": (PL_SHEET.name, 16, "営業利益"),
+    "operating_margin": (PL_SHEET.name, 17, "営業利益率"),
+    "opening_balance": (CASHFLOW_SHEET.name, 4, "月初残高"),
+    "cash_in": (CASHFLOW_SHEET.name, 5, "入金合計"),
+    "cash_out": (CASHFLOW_SHEET.name, 6, "出金合計"),
+    "closing_balance": (CASHFLOW_SHEET.name, 7, "月末残高"),
+}
+
+
+@dataclass(slots=True)
+class MonthlySummary:
+    """1社1か月分の集計値（金額は円、operating_margin は比率）"""
+    company: str
+    month: int
+    sales_budget: int
+    sales: int
+    fuel: int
+    repair: int
+    insurance: int
+    lease: int
+    labor: int
+    other_expenses: int
+    expenses: int
+    operating_profit: int
+    operating_margin: float
+    opening_balance: int
+    cash_in: int
+    cash_out: int
+    closing_balance: int
+    fiscal_year: int = None  # 年度を指定して生成したブックのみ
+    path: str = ""
+
+
+FIELDS = [f.name for f in fields(MonthlySummary)]
+
+
+def company_name(path):
+    """ファイル名から会社名を求める（一括生成の「運送会社経営管理_<会社名>.xlsx」に対応）"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return stem[len(COMPANY_PREFIX):] if stem.startswith(COMPANY_PREFIX) and len(stem) > len(COMPANY_PREFIX) else stem
+
+
+def _typed(field, value):
+    if value is None:
+        return 0
+    if field == "operating_margin":
+        return float(value)
+    return int(round(value)) if isinstance(value, float) else value
+
+
+def _read_rows(path):
+    """集計シートの対象行を {シート名: {行: [A〜M列の値]}} で読む（集計シート以外は開かない）"""
+    sheets = sorted({sheet for sheet, _, _ in SUMMARY_CELLS.values()})
+    rows = {}
+    for sheet, columns in read_values(path, sheets).items():
+        rows[sheet] = {}
+        for s, row in [(sheet, HEADER_ROW)] + [(s, row) for s, row, _ in SUMMARY_CELLS.values()]:
+            if s == sheet:
+                cells = [columns.get(col, []) for col in range(1, 14)]
+                rows[sheet][row] = [c[row] if row < len(c) else None for c in cells]
+    return rows
+
+
+def _calculated_rows(path):
+    """数式を transport_excel_calc で計算して対象行を読む"""
+    calc = load_calculator(path)
+    rows = {}
+    for sheet, row in [(PL_SHEET.name, HEADER_ROW)] + [(s, row) for s, row, _ in SUMMARY_CELLS.values()]:
+        rows.setdefault(sheet, {})[row] = [calc.cell(sheet, row, col) for col in range(1, 14)]
+    return rows
+
+
+def _fiscal_year(path):
+    """文書プロパティ fiscal_year（年度を指定せずに生成したブックは None）"""
+    with zipfile.ZipFile(path) as zin:
+        if "docProps/custom.xml" not in zin.namelist():
+            return None
+        for prop in ElementTree.fromstring(zin.read("docProps/custom.xml")).iter(f"{CUSTOM_PROPS_NS}property"):
+            if prop.get("name") == "fiscal_year" and len(prop):
+                return int(prop[0].text)
+    return None
+
+
+def _months(header):
+    """月見出し（"4月" など）-> 月番号。見出しがなければ1〜12月の順とみなす"""
+    months = [int(m.group(1)) if isinstance(value, str) and (m := re.fullmatch(r"(\d{1,2})月", value)) else None
+              for value in header[1:13]]
+    return months if None not in months else list(range(1, 13))
+
+
+def read_summary(path, company=None, calculate=False):
+    """ブック1つの月次集計を MonthlySummary のリスト（集計シートの列順 = 年度の月順）で返す
+
+    company を省略するとファイル名から求める。集計表のレイアウトが異なるブック、
+    計算結果が保存されていないブック（calculate=False の場合）は ValueError とする。
+    """
+    rows = _read_rows(path)
+    for field, (sheet, row, label) in SUMMARY_CELLS.items():
+        cells = rows[sheet].get(row)
+        if not cells or cells[0] != label:
+            raise ValueError(f"{path}: {sheet} {row}行目が「{label}」ではありません（レイアウトが異なります）")
+    pl_sheet, profit_row, _ = SUMMARY_CELLS["operating_profit"]
+    if all(value is None for value in rows[pl_sheet][profit_row][1:]):
+        if not calculate:
+            raise ValueError(f"{path}: 集計セルの計算結果が保存されていません"
+                             "（calculate=True で生成するか、read_summary(calculate=True) を指定してください）")
+        rows = _calculated_rows(path)
+
+    company = company or company_name(path)
+    fiscal_year = _fiscal_year(path)
+    records = []
+    for col, month in enumerate(_months(rows[pl_sheet][HEADER_ROW]), 1):
+        values = {field: _typed(field, rows[sheet][row][col]) for field, (sheet, row, _) in SUMMARY_CELLS.items()}
+        records.append(MonthlySummary(company=company, month=month, fiscal_year=fiscal_year, path=path, **values))
+    return records
+
+
+def _read_one(path, calculate):
+    """プロセスプールのワーカー: (パス, レコード, 失敗理由)"""
+    try:
+        return path, read_summary(path, calculate=calculate), None
+    except Exception as e:
+        return path, [], f"{type(e).__name__}: {e}"
+
+
+def read_directory(directory, pattern="*.xlsx", max_workers=None, calculate=False):
+    """ディレクトリ内のブックを並列に読み、(全社のレコード, 失敗したブック) を返す
+
+    失敗したブックは {"path": ..., "error": ...} のリストで返し、他のブックの読み出しは続ける。
+    レコードは会社名・年度・ブック内の月順に並べる。
+    """
+    paths = sorted(p for p in glob.glob(os.path.join(directory, pattern))
+                   if not os.path.basename(p).startswith("~$"))  # Excel のロックファイルを除く
+    records, failures = [], []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_read_one, path, calculate) for path in paths]
+        for future in as_completed(futures):
+            path, result, error = future.result()
+            if error:
+                failures.append({"path": path, "error": error})
+            records.extend(result)
+    records.sort(key=lambda r: (r.company, r.fiscal_year or 0))  # 安定ソートのためブック内の月順は保たれる
+    failures.sort(key=lambda f: f["path"])
+    return records, failures
+
+
+def to_dataframe(records):
+    """レコードを pandas の DataFrame（1行 = 1社1か月）に変換する（要 pandas）"""
+    try:
+        import pandas as pd
+    except ImportError as e:
+        raise ImportError("DataFrame への変換には pandas が必要です: pip install pandas") from e
+    return pd.DataFrame([astuple(r) for r in records], columns=FIELDS)
+
+
+def write_csv(records, path, encoding="utf-8-sig"):
+    """レコードを CSV に書き出す（既定は Excel で開ける BOM 付き UTF-8）"""
+    with open(path, "w", newline="", encoding=encoding) as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        writer.writerows(astuple(r) for r in records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="運送会社経営管理Excel 集計値の一括読み出し")
+    parser.add_argument("directory", help="ワークブックのあるディレクトリ")
+    parser.add_argument("--pattern", default="*.xlsx", help="対象ファイルのパターン")
+    parser.add_argument("--csv", default="group_summary.csv", help="書き出す CSV のパス")
+    parser.add_argument("--workers", type=int, default=None, help="並列プロセス数（既定: CPU コア数）")
+    parser.add_argument("--calculate", action="store_true", help="計算結果のないブックはその場で計算する")
+    args = parser.parse_args()
+
+    records, failures = read_directory(args.directory, args.pattern, args.workers, args.calculate)
+    for failure in failures:
+        print(f"❌ {failure['path']}: {failure['error']}")
+    write_csv(records, args.csv)
+    print(f"完了: {len(records) // 12}社 / 失敗: {len(failures)}件 -> {args.csv}")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+"""運送会社経営管理Excel 生成サーバー
+
+会社定義（transport_excel_batch のマニフェストの1社分）を JSON で受け取り、生成した .xlsx を
+そのまま返すローカルの HTTP サービス。ワークブックの生成は起動時に作っておいたワーカープロセス
+（openpyxl・XlsxWriter・NumPy などを読み込み済み）で行うため、リクエストごとにインタープリターの
+起動やライブラリの読み込みを待たない。
+
+    python transport_excel_server.py --port 8765 --workers 4 --timeout 120
+
+    curl -X POST --data-binary @yamada.json -o yamada.xlsx http://127.0.0.1:8765/generate
+
+リクエスト（POST /generate）の本文は1社分の会社定義で、入力データは ledgers に JSON の行で書く:
+
+    {
+      "name": "山田運輸",
+      "clients": [["C001", "A運送株式会社"]],
+      "vehicles": [["車両001", "2tトラック"]],
+      "streaming": true,
+      "ledgers": {
+        "売上入力": [{"日付": "2025-01-05", "取引先名": "A運送株式会社", "車両番号": "車両001",
+                      "売上金額": 150000}]
+      }
+    }
+
+サーバー上のファイルを読み書きさせないため、sources・output は指定できない。
+応答は次のとおり（エラーの本文は {"error": "..."} の JSON）:
+    200  生成したワークブック（Content-Length 付きで、一時ファイルから順に送る）
+    400  JSON として読めない・会社定義の形式が正しくない・Content-Length が負
+    413  本文が max_body バイトを超える
+    422  入力データの誤りで生成に失敗した（ValueError）
+    500  サーバー側の不具合・ワーカーの異常終了で生成に失敗した
+    503  生成中・待機中のリクエストが max_pending 件に達している（Retry-After 付き）
+    504  生成が timeout 秒以内に終わらなかった（そのワーカーは停止して作り直す）
+GET /health は ワーカー数・空きワーカー数・処理中のリクエスト数を JSON で返す。
+
+テストなどで同じプロセス内から起動する場合は create_server を使う（port=0 で空きポート）。
+ワーカーは spawn で起動するため、呼び出し側のスクリプトは if __name__ == "__main__": で囲む:
+
+    server = create_server(port=0, workers=2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    ...  # http://127.0.0.1:{server.server_port}/generate に送る
+    server.shutdown()
+    server.server_close()
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote
+
+from create_transport_excel import DEFAULT_OUTPUT
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+WORKBOOK_FILE = "workbook.xlsx"  # 一時ディレクトリ内の出力先（会社名はファイル名に使わない）
+REJECTED_KEYS = ("sources", "output")
+CHUNK_SIZE = 1 << 20
+
+
+class GenerationTimeout(Exception):
+    """生成が制限時間内に終わらなかった"""
+
+
+# =========================
+# ワーカープロセス
+# =========================
+def _warm_up():
+    """生成に使うモジュールを読み込んでおく（create_transport_excel が関数内で読み込むものを含む）"""
+    import openpyxl.chart  # noqa: F401
+    import openpyxl.formatting.rule  # noqa: F401
+
+    import transport_excel_batch  # noqa: F401
+    import transport_excel_calc  # noqa: F401
+    for optional in ("numpy", "transport_excel_xlsxwriter"):  # 資金繰り予測・backend="xlsxwriter"
+        try:
+            __import__(optional)
+        except ImportError:
+            pass  # 使うリクエストが来たときに生成エラーとして返す
+
+
+def _parse_company(body):
+    """リクエスト本文を会社定義に変換する（形式の誤りは ValueError）"""
+    try:
+        company = json.loads(body)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"JSON として読めません: {e}") from e
+    if not isinstance(company, dict):
+        raise ValueError("本文は1社分の会社定義（JSON のオブジェクト）を指定してください")
+    rejected = [key for key in REJECTED_KEYS if key in company]
+    if rejected:
+        raise ValueError(f"{'・'.join(rejected)} は指定できません（入力データは ledgers に JSON の行で指定してください）")
+    from transport_excel_batch import validate_company
+
+    validate_company(company)  # 項目名・選択肢・型・forecast の設定
+    return company
+
+
+def _generate(body, output):
+    """ワーカーで1件生成する。戻り値は generate_company の結果（会社定義の形式の誤りは invalid=True）"""
+    from transport_excel_batch import generate_company
+
+    try:
+        company = _parse_company(body)
+    except ValueError as e:
+        return {"ok": False, "invalid": True, "error": str(e)}
+    company.update(name=str(company.get("name") or ""), output=output, skip_unchanged=False)
+    # write_only・constant_memory の一時ファイルもリクエストの一時ディレクトリに作り、
+    # 制限時間を超えて停止したワーカーの書きかけが残らないようにする
+    tempfile.tempdir = os.path.dirname(output)
+    try:
+        return generate_company(company)
+    finally:
+        tempfile.tempdir = None
+
+
+def _worker_main(conn):
+    """ワーカープロセスの本体: 読み込みを済ませてから (本文, 出力先) を受け取って生成する"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C はサーバー側で処理する
+    _warm_up()
+    conn.send("ready")
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        conn.send(_generate(*job))
+
+
+class _Worker:
+    """パイプでつないだ常駐ワーカープロセス1つ"""
+
+    def __init__(self, context):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        self.ready = False
+
+    def wait_ready(self, timeout=None):
+        """読み込みが済むまで待つ（済んでいれば True。起動に失敗したワーカーは False）"""
+        if not self.ready and self.conn.poll(timeout):
+            try:
+                self.ready = self.conn.recv() == "ready"
+            except EOFError:
+                return False
+        return self.ready
+
+    def run(self, body, output, timeout):
+        self.wait_ready()
+        self.conn.send((body, output))
+        if not self.conn.poll(timeout):
+            raise GenerationTimeout(f"{timeout}秒以内に生成が終わりませんでした")
+        return self.conn.recv()
+
+    def stop(self, timeout=5):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    """読み込み済みのワーカープロセスのプール
+
+    制限時間を超えた・異常終了したワーカーは停止して作り直す（ProcessPoolExecutor では
+    実行中の1件だけを止められないため、ワーカーを直接管理する）。
+    ワーカーは spawn で起動する（スレッドで待ち受けるサーバープロセスを fork しない）。
+    """
+
+    def __init__(self, workers=None, start_timeout=60):
+        self.size = workers or os.cpu_count() or 1
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        workers = [_Worker(self._context) for _ in range(self.size)]
+        deadline = time.monotonic() + start_timeout
+        for worker in workers:
+            if not worker.wait_ready(max(deadline - time.monotonic(), 0)):
+                for w in workers:
+                    w.kill()
+                raise RuntimeError(f"ワーカープロセスを起動できませんでした（{start_timeout}秒）")
+            self._idle.put(worker)
+        self._closed = False
+
+    @property
+    def idle(self):
+        return self._idle.qsize()
+
+    def generate(self, body, output, timeout, wait=None):
+        """空いているワーカーで1件生成し、generate_company の結果を返す
+
+        wait 秒待ってもワーカーが空かなければ queue.Empty、timeout 秒で生成が終わらなければ
+        GenerationTimeout を送出する。
+        """
+        worker = self._idle.get(timeout=wait)
+        try:
+            return worker.run(body, output, timeout)
+        except (GenerationTimeout, EOFError, OSError):
+            worker.kill()
+            worker = _Worker(self._context)  # 読み込みは次のリクエストまでに済ませておく
+            raise
+        finally:
+            self._idle.put(worker)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                break
+
+
+# =========================
+# HTTP サーバー
+# =========================
+class WorkbookServer(ThreadingHTTPServer):
+    """リクエストごとのスレッドで受け付け、生成はワーカープールに任せる HTTP サーバー"""
+
+    daemon_threads = True
+
+    def __init__(self, address, pool, max_pending=None, timeout=300, max_body=256 << 20):
+        super().__init__(address, WorkbookRequestHandler)
+        self.pool = pool
+        self.max_pending = max_pending or pool.size * 2
+        self.generation_timeout = timeout
+        self.max_body = max_body
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """処理中のリクエスト数の上限に達していなければ枠を確保する"""
+        with self._lock:
+            if self.active >= self.max_pending:
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+
+    def server_close(self):
+        super().server_close()
+        self.pool.close()
+
+
+class WorkbookRequestHandler(BaseHTTPRequestHandler):
+    server_version = "TransportExcel/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message, headers=None):
+        self._send_json(status, {"error": message}, headers)
+
+    def _send_workbook(self, path, filename, seconds):
+        self.send_response(200)
+        self.send_header("Content-Type", XLSX_CONTENT_TYPE)
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.send_header("Content-Disposition",
+                         f"attachment; filename=\"{WORKBOOK_FILE}\"; filename*=UTF-8''{quote(filename)}")
+        self.send_header("X-Generation-Seconds", str(seconds))
+        self.end_headers()
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, self.wfile, CHUNK_SIZE)
+
+    def do_GET(self):
+        server = self.server
+        if self.path != "/health":
+            self._send_error(404, f"見つかりません: {self.path}")
+            return
+        self._send_json(200, {"workers": server.pool.size, "idle": server.pool.idle,
+                              "active": server.active, "max_pending": server.max_pending})
+
+    def do_POST(self):
+        server = self.server
+        if self.path != "/generate":
+            self._send_error(404, f"見つかりません: {self.path}")
+            return
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            self._send_error(411, "Content-Length を指定してください")
+            return
+        if length < 0:
+            self.close_connection = True  # 本文の長さが分からないため読まずに切断する
+            self._send_error(400, f"Content-Length が正しくありません: {length}")
+            return
+        if length > server.max_body:
+            self.close_connection = True  # 本文は読まずに切断する
+            self._send_error(413, f"本文が大きすぎます（上限 {server.max_body} バイト）")
+            return
+        if not server.acquire():  # 枠がなければ本文を読む前に断る
+            self.close_connection = True
+            self._send_error(503, f"処理中のリクエストが上限（{server.max_pending}件）に達しています",
+                             {"Retry-After": "1"})
+            return
+        try:
+            body = self.rfile.read(length)
+            with tempfile.TemporaryDirectory(prefix="transport_excel_") as workdir:
+                output = os.path.join(workdir, WORKBOOK_FILE)
+                try:
+                    result = server.pool.generate(body, output, server.generation_timeout,
+                                                  wait=server.generation_timeout)
+                except queue.Empty:
+                    self._send_error(503, "空いているワーカーがありません", {"Retry-After": "1"})
+                    return
+                except GenerationTimeout as e:
+                    self._send_error(504, str(e))
+                    return
+                except (EOFError, OSError):
+                    self._send_error(500, "ワーカープロセスが異常終了しました")
+                    return
+                if not result["ok"]:
+                    if result.get("invalid"):
+                        status = 400
+                    elif result.get("error_type") == "ValueError":
+                        status = 422  # 入力データの誤り
+                    else:
+                        status = 500  # ImportError・TypeError などサーバー側の不具合
+                    self._send_error(status, result["error"])
+                    return
+                name = result["name"]
+                self._send_workbook(output, f"運送会社経営管理_{name}.xlsx" if name else DEFAULT_OUTPUT,
+                                    result["seconds"])
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # 受信側が途中で切断した
+        finally:
+            server.release()
+
+
+def create_server(host="127.0.0.1", port=8765, workers=None, max_pending=None, timeout=300,
+                  max_body=256 << 20):
+    """ワーカープールを起動し、待ち受け前の WorkbookServer を返す
+
+    workers はワーカープロセス数（既定: CPU コア数）、max_pending は生成中・待機中の
+    リクエスト数の上限（既定: ワーカー数の2倍）、timeout は1件の生成の制限時間（秒）。
+    server_close() でワーカーも停止する。
+    """
+    pool = WorkerPool(workers)
+    try:
+        return WorkbookServer((host, port), pool, max_pending, timeout, max_body)
+    except BaseException:
+        pool.close()
+        raise
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="運送会社経営管理Excel 生成サーバー")
+    parser.add_argument("--host", default="127.0.0.1", help="待ち受けるアドレス（既定: ローカルのみ）")
+    parser.add_argument("--port", type=int, default=8765, help="待ち受けるポート")
+    parser.add_argument("--workers", type=int, default=None, help="ワーカープロセス数（既定: CPU コア数）")
+    parser.add_argument("--max-pending", type=int, default=None,
+                        help="生成中・待機中のリクエスト数の上限（既定: ワーカー数の2倍。超えると 503）")
+    parser.add_argument("--timeout", type=float, default=300, help="1件の生成の制限時間（秒。超えると 504）")
+    parser.add_argument("--max-body", type=int, default=256 << 20, help="リクエスト本文の上限（バイト）")
+    args = parser.parse_args(argv)
+
+    server = create_server(args.host, args.port, args.workers, args.max_pending, args.timeout, args.max_body)
+    host, port = server.server_address[:2]
+    print(f"✅ http://{host}:{port}/generate で待ち受けています（ワーカー {server.pool.size}、"
+          f"上限 {server.max_pending}件、制限時間 {args.timeout:g}秒）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
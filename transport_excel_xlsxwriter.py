@@ -0,0 +1,414 @@
+"""運送会社経営管理Excel XlsxWriter による書き出し
+
+create_transport_management_excel(backend="xlsxwriter") で使う書き出し先。生成処理が使う
+openpyxl のワークブック・シートの操作（シート作成・列幅・行の追加・セル結合・データ検証・
+条件付き書式・グラフ・文書プロパティ・保存）を同じ名前で受け付け、XlsxWriter の
+constant_memory モードで書き出す。シートの内容を組み立てる処理は openpyxl と共通で、
+データ検証（DataValidation）・条件付き書式（CellIsRule）・グラフ（LineChart / BarChart）は
+openpyxl のオブジェクトを XlsxWriter の設定に変換する。
+
+セルはセルオブジェクトを作らず (値, 名前付きスタイル名) の組で受け取り、スタイル名ごとに
+1つ作った XlsxWriter の書式を付けて書くため、大量の入力行を openpyxl より速く書き出せる
+（transport_excel_bench.py --backends で両者の内容の一致と書き出し速度を確認できる）。
+
+XlsxWriter 3.x（公開 API のほか、書式の番号 Format.xf_index を使う）に対応し、それ以外の
+バージョンでは読み込み時に ImportError とする。
+XlsxWriter は名前付きスタイルを書かないため、保存後に styles.xml へ名前付きスタイル（cellStyle）を
+加える（transport_excel_append はスタイル名から追記行の書式を決める）。
+行は追加した順にしか書けない（streaming=True の openpyxl と同じ）。シートは作成した順に並ぶ。
+数式セルの計算結果は空で保存する（openpyxl と同じく calculate=True で埋め込める）。
+"""
+import os
+import re
+import tempfile
+from collections import namedtuple
+from datetime import date, datetime
+from types import SimpleNamespace
+from xml.sax.saxutils import quoteattr
+
+try:
+    import xlsxwriter
+except ImportError as e:
+    raise ImportError('backend="xlsxwriter" には XlsxWriter が必要です: pip install "XlsxWriter>=3,<4"') from e
+if not xlsxwriter.__version__.startswith("3."):
+    raise ImportError(f'backend="xlsxwriter" は XlsxWriter 3.x に対応しています（{xlsxwriter.__version__}）: '
+                      'pip install "XlsxWriter>=3,<4"')
+
+from openpyxl.chart import BarChart
+from openpyxl.packaging.custom import IntProperty
+from openpyxl.utils import range_boundaries
+
+StyledValue = namedtuple("StyledValue", "value style")
+
+# CellIsRule の operator -> XlsxWriter の criteria
+_CRITERIA = {
+    "lessThan": "<", "lessThanOrEqual": "<=", "greaterThan": ">", "greaterThanOrEqual": ">=",
+    "equal": "==", "notEqual": "!=", "between": "between", "notBetween": "not between",
+}
+_CELL_XFS_RE = re.compile(r'(<cellXfs count="\d+">)(.*?)</cellXfs>', re.S)
+_XF_RE = re.compile(r"<xf\b[^>]*?(?:/>|>.*?</xf>)", re.S)
+_CM_TO_PX = 96 / 2.54  # グラフの大きさ（openpyxl は cm、XlsxWriter はピクセル）
+_LIST_RE = re.compile(r'^"(.*)"$', re.S)
+
+
+def _rgb(color):
+    """openpyxl の Color（ARGB）-> "#RRGGBB"（色の指定がなければ None）"""
+    if color is None or color.type != "rgb":  # テーマ色（ブック既定のフォントなど）は指定しない
+        return None
+    return f"#{color.rgb[-6:]}"
+
+
+def _format_options(font=None, fill=None, alignment=None, border=None, number_format=None):
+    """openpyxl のスタイル属性 -> XlsxWriter の書式の設定"""
+    options = {}
+    if font is not None:
+        if font.name:
+            options["font_name"] = font.name
+        if font.sz:
+            options["font_size"] = font.sz
+        if font.b:
+            options["bold"] = True
+        if _rgb(font.color):
+            options["font_color"] = _rgb(font.color)
+    if fill is not None and fill.fill_type == "solid":
+        options["bg_color"] = _rgb(fill.fgColor) or _rgb(fill.bgColor)
+    if alignment is not None and alignment.horizontal:
+        options["align"] = alignment.horizontal
+    if border is not None and border.left is not None and border.left.style == "thin":
+        options["border"] = 1
+    if number_format and number_format != "General":
+        options["num_format"] = number_format
+    return options
+
+
+def _title_text(title):
+    """openpyxl のグラフタイトル（リッチテキスト）の文字列"""
+    if title is None or title.tx is None or title.tx.rich is None:
+        return None
+    return "".join(run.t for paragraph in title.tx.rich.p for run in (paragraph.r or []))
+
+
+def _data_ref(source):
+    """系列のデータ参照（NumRef / StrRef）の数式"""
+    if source is None:
+        return None
+    ref = source.numRef or source.strRef
+    return f"={ref.f}" if ref is not None else None
+
+
+def _append_elements(xml, tag, elements):
+    """<tag count="n">…</tag> の末尾に要素を加え、count を更新する"""
+    if not elements:
+        return xml
+    m = re.search(rf'<{tag} count="(\d+)">(.*?)</{tag}>', xml, re.S)
+    body = f'<{tag} count="{int(m.group(1)) + len(elements)}">{m.group(2)}{"".join(elements)}</{tag}>'
+    return xml[:m.start()] + body + xml[m.end():]
+
+
+class _ColumnDimension:
+    __slots__ = ("_ws", "_col", "_width")
+
+    def __init__(self, ws, col):
+        self._ws, self._col, self._width = ws, col, None
+
+    @property
+    def width(self):
+        return self._width
+
+    @width.setter
+    def width(self, value):
+        self._width = value
+        self._ws.set_column(f"{self._col}:{self._col}", value)
+
+
+class _ColumnDimensions(dict):
+    def __init__(self, ws):
+        super().__init__()
+        self._ws = ws
+
+    def __missing__(self, col):
+        dimension = self[col] = _ColumnDimension(self._ws, col)
+        return dimension
+
+
+class _SheetView:
+    def __init__(self, ws):
+        self._ws = ws
+
+    @property
+    def showGridLines(self):
+        return not self._ws.screen_gridlines
+
+    @showGridLines.setter
+    def showGridLines(self, value):
+        self._ws.hide_gridlines(0 if value else 2)
+
+
+class _MergedCells:
+    """ws.merged_cells.add("A1:P1")
+
+    constant_memory では書き終えた行に戻れないため、結合できるのは最後に値を書いた行
+    （タイトル行と空行の直後など）だけで、結合範囲の先頭セルの値・書式で書き直す。
+    """
+
+    def __init__(self, sheet):
+        self._sheet = sheet
+
+    def add(self, ref):
+        min_col, min_row, max_col, max_row = range_boundaries(ref)
+        last_row, cells = self._sheet._last
+        if min_row - 1 != last_row:
+            raise ValueError(f"{self._sheet.title}: 最後に書いた行以外は結合できません: {ref}")
+        value = cells[min_col - 1] if min_col <= len(cells) else None
+        fmt = None
+        if type(value) is StyledValue:
+            value, style = value
+            fmt = self._sheet._formats[style] if style is not None else None
+        self._sheet._ws.merge_range(min_row - 1, min_col - 1, max_row - 1, max_col - 1,
+                                    "" if value is None else value, fmt)
+
+
+class _DataValidations:
+    """ws.data_validations（範囲は追加後に dv.add で決まるため、保存時に変換する）"""
+
+    def __init__(self):
+        self.dataValidation = []
+
+    def append(self, dv):
+        self.dataValidation.append(dv)
+
+
+class _ConditionalFormatting:
+    def __init__(self, sheet):
+        self._sheet = sheet
+        self._entries = []
+
+    def add(self, ref, rule):
+        dxf = rule.dxf
+        options = {"type": "cell", "criteria": _CRITERIA[rule.operator], "value": rule.formula[0]}
+        if rule.operator in ("between", "notBetween"):
+            options.update(minimum=rule.formula[0], maximum=rule.formula[1])
+            del options["value"]
+        style = _format_options(font=dxf.font, fill=dxf.fill) if dxf is not None else {}
+        style.pop("font_name", None)
+        style.pop("font_size", None)
+        options["format"] = self._sheet._book.add_format(style)
+        self._sheet._ws.conditional_format(ref, options)
+        self._entries.append(SimpleNamespace(sqref=ref, rules=[rule]))
+
+    def __iter__(self):
+        return iter(self._entries)
+
+
+class XlsxWriterSheet:
+    """openpyxl の書き込み専用シートと同じ操作を受け付ける XlsxWriter のシート"""
+
+    def __init__(self, workbook, title):
+        self.parent = workbook
+        self.title = title
+        self._book = workbook._book
+        self._ws = self._book.add_worksheet(title)
+        self._formats = workbook._formats
+        self._row = 0
+        self._last = (None, [])  # セル結合用: 最後に値を書いた (行, セル)
+        self.column_dimensions = _ColumnDimensions(self._ws)
+        self.sheet_view = _SheetView(self._ws)
+        self.merged_cells = _MergedCells(self)
+        self.data_validations = _DataValidations()
+        self.conditional_formatting = _ConditionalFormatting(self)
+        self._charts = []
+
+    @staticmethod
+    def styled_cell(value, style):
+        """名前付きスタイルを付けたセル（生成処理の _cell から呼ばれる）"""
+        return StyledValue(value, style)
+
+    @property
+    def freeze_panes(self):
+        return None
+
+    @freeze_panes.setter
+    def freeze_panes(self, ref):
+        self._ws.freeze_panes(ref)
+
+    def append(self, row):
+        """1行を書き込む（値・StyledValue のリスト）"""
+        r = self._row
+        self._row += 1
+        ws, formats = self._ws, self._formats
+        if row:
+            self._last = (r, row)
+        for c, value in enumerate(row):
+            fmt = None
+            if type(value) is StyledValue:
+                value, style = value
+                fmt = formats[style] if style is not None else None
+            kind = type(value)
+            if kind is str:
+                if value.startswith("="):
+                    ws.write_formula(r, c, value, fmt, "")  # 計算結果は空（<v></v>）
+                elif value:
+                    ws.write_string(r, c, value, fmt)
+                elif fmt is not None:
+                    ws.write_blank(r, c, None, fmt)
+            elif kind is int or kind is float:
+                ws.write_number(r, c, value, fmt)
+            elif value is None:
+                if fmt is not None:
+                    ws.write_blank(r, c, None, fmt)
+            elif kind is date or kind is datetime:
+                ws.write_datetime(r, c, value, fmt)
+            elif kind is bool:
+                ws.write_boolean(r, c, value, fmt)
+            else:
+                ws.write(r, c, value, fmt)
+
+    def add_chart(self, chart, anchor):
+        """openpyxl の LineChart / BarChart を XlsxWriter のグラフに変換して配置する"""
+        series = [s for s in chart.series if s.val is not None]
+        if not series:  # XlsxWriter は系列のないグラフを書けない
+            return
+        if isinstance(chart, BarChart):
+            options = {"type": "column" if chart.type == "col" else "bar"}
+        else:
+            options = {"type": "line"}
+        target = self._book.add_chart(options)
+        for s in series:
+            name = s.tx.strRef.f if s.tx is not None and s.tx.strRef is not None else None
+            target.add_series({key: value for key, value in [
+                ("name", f"={name}" if name else None),
+                ("values", _data_ref(s.val)),
+                ("categories", _data_ref(s.cat)),
+            ] if value is not None})
+        title = _title_text(chart.title)
+        if title:
+            target.set_title({"name": title})
+        num_format = getattr(chart.y_axis.numFmt, "formatCode", chart.y_axis.numFmt)
+        if num_format:
+            target.set_y_axis({"num_format": num_format})
+        if chart.legend is None:
+            target.set_legend({"none": True})
+        target.set_size({"width": round(chart.width * _CM_TO_PX), "height": round(chart.height * _CM_TO_PX)})
+        self._ws.insert_chart(anchor, target)
+        self._charts.append(chart)
+
+    def _close_validations(self):
+        for dv in self.data_validations.dataValidation:
+            source = dv.formula1 or ""
+            quoted = _LIST_RE.match(source)
+            options = {
+                "validate": dv.type,
+                "source": quoted.group(1).split(",") if quoted else source,
+                "ignore_blank": bool(dv.allow_blank),
+                "show_input": bool(dv.showInputMessage),
+                "show_error": bool(dv.showErrorMessage),
+            }
+            for ref in str(dv.sqref).split():
+                self._ws.data_validation(ref, options)
+
+
+class _Properties:
+    def __init__(self):
+        self.created = None
+
+
+class _CustomProperties(list):
+    """wb.custom_doc_props（IntProperty / StringProperty を保存時に変換する）"""
+
+
+class XlsxWriterWorkbook:
+    """openpyxl の Workbook と同じ操作を受け付ける XlsxWriter のワークブック
+
+    output_path は保存先（XlsxWriter はワークブックの作成時に保存先を決める）。
+    constant_memory のシートごとの一時ファイルはこのブック専用の一時ディレクトリに作る。
+    """
+
+    def __init__(self, output_path):
+        self._tmpdir = tempfile.TemporaryDirectory(prefix="transport_xlsxwriter_")
+        self._book = xlsxwriter.Workbook(output_path, {
+            "constant_memory": True,
+            "strings_to_urls": False,  # openpyxl と同じく URL の文字列もそのまま書く
+            "tmpdir": self._tmpdir.name,
+        })
+        self._formats = {}
+        self._sheets = []
+        self.properties = _Properties()
+        self.custom_doc_props = _CustomProperties()
+
+    @property
+    def worksheets(self):
+        return list(self._sheets)
+
+    def add_named_style(self, style):
+        """openpyxl の NamedStyle と同じ書式を XlsxWriter の書式として登録する"""
+        self._formats[style.name] = self._book.add_format(_format_options(
+            style.font, style.fill, style.alignment, style.border, style.number_format))
+
+    def create_sheet(self, title, index=None):
+        """シートを末尾に作成する（XlsxWriter のシートは作成順に並ぶため、途中への挿入はできない）"""
+        if index is not None and index != len(self._sheets):
+            raise ValueError(f'backend="xlsxwriter" ではシートは作成順に並ぶため、途中に挿入できません: {title}')
+        ws = XlsxWriterSheet(self, title)
+        self._sheets.append(ws)
+        return ws
+
+    def save(self, path):
+        book = self._book
+        book.filename = path
+        for ws in self._sheets:
+            ws._close_validations()
+        properties = {}
+        if self.properties.created is not None:
+            properties["created"] = self.properties.created
+        book.set_properties(properties)
+        for prop in self.custom_doc_props:
+            book.set_custom_property(prop.name, prop.value,
+                                     "number_int" if isinstance(prop, IntProperty) else "text")
+        try:
+            book.close()
+        finally:
+            self._tmpdir.cleanup()
+
+    @property
+    def repack_rewrite(self):
+        """保存後に書き換える ZIP 内の部品（create_transport_excel._repack で適用する）"""
+        return {"xl/styles.xml": self._add_cell_styles}
+
+    def _add_cell_styles(self, xml):
+        """styles.xml に名前付きスタイルを加え、書式（cellXfs）をそのスタイルに結び付ける
+
+        書式の番号は XlsxWriter が保存時に決める（使われなかった書式は番号がなく、加えない）。
+        同じ内容の書式は1つにまとめられるため、そのスタイル名は同じ名前付きスタイルを指す。
+        """
+        xml = xml.decode("utf-8")
+        cell_xfs = _CELL_XFS_RE.search(xml)
+        xfs = _XF_RE.findall(cell_xfs.group(2))
+        style_xfs, styles, linked = [], [], {}
+        for name, fmt in self._formats.items():
+            if fmt.xf_index is None:
+                continue
+            xf_id = linked.get(fmt.xf_index)
+            if xf_id is None:
+                xf_id = linked[fmt.xf_index] = len(style_xfs) + 1  # 0 は既定の Normal
+                style_xfs.append(xfs[fmt.xf_index].replace(' xfId="0"', ""))
+            styles.append(f'<cellStyle name={quoteattr(name)} xfId="{xf_id}"/>')
+        for index, xf_id in linked.items():
+            xfs[index] = xfs[index].replace(' xfId="0"', f' xfId="{xf_id}"', 1)
+        xml = xml[:cell_xfs.start(2)] + "".join(xfs) + xml[cell_xfs.end(2):]
+        xml = _append_elements(xml, "cellStyleXfs", style_xfs)
+        xml = _append_elements(xml, "cellStyles", styles)
+        return xml.encode("utf-8")
+
+    def discard(self):
+        """書き出しを中断したブックを破棄する
+
+        書きかけのブックは一時ディレクトリに保存して閉じ（シートの一時ファイルも閉じられる）、
+        一時ディレクトリごと削除する。出力先には何も書かない。
+        """
+        self._book.filename = os.path.join(self._tmpdir.name, "discarded.xlsx")
+        try:
+            self._book.close()
+        except Exception:
+            pass  # 書きかけの内容によっては保存できないが、一時ファイルの削除は続ける
+        finally:
+            self._tmpdir.cleanup()